@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the header-only image size probing against PIL.
+
+Run from the repository root:
+
+    python -m benchmarks.image_size --images 2000
+"""
+
+from darknet_utils.utils import get_image_size, get_image_sizes, probe_image_size
+
+from argparse import ArgumentParser
+from pathlib import Path
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from PIL import Image
+
+
+FORMATS = {
+    ".jpg": dict(format="JPEG", quality=90),
+    ".progressive.jpg": dict(format="JPEG", quality=90, progressive=True),
+    ".png": dict(format="PNG"),
+    ".bmp": dict(format="BMP"),
+}
+
+
+def parse_args():
+    parser = ArgumentParser(description="Benchmark image size probing against PIL.")
+
+    parser.add_argument("--images", "-n", type=int, default=1000,
+        help="The number of images to generate.")
+    parser.add_argument("--workers", "-w", type=int, default=0,
+        help="The number of processes of the batched variant, 0 for one per CPU core.")
+
+    return parser.parse_args()
+
+
+def generate_images(folder: Path, count: int) -> "list[Path]":
+    random_gen = Random(0)
+    images = []
+    for i in range(count):
+        extension = list(FORMATS)[i % len(FORMATS)]
+        size = random_gen.randint(16, 640), random_gen.randint(16, 480)
+        image = folder / f"im_{i:06}{extension}"
+        Image.new("RGB", size, (i % 256, 0, 0)).save(image, **FORMATS[extension])
+        images.append(image)
+    return images
+
+
+def pil_size(image: Path) -> "tuple[int, int]":
+    with Image.open(image) as img:
+        return img.size
+
+
+def timed(name: str, func, images: "list[Path]") -> "list[tuple[int, int]]":
+    start = perf_counter()
+    sizes = func(images)
+    elapsed = perf_counter() - start
+    print(f"{name:<12} {elapsed * 1e3:9.1f} ms {len(images) / elapsed:12.0f} imgs/s")
+    return sizes
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    with TemporaryDirectory() as tmp:
+        images = generate_images(Path(tmp), args.images)
+
+        expected = timed("PIL", lambda imgs: [pil_size(i) for i in imgs], images)
+        probed = timed("probe", lambda imgs: [probe_image_size(i) for i in imgs], images)
+        sizes = timed("get_size", lambda imgs: [get_image_size(i) for i in imgs], images)
+        batched = timed("batched", lambda imgs: get_image_sizes(imgs, args.workers), images)
+
+        assert [tuple(s) for s in probed] == expected, "probed sizes differ from PIL"
+        assert [tuple(s) for s in sizes] == expected, "sizes differ from PIL"
+        assert [tuple(s) for s in batched] == expected, "batched sizes differ from PIL"
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""
+Startup time of the package and of the scripts, measured in fresh
+interpreters. Heavy dependencies (numpy, PIL, lxml, rich, tqdm) are
+imported on first use thus `--help` should stay close to the bare
+interpreter startup.
+
+Run from the repository root:
+
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --budget 150
+"""
+
+from argparse import ArgumentParser
+from pathlib import Path
+from statistics import median
+from time import perf_counter
+import subprocess
+import sys
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+COMMANDS = {
+    "python": ["-c", "pass"],
+    "import darknet_utils": ["-c", "import darknet_utils"],
+    "stats.py -h": [str(ROOT / "stats.py"), "-h"],
+    "create_yolo.py -h": [str(ROOT / "create_yolo.py"), "-h"],
+}
+
+# Modules which should not be imported when importing the package
+HEAVY_MODULES = ("numpy", "PIL", "lxml", "rich", "tqdm", "asyncio", "concurrent.futures")
+
+
+def parse_args():
+    parser = ArgumentParser(description="Time the startup of the package and of the scripts.")
+
+    parser.add_argument("--repeat", "-r", type=int, default=10,
+        help="The number of runs per command, the median is reported.")
+    parser.add_argument("--budget", "-b", type=float, default=None,
+        help="The maximum startup time in ms, exits with an error if a command exceeds it.")
+
+    return parser.parse_args()
+
+
+def startup_time(args: "list[str]", repeat: int) -> float:
+    """The median time in seconds to run a Python command."""
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        subprocess.run([sys.executable, *args], cwd=ROOT, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(perf_counter() - start)
+    return median(times)
+
+
+def heavy_imports() -> "list[str]":
+    """The heavy modules imported by `import darknet_utils`."""
+    code = "import darknet_utils, sys; print(' '.join(sys.modules))"
+    modules = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+        capture_output=True, text=True).stdout.split()
+    return [m for m in HEAVY_MODULES if m in modules]
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    exceeded = False
+
+    for name, command in COMMANDS.items():
+        ms = startup_time(command, args.repeat) * 1e3
+        over = args.budget is not None and name != "python" and ms > args.budget
+        exceeded |= over
+        print(f"{name:<20} {ms:8.1f} ms{'  over budget' if over else ''}")
+
+    heavy = heavy_imports()
+    if heavy:
+        print(f"import darknet_utils loads {', '.join(heavy)}")
+
+    sys.exit(1 if exceeded or heavy else 0)
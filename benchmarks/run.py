@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+
+"""
+Benchmark suite timing each stage of a dataset build on synthetic
+labelImg datasets of increasing size.
+
+Run from the repository root:
+
+    python -m benchmarks.run --scales 1000 10000 --output bench.json
+    python -m benchmarks.run --scales 1000 10000 --compare bench.json
+"""
+
+from darknet_utils import *
+from .synthetic import generate_dataset
+
+from argparse import ArgumentParser
+from contextlib import redirect_stderr, redirect_stdout
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import io
+import json
+import platform
+import subprocess
+
+from rich.table import Table
+from rich import print as rprint
+
+
+def parse_args():
+    parser = ArgumentParser(description="Time the dataset build stages on synthetic datasets.")
+
+    parser.add_argument("--scales", "-n", type=int, nargs="+", default=[1_000, 10_000],
+        help="The dataset sizes in number of images.")
+    parser.add_argument("--boxes", "-b", type=int, default=5,
+        help="The mean number of boxes per image.")
+    parser.add_argument("--labels", "-l", type=int, default=6,
+        help="The size of the label vocabulary.")
+    parser.add_argument("--folders", "-f", type=int, default=4,
+        help="The number of top-level folders.")
+    parser.add_argument("--depth", "-d", type=int, default=1,
+        help="The nesting depth of image folders.")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+        help="The number of processes used by parallel stages, 0 for one per CPU core.")
+    parser.add_argument("--repeat", "-r", type=int, default=3,
+        help="The number of runs per scale, the fastest one is reported.")
+    parser.add_argument("--output", "-o", type=Path, default=None,
+        help="The JSON file where to save the results.")
+    parser.add_argument("--compare", "-c", type=Path, default=None,
+        help="A JSON file of previous results to compare with.")
+
+    return parser.parse_args()
+
+
+def run_stages(folders: "list[Path]", save_dir: Path, args) -> "dict[str, float]":
+    """Run all the stages once and return the time taken by each one."""
+    timings = {}
+    recursive = args.depth > 0
+
+    def timed(stage: str, func):
+        start = perf_counter()
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            result = func()
+        timings[stage] = perf_counter() - start
+        return result
+
+    annotations = timed("parse_xml_folders",
+        lambda: parse_xml_folders(folders, recursive, workers=args.workers))
+    timed("print_stats", annotations.print_stats)
+    timed("square_boxes", lambda: annotations.square_boxes(ratio=7.5/100))
+    timed("map_labels", lambda: annotations.map_labels({l: l.upper() for l in annotations.labels()}))
+    timed("create_yolo_trainval",
+        lambda: create_yolo_trainval(annotations, save_dir=save_dir, exist_ok=True))
+
+    return timings
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: "list[dict]", previous: "list[dict]" = None):
+    previous = {(r["scale"], r["stage"]): r["seconds"] for r in previous or []}
+
+    table = Table()
+    table.add_column("Images", justify="right")
+    table.add_column("Stage")
+    table.add_column("Time (ms)", justify="right")
+    table.add_column("Images/s", justify="right")
+    if previous:
+        table.add_column("Previous (ms)", justify="right")
+        table.add_column("Speedup", justify="right")
+
+    for r in results:
+        row = [f"{r['scale']}", r["stage"], f"{r['seconds'] * 1e3:.1f}",
+            f"{r['scale'] / r['seconds']:.0f}"]
+        if previous:
+            old = previous.get((r["scale"], r["stage"]))
+            row += ["-", "-"] if old is None else [f"{old * 1e3:.1f}", f"{old / r['seconds']:.2f}x"]
+        table.add_row(*row)
+
+    rprint(table)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = []
+
+    for scale in args.scales:
+        with TemporaryDirectory() as tmp:
+            folders = generate_dataset(Path(tmp) / "dataset", scale,
+                boxes_per_image=args.boxes, labels=args.labels,
+                folders=args.folders, depth=args.depth)
+
+            runs = [run_stages(folders, Path(tmp) / "yolo_trainval", args)
+                for _ in range(args.repeat)]
+
+        for stage in runs[0]:
+            results.append({"scale": scale, "stage": stage,
+                "seconds": min(run[stage] for run in runs)})
+
+    previous = json.loads(args.compare.read_text())["results"] if args.compare else None
+    print_results(results, previous)
+
+    if args.output:
+        args.output.write_text(json.dumps({
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "parameters": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "results": results,
+        }, indent=2, default=str))
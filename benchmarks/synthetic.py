@@ -0,0 +1,113 @@
+"""
+Generator of synthetic labelImg datasets for benchmarks.
+"""
+
+from pathlib import Path
+from random import Random
+import struct
+import zlib
+
+
+XML_TEMPLATE = """<annotation>
+	<folder>{folder}</folder>
+	<filename>{filename}</filename>
+	<path>{path}</path>
+	<source>
+		<database>Unknown</database>
+	</source>
+	<size>
+		<width>{width}</width>
+		<height>{height}</height>
+		<depth>3</depth>
+	</size>
+	<segmented>0</segmented>
+{objects}</annotation>
+"""
+
+OBJECT_TEMPLATE = """	<object>
+		<name>{label}</name>
+		<pose>Unspecified</pose>
+		<truncated>0</truncated>
+		<difficult>0</difficult>
+		<bndbox>
+			<xmin>{xmin}</xmin>
+			<ymin>{ymin}</ymin>
+			<xmax>{xmax}</xmax>
+			<ymax>{ymax}</ymax>
+		</bndbox>
+	</object>
+"""
+
+
+def placeholder_png(width: int, height: int) -> bytes:
+    """A valid black RGB PNG image, small thanks to compression."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data \
+            + struct.pack(">I", zlib.crc32(kind + data))
+
+    row = b"\x00" + bytes(3 * width)  # Filter type byte + pixels
+    return b"\x89PNG\r\n\x1a\n" \
+        + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)) \
+        + chunk(b"IDAT", zlib.compress(row * height, 9)) \
+        + chunk(b"IEND", b"")
+
+
+def generate_dataset(
+    root: Path,
+    images: int,
+    boxes_per_image: int = 5,
+    labels: int = 6,
+    folders: int = 4,
+    depth: int = 1,
+    image_size: "tuple[int, int]" = (640, 480),
+    seed: int = 0,
+) -> "list[Path]":
+    """
+    Generate a dataset of labelImg .xml files and placeholder .png images.
+
+    Images are spread over `folders` top-level folders, each one with
+    nested sub-folders `depth` levels deep. The number of boxes of each
+    image is uniformly drawn in 0...2 * boxes_per_image.
+
+    Parameters:
+    - root: the folder where to write the dataset.
+    - images: the number of images.
+    - boxes_per_image: the mean number of boxes per image.
+    - labels: the size of the label vocabulary.
+    - folders: the number of top-level folders.
+    - depth: the nesting depth of the image folders in each top-level folder.
+    - image_size: the image width and height.
+    - seed: the random seed.
+
+    Returns:
+    - The top-level folders, to be parsed recursively if `depth > 0`.
+    """
+    random_gen = Random(seed)
+    width, height = image_size
+    image_content = placeholder_png(width, height)
+    vocabulary = [f"label_{i}" for i in range(labels)]
+
+    top_folders = [Path(root) / f"folder_{i}" for i in range(folders)]
+    leaf_folders = [f.joinpath(*(f"level_{d}" for d in range(depth))) for f in top_folders]
+    for folder in leaf_folders:
+        folder.mkdir(parents=True, exist_ok=True)
+
+    for i in range(images):
+        folder = leaf_folders[i % folders]
+        image_file = folder / f"image_{i:08}.png"
+        xml_file = image_file.with_suffix(".xml")
+
+        objects = []
+        for _ in range(random_gen.randint(0, 2 * boxes_per_image)):
+            box_w = random_gen.randint(1, width // 4)
+            box_h = random_gen.randint(1, height // 4)
+            xmin = random_gen.randint(0, width - box_w)
+            ymin = random_gen.randint(0, height - box_h)
+            objects.append(OBJECT_TEMPLATE.format(label=random_gen.choice(vocabulary),
+                xmin=xmin, ymin=ymin, xmax=xmin + box_w, ymax=ymin + box_h))
+
+        image_file.write_bytes(image_content)
+        xml_file.write_text(XML_TEMPLATE.format(folder=folder.name, filename=image_file.name,
+            path=image_file, width=width, height=height, objects="".join(objects)))
+
+    return top_folders
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+"""
+Benchmark of the regular expression parser of labelImg files against
+lxml on a synthetic dataset. Both parsers should give the same
+annotations, which is checked on a corpus of edge cases by
+`tests/test_xml_parser.py`.
+
+Run from the repository root:
+
+    python -m benchmarks.xml_parser --files 20000
+"""
+
+from darknet_utils import glob, parse_xml_files
+from .synthetic import generate_dataset
+
+from argparse import ArgumentParser
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+
+def parse_args():
+    parser = ArgumentParser(description="Benchmark the fast labelImg parser against lxml.")
+
+    parser.add_argument("--files", "-n", type=int, default=10_000,
+        help="The number of files of the benchmark dataset.")
+    parser.add_argument("--boxes", "-b", type=int, default=5,
+        help="The mean number of boxes per file.")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+        help="The number of processes used to parse the files, 0 for one per CPU core.")
+
+    return parser.parse_args()
+
+
+def timed(name: str, func, files: "list[Path]"):
+    start = perf_counter()
+    annotations = func(files)
+    elapsed = perf_counter() - start
+    print(f"{name:<8} {elapsed * 1e3:9.1f} ms {len(files) / elapsed:12.0f} files/s")
+    return annotations, elapsed
+
+
+def compact(annotations) -> list:
+    return [(str(a.image_path), a.image_size, [(b.label, b._xmin, b._ymin, b._xmax, b._ymax, b.confidence)
+        for b in a.boxes]) for a in annotations]
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    with TemporaryDirectory() as tmp:
+        folders = generate_dataset(Path(tmp) / "dataset", args.files, args.boxes, depth=0)
+        files = [f for folder in folders for f in glob(folder, ".xml")]
+
+        lxml, lxml_time = timed("lxml", lambda f: parse_xml_files(f, workers=args.workers, fast=False), files)
+        fast, fast_time = timed("fast", lambda f: parse_xml_files(f, workers=args.workers, fast=True), files)
+        print(f"Speedup: {lxml_time / fast_time:.2f}x")
+
+        assert compact(fast) == compact(lxml), "annotations differ from lxml"
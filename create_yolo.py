@@ -1,15 +1,18 @@
 #!/usr/bin/env python
 
-from darknet_utils import *
+# Only light modules are imported before parsing the arguments
+from darknet_utils import DEDUP_POLICIES, INTEGRITY_POLICIES, LINK_MODES, PROFILE_ENV, SPLIT_MODES
 
 from argparse import ArgumentParser
+from itertools import chain
+from operator import methodcaller
 from pathlib import Path
 
 
 def parse_args():
     parser = ArgumentParser()
 
-    parser.add_argument("folders", type=Path, nargs="+", 
+    parser.add_argument("folders", type=Path, nargs="*", 
         help="The folders to parse.")
     parser.add_argument("--recursive", "-r", action="store_true",
         help="Parse the folders recursively.")
@@ -17,9 +20,49 @@ def parse_args():
         help="Where to store the created database.")
     parser.add_argument("--labels", "-l", nargs="+", default=None,
         help="The labels to consider for parsing. Default: all found labels.")
+    parser.add_argument("--noobj", "-o", type=Path, nargs="+", default=[],
+        help="Folders of background images without objects, added as empty annotations.")
+    parser.add_argument("--noobj_ext", default=".jpg",
+        help="The extension of background images.")
+    parser.add_argument("--yolo", "-y", type=Path, nargs="+", default=[],
+        help="Databases created by this script to add to the annotations, e.g. to split them \
+            again or to merge them with new folders.")
+    parser.add_argument("--validate", "-v", action="store_true",
+        help="Check the annotations before the export: images which are missing or not readable \
+            are removed, other issues (size mismatch, boxes outside of the image or empty, labels \
+            not in --labels) are reported. Issues are logged in parser.log and image sizes are \
+            cached in ~/.cache/darknet_utils/.")
+    parser.add_argument("--integrity", choices=INTEGRITY_POLICIES, default=None,
+        help="Fully decode the images before the export and remove the images which cannot be \
+            decoded, e.g. truncated files, only dropping their annotations or also moving them to \
+            --quarantine_dir. Errors are logged in parser.log and results are cached in \
+            ~/.cache/darknet_utils/ so that only new images are decoded.")
+    parser.add_argument("--quarantine_dir", type=Path, default="quarantine/",
+        help="Where corrupt images are moved with --integrity quarantine, under their absolute path.")
+    parser.add_argument("--dedup", "-d", choices=DEDUP_POLICIES, default=None,
+        help="Remove images whose content is identical to a previous image, keeping the first \
+            annotation only or merging the boxes of all annotations. Hashes are cached in \
+            ~/.cache/darknet_utils/. Not supported with --stream.")
+    parser.add_argument("--nms", type=float, default=None, metavar="IOU",
+        help="Remove the boxes overlapping a box of the same label with an IoU greater than \
+            this threshold, keeping the box with the highest confidence or the first one. \
+            Removed boxes are logged in parser.log.")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+        help="The number of processes used to parse the annotations, 0 for one per CPU core.")
+    parser.add_argument("--cache", "-c", action="store_true",
+        help="Cache parsed annotations of each folder in ~/.cache/darknet_utils/ and only parse files \
+            that changed since the last run.")
+    parser.add_argument("--cache_size", type=int, default=None,
+        help="The maximum number of files stored in each folder cache.")
+    parser.add_argument("--clear_cache", action="store_true",
+        help="Remove the folder caches before parsing.")
 
     parser.add_argument("--train_ratio", "-t", type=float, default=80/100,
         help="The percent of train samples.")
+    parser.add_argument("--split", choices=SPLIT_MODES, default="shuffle",
+        help="How images are assigned to the train and val sets: the first train_ratio percent \
+            of the shuffled images, a hash of each image path which does not change \
+            when images are added to the dataset, or a split of each label with train_ratio.")
     parser.add_argument("--norm", "-m", nargs="*", default=None,
         help="A list of labels to normalize to a square bounding box. If \
             this option is specified without a list of labels all labels \
@@ -29,23 +72,92 @@ def parse_args():
             the percent of the image shortest side length.")
     parser.add_argument("--remove_empty", "-e", action="store_true",
         help="Do not use empty annotations.")
+    parser.add_argument("--precision", "-p", type=int, default=None,
+        help="The number of decimals of the box coordinates. Default: shortest exact representation.")
+    parser.add_argument("--link_mode", "-k", choices=LINK_MODES, default="copy",
+        help="How images are exported. Falls back to a copy if not supported by the filesystem.")
+    parser.add_argument("--incremental", "-i", action="store_true",
+        help="Only write the files that changed since the previous export in the same folder.")
+    parser.add_argument("--image_jobs", type=int, default=8,
+        help="The maximum number of concurrent image copies.")
+    parser.add_argument("--label_jobs", type=int, default=16,
+        help="The maximum number of concurrent label file writes.")
+    parser.add_argument("--device_jobs", type=int, default=None,
+        help="The maximum number of concurrent image copies per source device, e.g. 1 for spinning disks.")
+    parser.add_argument("--stream", action="store_true",
+        help="Parse, transform and export annotations one at a time in bounded memory. \
+            Statistics are not printed. Not supported with --cache, --clear_cache, --dedup, \
+            --incremental and --split stratified.")
+    parser.add_argument("--profile", type=Path, default=None,
+        help=f"Save the time, counters and peak memory of each stage to a .json or .csv file. \
+            Profiling can also be enabled with the {PROFILE_ENV}=1 environment variable.")
 
-    return parser.parse_args()
+    args = parser.parse_args()
 
+    if args.stream:
+        unsupported = [option for option, used in (
+            ("--cache", args.cache),
+            ("--clear_cache", args.clear_cache),
+            ("--dedup", args.dedup is not None),
+            ("--incremental", args.incremental),
+            ("--split stratified", args.split == "stratified"),
+        ) if used]
+        if unsupported:
+            parser.error(f"{', '.join(unsupported)} not supported with --stream")
+
+    return args
 
-if __name__ == "__main__":
-    args = parse_args()
 
-    resolve_xml_file_paths(args.folders, recursive=args.recursive)
+def create(args):
+    if args.clear_cache:
+        for folder in args.folders:
+            parse_cache(folder).clear()
 
     annotations = parse_xml_folders(
         folders=args.folders, 
         recursive=args.recursive,
-        labels=args.labels)
+        labels=args.labels,
+        workers=args.workers,
+        cache=args.cache,
+        cache_size=args.cache_size)
 
     if args.remove_empty:
         annotations.remove_empty()
 
+    for folder in args.noobj:
+        annotations += create_noobj_annotations(folder, args.noobj_ext, args.workers)
+
+    for folder in args.yolo:
+        annotations += parse_yolo_trainval(folder, labels=args.labels, workers=args.workers)
+
+    if args.validate:
+        with image_cache() as cache:
+            report = validate(annotations, args.labels, args.workers, cache)
+        log_issues(report)
+        report.print_report()
+
+        invalid = report.invalid_images()
+        annotations.annotations = [a for a in annotations if a.image_path not in invalid]
+        print(f"Validation: {report}, {len(invalid)} images removed")
+
+    if args.integrity is not None:
+        with image_cache() as cache:
+            result = check_integrity(annotations, args.integrity, args.quarantine_dir, args.workers, cache)
+        log_corrupt(result)
+        print(f"Integrity: {result}")
+
+    if args.dedup is not None:
+        with hash_cache() as cache:
+            result = deduplicate(annotations, args.dedup, args.workers, cache)
+        for duplicate, original in result.removed:
+            logger.warning(f"Removed '{duplicate}', duplicate of '{original}'.")
+        print(f"Deduplication: {result}")
+
+    if args.nms is not None:
+        merged = merge_overlaps(annotations, args.nms)
+        log_overlaps(annotations, merged)
+        print(f"Overlap merging: {merged}")
+
     annotations.print_stats()
 
     if args.norm is not None and len(args.norm) == 0:
@@ -53,9 +165,117 @@ if __name__ == "__main__":
     elif args.norm is not None:
         annotations.square_boxes(ratio=args.norm_ratio, labels=args.norm)
 
-    create_yolo_trainval(
+    stats = create_yolo_trainval(
         annotations=annotations,
         labels=args.labels,
         save_dir=args.save_dir, 
         train_ratio=args.train_ratio, 
-        exist_ok=True)
\ No newline at end of file
+        exist_ok=True,
+        precision=args.precision,
+        link_mode=args.link_mode,
+        incremental=args.incremental,
+        image_jobs=args.image_jobs,
+        label_jobs=args.label_jobs,
+        device_jobs=args.device_jobs,
+        split=args.split)
+    print(f"Images: {stats}")
+
+
+def log_issues(report):
+    for issue in report.issues:
+        logger.warning(f"{issue}")
+
+
+def log_corrupt(result):
+    for image, error in result.corrupt:
+        logger.warning(f"Removed '{image}', the image cannot be decoded: {error}")
+
+
+def log_overlaps(annotations, overlaps):
+    for image, kept, removed, iou in zip(*(a.tolist() for a in overlaps)):
+        logger.warning(f"Removed box {removed} of '{annotations[image].image_path}', "
+            f"overlapping box {kept} with IoU {iou:.2f}.")
+
+
+def stream(args):
+    annotations = iter_xml_folders(
+        folders=args.folders,
+        recursive=args.recursive,
+        labels=args.labels,
+        workers=args.workers)
+
+    if args.remove_empty:
+        annotations = (a for a in annotations if not a.is_empty)
+
+    noobj = (create_noobj_annotations(folder, args.noobj_ext, args.workers) for folder in args.noobj)
+    yolo = (parse_yolo_trainval(folder, labels=args.labels, workers=args.workers) for folder in args.yolo)
+    annotations = chain(annotations, chain.from_iterable(noobj), chain.from_iterable(yolo))
+
+    transforms = []
+    cache = image_cache() if args.validate or args.integrity else None
+    if args.validate:
+        def validated(annotation):
+            report = validate(annotation, args.labels, cache=cache)
+            log_issues(report)
+            return None if report.invalid_images() else annotation
+        transforms.append(validated)
+    if args.integrity is not None:
+        def decodable(annotation):
+            result = check_integrity(Annotations([annotation]), args.integrity, args.quarantine_dir, cache=cache)
+            log_corrupt(result)
+            return None if result.corrupt else annotation
+        transforms.append(decodable)
+    if args.nms is not None:
+        def nms(annotation):
+            log_overlaps([annotation], merge_overlaps(annotation, args.nms))
+            return annotation
+        transforms.append(nms)
+    if args.norm is not None:
+        transforms.append(methodcaller("square_boxes", args.norm_ratio, args.norm or None))
+
+    stats = stream_yolo_trainval(
+        annotations=annotations,
+        labels=args.labels,
+        save_dir=args.save_dir,
+        train_ratio=args.train_ratio,
+        split=args.split,
+        exist_ok=True,
+        transforms=transforms,
+        precision=args.precision,
+        link_mode=args.link_mode,
+        image_jobs=args.image_jobs,
+        label_jobs=args.label_jobs,
+        device_jobs=args.device_jobs)
+    print(f"Images: {stats}")
+
+    if cache is not None:
+        cache.save()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    from darknet_utils import (Annotations, check_integrity, create_noobj_annotations, 
+        create_yolo_trainval, deduplicate, hash_cache, image_cache, iter_xml_folders, merge_overlaps, 
+        parse_cache, parse_xml_folders, parse_yolo_trainval, profiler, resolve_xml_file_paths, stream_yolo_trainval, validate)
+    from darknet_utils.utils import logger
+
+    if args.profile:
+        profiler.enable()
+
+    # Images of the databases would be overwritten while being exported
+    assert args.save_dir.resolve() not in {f.resolve() for f in args.yolo}, \
+        "the save directory cannot be one of the --yolo databases"
+
+    resolved = resolve_xml_file_paths(args.folders, recursive=args.recursive, workers=args.workers)
+    print(f"Resolved paths: {resolved.changed} changed, {resolved.unchanged} unchanged, {resolved.failed} failed")
+
+    if args.stream:
+        stream(args)
+    else:
+        create(args)
+
+    if profiler.enabled:
+        profiler.print_report()
+    if args.profile:
+        profiler.save(args.profile)
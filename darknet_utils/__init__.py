@@ -1,7 +1,98 @@
-from .bounding_box import BoundingBox
-from .annotation import Annotation
+"""
+Utilities to read .xml annotations and create Darknet databases.
 
-from .utils import *
+Submodules are imported on first access to one of their attributes
+(PEP 562) so that importing the package and the scripts is fast.
+"""
 
-from .parsers import parse_xml_file, parse_xml_folder, parse_xml_folders
-from .library import create_noobj_folder, create_yolo_trainval, resolve_xml_file_paths
\ No newline at end of file
+import importlib
+
+# Public attributes and the submodule defining them
+_EXPORTS = {
+    "BoundingBox": "bounding_box",
+    "Annotation": "annotation",
+    "Annotations": "annotation",
+    "ColumnarAnnotations": "columnar",
+    "DatasetStats": "summary",
+
+    "get_image_size": "utils",
+    "get_image_sizes": "utils",
+    "probe_image_size": "utils",
+    "dict_grouping": "utils",
+    "glob": "utils",
+    "atomic_write": "utils",
+    "resolve_workers": "utils",
+    "chunked": "utils",
+    "parallel_map": "utils",
+    "parallel_imap": "utils",
+    "FileCache": "cache",
+    "cached_map": "cache",
+    "PROFILE_ENV": "profiling",
+    "Profiler": "profiling",
+    "StageRecord": "profiling",
+    "profiler": "profiling",
+
+    "parse_xml_file": "parsers",
+    "parse_xml_files": "parsers",
+    "parse_xml_folder": "parsers",
+    "parse_xml_folders": "parsers",
+    "iter_xml_folders": "parsers",
+    "parse_cache": "parsers",
+    "yolo_reprs": "yolo",
+    "parse_yolo_files": "yolo",
+    "parse_yolo_trainval": "yolo",
+    "parse_yolo_detections": "yolo",
+    "DEDUP_POLICIES": "dedup",
+    "DedupResult": "dedup",
+    "deduplicate": "dedup",
+    "hash_cache": "dedup",
+    "Snapshot": "snapshot",
+    "save_snapshot": "snapshot",
+    "load_snapshot": "snapshot",
+    "MERGE_MODES": "iou",
+    "BoxOverlaps": "iou",
+    "iou_matrix": "iou",
+    "find_overlaps": "iou",
+    "merge_overlaps": "iou",
+    "COCO_IOU_THRESHOLDS": "evaluation",
+    "Evaluation": "evaluation",
+    "evaluate_detections": "evaluation",
+    "VALIDATION_CHECKS": "validation",
+    "ValidationIssue": "validation",
+    "ValidationReport": "validation",
+    "validate": "validation",
+    "image_cache": "validation",
+    "INTEGRITY_POLICIES": "integrity",
+    "IntegrityResult": "integrity",
+    "check_integrity": "integrity",
+    "LINK_MODES": "export",
+    "AsyncExporter": "export",
+    "ExportJob": "export",
+    "ExportStats": "export",
+    "export_file": "export",
+    "create_noobj_annotations": "library",
+    "create_noobj_folder": "library",
+    "create_yolo_trainval": "library",
+    "stream_yolo_trainval": "library",
+    "hash_split": "library",
+    "stratified_split": "library",
+    "resolve_xml_file_paths": "library",
+    "ResolveResult": "library",
+    "SPLIT_MODES": "library",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value  # Next accesses do not go through __getattr__
+    return value
+
+
+def __dir__() -> "list[str]":
+    return sorted({*globals(), *__all__})
@@ -1,13 +1,11 @@
 from .bounding_box import BoundingBox
+from .profiling import profiler
 from .utils import *
 
 from typing import Callable, Iterator, Mapping, Sequence
 from os import PathLike
 from pathlib import Path
 
-from rich.table import Table
-from rich import print as rprint
-
 
 class Annotation:
     """
@@ -161,8 +159,10 @@ class Annotations:
         Parameters:
         - mapping: a dictionary of label names translations
         """
-        for annotation in self.annotations:
-            annotation.map_labels(map)
+        with profiler.stage("transform.map_labels") as stage:
+            for annotation in self.annotations:
+                annotation.map_labels(map)
+            stage.count(images=len(self))
         return self
 
     def filter(self, 
@@ -177,44 +177,27 @@ class Annotations:
         Parameters:
         - is_included: the box predicate.
         """
-        for annotation in self.annotations:
-            annotation.filter(is_included)
+        with profiler.stage("transform.filter") as stage:
+            for annotation in self.annotations:
+                annotation.filter(is_included)
+            stage.count(images=len(self))
         return self
 
     def remove_empty(self) -> "Annotations":
         """Removes empty annotations."""
-        self.annotations = [a for a in self.annotations if not a.is_empty]
+        with profiler.stage("transform.remove_empty") as stage:
+            count = len(self)
+            self.annotations = [a for a in self.annotations if not a.is_empty]
+            stage.count(images=count, removed=count - len(self))
         return self
 
     def print_stats(self) -> "Annotations":
-        """Prints the annotations statistics."""
-        table = Table(show_footer=True)
-
-        box_count = defaultdict(int)
-        image_count = defaultdict(set)
-
-        for a in self.annotations:
-            if len(a.boxes) == 0:
-                image_count["<empty>"].add(a.image_path)
-            for b in a.boxes:
-                label = b.label
-                box_count[label] += 1
-                image_count[label].add(a.image_path)
-
-        tot_boxes = sum(box_count.values())
-        image_count = {l: len(p) for l, p in image_count.items()}
-        tot_imgs = len(self)
-
-        table.add_column("Label", "Total")
-        table.add_column("Images", f"{tot_imgs}", justify="right")
-        table.add_column("Boxes", f"{tot_boxes}", justify="right")
+        """Prints the annotations statistics, see `DatasetStats`."""
+        from .summary import DatasetStats
 
-        for label in sorted(image_count.keys()):
-            nb_boxes = box_count[label]
-            nb_images = image_count[label]
-            table.add_row(label, f"{nb_images}", f"{nb_boxes}")
-
-        rprint(table)
+        with profiler.stage("stats") as stage:
+            stats = DatasetStats.from_annotations(self).print_stats()
+            stage.count(images=stats.images, boxes=stats.boxes)
 
         return self
 
@@ -232,6 +215,15 @@ class Annotations:
         Returns:
         - The transformed annotations.
         """
-        for annotation in self.annotations:
-            annotation.square_boxes(ratio, labels)
-        return self
\ No newline at end of file
+        with profiler.stage("transform.square_boxes") as stage:
+            for annotation in self.annotations:
+                annotation.square_boxes(ratio, labels)
+            stage.count(images=len(self))
+        return self
+
+    def to_columnar(self) -> "ColumnarAnnotations":
+        """
+        Convert to the columnar representation, see `ColumnarAnnotations`.
+        """
+        from .columnar import ColumnarAnnotations
+        return ColumnarAnnotations.from_annotations(self)
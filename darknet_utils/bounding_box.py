@@ -147,5 +147,5 @@ class BoundingBox:
         """
         coords = self.yolo_coords(img_size)
         if include_confidence and self.confidence is not None:
-            return " ".join((self.label, self.confidence, *(f"{c}" for c in coords)))      
+            return " ".join((self.label, f"{self.confidence}", *(f"{c}" for c in coords)))      
         return " ".join((self.label, *(f"{c}" for c in coords)))
\ No newline at end of file
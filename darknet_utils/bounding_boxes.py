@@ -2,12 +2,10 @@ from .bounding_box import BoundingBox
 from .utils import *
 
 from typing import Callable, KeysView, Sequence, Union, ItemsView, ValuesView
+from collections import Counter
 from copy import copy
 from itertools import chain
 
-from rich.table import Table
-from rich import print as rprint
-
 
 class BoundingBoxes:
     """
@@ -100,17 +98,19 @@ class BoundingBoxes:
 
     def print_stats(self):
         """Prints the dataset statistics represented by this object."""
+        from rich.table import Table
+        from rich import print as rprint
+
         tot_imgs = len(self)
-        all_boxes = dict_grouping(self.all_boxes(), by_key=lambda v: v.label)
-        tot_boxes = sum(len(v) for v in all_boxes.values())
+        box_count = Counter(b.label for b in self.all_boxes())
+        tot_boxes = sum(box_count.values())
 
         table = Table(title=f"{tot_imgs} Images", show_footer=True)
 
         table.add_column("Label", "Total")
         table.add_column("Boxes", f"{tot_boxes}", justify="right")
 
-        for label in sorted(all_boxes.keys()):
-            boxes = all_boxes[label]
-            table.add_row(label, f"{len(boxes)}")
+        for label in sorted(box_count.keys()):
+            table.add_row(label, f"{box_count[label]}")
 
         rprint(table)
@@ -0,0 +1,188 @@
+from .utils import atomic_write, parallel_map
+
+from os import PathLike
+from pathlib import Path
+from typing import Callable, Sequence
+import os
+import pickle
+
+
+class FileCache:
+    """
+    Persistent cache of values computed from files, e.g. parsed annotations,
+    stored in a single local cache file.
+
+    Entries are keyed by file path and stay valid as long as the file
+    modification time and size do not change. When the cache holds more
+    than `max_entries` entries, the least recently used ones are dropped
+    when saving.
+
+    Use it as a context manager to save it on exit:
+
+    ```
+    with FileCache("dataset/.cache") as cache:
+        value = cache.get(file)
+        if value is None:
+            value = compute(file)
+            cache.put(file, value)
+    ```
+    """
+
+    VERSION = 1
+
+    def __init__(self, cache_file: PathLike, max_entries: int = None):
+        assert max_entries is None or max_entries >= 0, "max_entries should be positive"
+
+        self.cache_file = Path(cache_file).expanduser()
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = self._load()
+        self._modified = False
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __enter__(self) -> "FileCache":
+        return self
+
+    def __exit__(self, *exc):
+        self.save()
+
+    def __str__(self) -> str:
+        return f"{self.hits} hits, {self.misses} misses ({len(self)} entries in '{self.cache_file}')"
+
+    @staticmethod
+    def signature(file: PathLike) -> "tuple[int, int]":
+        """The (modification time, size) pair identifying a file version."""
+        stat = os.stat(file)
+        return stat.st_mtime_ns, stat.st_size
+
+    def get(self, file: PathLike, signature: "tuple[int, int]" = None, default=None):
+        """
+        Retreive the value cached for a file.
+
+        Parameters:
+        - file: the file path.
+        - signature: the file signature if already known, see `signature()`.
+        - default: the value returned if there is no up-to-date entry.
+
+        Returns:
+        - The cached value or `default` if the entry is missing or stale.
+        """
+        key = str(file)
+        entry = self._entries.pop(key, None)
+
+        if entry is not None and entry[0] == (signature or self.signature(file)):
+            self._entries[key] = entry  # Mark as recently used
+            self.hits += 1
+            return entry[1]
+
+        if entry is not None:
+            self._modified = True
+        self.misses += 1
+        return default
+
+    def put(self, file: PathLike, value, signature: "tuple[int, int]" = None):
+        """
+        Cache a value computed from a file.
+
+        Parameters:
+        - file: the file path.
+        - value: the value to cache, should be picklable.
+        - signature: the file signature at the time the value was
+        computed, see `signature()`.
+        """
+        key = str(file)
+        self._entries.pop(key, None)
+        self._entries[key] = (signature or self.signature(file), value)
+        self._modified = True
+
+    def invalidate(self, files: "list[PathLike]" = None):
+        """
+        Remove cache entries.
+
+        Parameters:
+        - files: the files whose entries are removed. By default all
+        entries are removed.
+        """
+        if files is None:
+            self._modified |= len(self._entries) != 0
+            self._entries.clear()
+        else:
+            for file in files:
+                self._modified |= self._entries.pop(str(file), None) is not None
+
+    def clear(self):
+        """Remove all the entries and delete the cache file."""
+        self._entries.clear()
+        self._modified = False
+        self.cache_file.unlink(missing_ok=True)
+
+    def save(self):
+        """Write the cache file if it was modified."""
+        if self.max_entries is not None:
+            excess = len(self._entries) - self.max_entries
+            for key in list(self._entries)[:max(excess, 0)]:
+                del self._entries[key]
+                self._modified = True
+
+        if not self._modified:
+            return
+
+        content = pickle.dumps((self.VERSION, self._entries), protocol=pickle.HIGHEST_PROTOCOL)
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        atomic_write(self.cache_file, content)
+        self._modified = False
+
+    def _load(self) -> dict:
+        try:
+            version, entries = pickle.loads(self.cache_file.read_bytes())
+        except (OSError, pickle.UnpicklingError, EOFError, ValueError, TypeError):
+            return {}
+        return entries if version == self.VERSION else {}
+
+
+def cached_map(
+    func: Callable[[str], object],
+    files: "Sequence[str]",
+    kind: str,
+    workers: int = 1,
+    cache: FileCache = None,
+    unit: str = "files",
+) -> list:
+    """
+    `parallel_map()` of a function of files, looking up a cache first.
+    Cache entries map kinds of values, e.g. "size" or "hash", to the
+    value computed from the file so that several values can be cached
+    for the same file.
+
+    Parameters:
+    - func: the function computing a value from a file path, must be
+    defined at module level.
+    - files: the file paths, the files should exist.
+    - kind: the name of the value in the cache entries.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: an optional cache.
+    - unit: the progress bar unit.
+
+    Returns:
+    - The values in the same order as `files`.
+    """
+    if cache is None:
+        return parallel_map(func, files, workers, unit=unit)
+
+    entries = [cache.get(f, default={}) for f in files]
+    stale = [i for i, e in enumerate(entries) if kind not in e]
+
+    # Entries without this kind of value are misses for this call
+    outdated = sum(1 for i in stale if entries[i])
+    cache.hits -= outdated
+    cache.misses += outdated
+    values = parallel_map(func, [files[i] for i in stale], workers, unit=unit)
+
+    for i, value in zip(stale, values):
+        entries[i] = {**entries[i], kind: value}
+        cache.put(files[i], entries[i])
+
+    return [e[kind] for e in entries]
@@ -0,0 +1,338 @@
+from .bounding_box import BoundingBox
+from .annotation import Annotation, Annotations
+
+from typing import Callable, Iterator, Mapping, Sequence, Union
+from pathlib import Path
+
+import numpy as np
+
+
+class ColumnarAnnotations:
+    """
+    Bounding box annotations for a collection of images stored in
+    columns rather than as `Annotation` and `BoundingBox` objects.
+
+    The boxes of all the images are concatenated in NumPy arrays and
+    the boxes of image `i` are the rows `offsets[i]:offsets[i + 1]`:
+
+    - coords: (N, 4) float array of absolute (xmin, ymin, xmax, ymax).
+    - label_ids: (N,) int array indexing `vocabulary`.
+    - confidences: (N,) float array, NaN if the box has no confidence.
+
+    It exposes the same interface as `Annotations`, with vectorized
+    implementations, except that slices are new collections rather than
+    lists. Use `from_annotations()` and `to_annotations()` to convert
+    from and to the object model.
+    """
+
+    def __init__(self,
+        image_paths: "list[Path]",
+        image_sizes: np.ndarray,
+        offsets: np.ndarray,
+        coords: np.ndarray,
+        label_ids: np.ndarray,
+        vocabulary: "list[str]",
+        confidences: np.ndarray = None,
+    ):
+        self.paths = [p if isinstance(p, Path) else Path(p) for p in image_paths]
+        self.image_sizes = np.asarray(image_sizes, dtype=np.int64).reshape(-1, 2)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.coords = np.asarray(coords, dtype=np.float64).reshape(-1, 4)
+        self.label_ids = np.asarray(label_ids, dtype=np.int64)
+        self.vocabulary = list(vocabulary)
+        self.confidences = np.full(len(self.label_ids), np.nan) if confidences is None \
+            else np.asarray(confidences, dtype=np.float64)
+
+        assert len(self.offsets) == len(self.paths) + 1, "offsets should have one more item than images"
+        assert len(self.image_sizes) == len(self.paths), "one image size is required per image"
+        assert len(self.coords) == len(self.label_ids) == len(self.confidences) == self.offsets[-1], \
+            "box columns should have the same length"
+
+    @staticmethod
+    def from_annotations(annotations: "Sequence[Annotation]") -> "ColumnarAnnotations":
+        """
+        Convert annotations from the object model to columns.
+        """
+        image_paths, image_sizes, counts = [], [], []
+        coords, label_ids, confidences = [], [], []
+        vocabulary = {}
+
+        for annotation in annotations:
+            image_paths.append(annotation.image_path)
+            image_sizes.append(annotation.image_size)
+            counts.append(len(annotation.boxes))
+            for box in annotation.boxes:
+                coords.append((box._xmin, box._ymin, box._xmax, box._ymax))
+                label_ids.append(vocabulary.setdefault(box.label, len(vocabulary)))
+                confidences.append(box.confidence)
+
+        # None is converted to NaN
+        confidences = np.array(confidences, dtype=np.float64)
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        return ColumnarAnnotations(image_paths, image_sizes, offsets, coords,
+            label_ids, list(vocabulary), confidences)
+
+    def to_annotations(self) -> Annotations:
+        """
+        Convert to the object model.
+        """
+        return Annotations([self[i] for i in range(len(self))])
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def __getitem__(self, index: "Union[int, slice]") -> "Union[Annotation, ColumnarAnnotations]":
+        """
+        Materialize the annotation of one image, or select the images of
+        a slice as a new collection, see `select()`.
+        """
+        if isinstance(index, slice):
+            return self.select(np.arange(len(self))[index])
+
+        index = range(len(self))[index]
+        start, stop = self.offsets[index], self.offsets[index + 1]
+
+        labels = [self.vocabulary[i] for i in self.label_ids[start:stop].tolist()]
+        coords = self.coords[start:stop].tolist()
+        confidences = [None if np.isnan(c) else c for c in self.confidences[start:stop].tolist()]
+
+        boxes = [BoundingBox(l, *c, confidence=s) for l, c, s in zip(labels, coords, confidences)]
+        image_size = tuple(self.image_sizes[index].tolist())
+
+        return Annotation(self.paths[index], image_size, boxes)
+
+    def __setitem__(self, index: int, value: Annotation):
+        """
+        Replace the annotation of one image. This copies the box columns.
+        Slice assignment is not supported.
+        """
+        if isinstance(index, slice):
+            raise TypeError("ColumnarAnnotations only supports the assignment of one annotation")
+
+        index = range(len(self))[index]
+        start, stop = int(self.offsets[index]), int(self.offsets[index + 1])
+        other = ColumnarAnnotations.from_annotations([value])
+
+        # New labels are appended to the vocabulary, existing ids are kept
+        indices = {l: i for i, l in enumerate(self.vocabulary)}
+        label_ids = np.array([indices.setdefault(other.vocabulary[i], len(indices))
+            for i in other.label_ids.tolist()], dtype=np.int64)
+        self.vocabulary = list(indices)
+
+        self.coords = np.concatenate((self.coords[:start], other.coords, self.coords[stop:]))
+        self.label_ids = np.concatenate((self.label_ids[:start], label_ids, self.label_ids[stop:]))
+        self.confidences = np.concatenate((self.confidences[:start], other.confidences, self.confidences[stop:]))
+        self.offsets[index + 1:] += len(label_ids) - (stop - start)
+        self.paths[index] = other.paths[0]
+        self.image_sizes[index] = other.image_sizes[0]
+
+    def __iadd__(self, other: "ColumnarAnnotations") -> "ColumnarAnnotations":
+        vocabulary = sorted(set(self.vocabulary) | set(other.vocabulary))
+        indices = {l: i for i, l in enumerate(vocabulary)}
+        remap_self = np.array([indices[l] for l in self.vocabulary], dtype=np.int64)
+        remap_other = np.array([indices[l] for l in other.vocabulary], dtype=np.int64)
+
+        self.label_ids = np.concatenate((
+            remap_self[self.label_ids] if len(remap_self) else self.label_ids,
+            remap_other[other.label_ids] if len(remap_other) else other.label_ids))
+        self.vocabulary = vocabulary
+        self.offsets = np.concatenate((self.offsets, other.offsets[1:] + self.offsets[-1]))
+        self.paths = self.paths + other.paths
+        self.image_sizes = np.concatenate((self.image_sizes, other.image_sizes))
+        self.coords = np.concatenate((self.coords, other.coords))
+        self.confidences = np.concatenate((self.confidences, other.confidences))
+
+        return self
+
+    def __add__(self, other: "ColumnarAnnotations") -> "ColumnarAnnotations":
+        result = self.select(np.arange(len(self)))
+        result += other
+        return result
+
+    def append(self, annotation: Annotation):
+        """
+        Append an annotation to the annotations. This copies all the
+        columns, prefer building the collection with `from_annotations()`.
+        """
+        self += ColumnarAnnotations.from_annotations([annotation])
+
+    def image_paths(self) -> "list[Path]":
+        """Returns the image paths of all the annotations."""
+        return list(self.paths)
+
+    def labels(self) -> "set[str]":
+        """Returns the unique labels of all the annotations."""
+        return {self.vocabulary[i] for i in np.unique(self.label_ids).tolist()}
+
+    @property
+    def boxes(self) -> Iterator[BoundingBox]:
+        """Iterator of all bounding boxes, materialized as objects."""
+        for i in range(len(self)):
+            yield from self[i].boxes
+
+    @property
+    def box_counts(self) -> np.ndarray:
+        """The number of boxes of each image."""
+        return np.diff(self.offsets)
+
+    @property
+    def image_ids(self) -> np.ndarray:
+        """The index of the image of each box."""
+        return np.repeat(np.arange(len(self)), self.box_counts)
+
+    @property
+    def box_labels(self) -> np.ndarray:
+        """The label of each box as an array of strings."""
+        return np.array(self.vocabulary, dtype=object)[self.label_ids] \
+            if self.vocabulary else np.empty(0, dtype=object)
+
+    def label_mask(self, labels: Sequence[str]) -> np.ndarray:
+        """A boolean mask of the boxes whose label is in `labels`."""
+        included = np.array([l in labels for l in self.vocabulary], dtype=bool)
+        return included[self.label_ids] if len(included) else np.zeros(0, dtype=bool)
+
+    def map_labels(self, map: Mapping[str, str]) -> "ColumnarAnnotations":
+        """
+        Translates the box label of all the boxes according to a mapping.
+
+        Parameters:
+        - mapping: a dictionary of label names translations
+        """
+        used = np.unique(self.label_ids)
+        mapped = [map[self.vocabulary[i]] for i in used.tolist()]
+        vocabulary = sorted(set(mapped))
+        indices = {l: i for i, l in enumerate(vocabulary)}
+
+        remap = np.zeros(len(self.vocabulary), dtype=np.int64)
+        remap[used] = [indices[l] for l in mapped]
+
+        self.label_ids = remap[self.label_ids]
+        self.vocabulary = vocabulary
+        return self
+
+    def filter(self,
+        is_included: Callable[[BoundingBox], bool],
+    ) -> "ColumnarAnnotations":
+        """
+        Filter all bounding boxes given the box predicate.
+
+        The predicate is evaluated on materialized `BoundingBox` objects,
+        prefer `filter_mask()` or `filter_labels()` for large collections.
+
+        WARNING: This can results in empty annotatations. You can
+        remove such annotations with the `.remove_empty()` method.
+
+        Parameters:
+        - is_included: the box predicate.
+        """
+        return self.filter_mask(np.fromiter((is_included(b) for b in self.boxes),
+            dtype=bool, count=len(self.label_ids)))
+
+    def filter_labels(self, labels: Sequence[str]) -> "ColumnarAnnotations":
+        """
+        Keep only the bounding boxes whose label is in `labels`.
+
+        Parameters:
+        - labels: the labels to keep.
+        """
+        return self.filter_mask(self.label_mask(labels))
+
+    def filter_mask(self, mask: np.ndarray) -> "ColumnarAnnotations":
+        """
+        Keep only the bounding boxes where `mask` is True.
+
+        Parameters:
+        - mask: a boolean array with one value per box.
+        """
+        mask = np.asarray(mask, dtype=bool)
+        kept = np.zeros(len(mask) + 1, dtype=np.int64)
+        np.cumsum(mask, out=kept[1:])
+
+        self.offsets = kept[self.offsets]
+        self.coords = self.coords[mask]
+        self.label_ids = self.label_ids[mask]
+        self.confidences = self.confidences[mask]
+        return self
+
+    def select(self, indices: np.ndarray) -> "ColumnarAnnotations":
+        """
+        A new collection made of the images at the given indices.
+
+        Parameters:
+        - indices: an int array of image indices or a boolean mask.
+        """
+        indices = np.arange(len(self))[indices]
+        counts = self.box_counts[indices]
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        # Box rows of the selected images, in the order of `indices`
+        starts = np.repeat(self.offsets[:-1][indices] - offsets[:-1], counts)
+        rows = starts + np.arange(offsets[-1])
+
+        return ColumnarAnnotations(
+            [self.paths[i] for i in indices.tolist()],
+            self.image_sizes[indices],
+            offsets,
+            self.coords[rows],
+            self.label_ids[rows],
+            self.vocabulary,
+            self.confidences[rows])
+
+    def remove_empty(self) -> "ColumnarAnnotations":
+        """Removes empty annotations."""
+        selected = self.select(self.box_counts != 0)
+        self.__dict__.update(selected.__dict__)
+        return self
+
+    def print_stats(self) -> "ColumnarAnnotations":
+        """Prints the annotations statistics, see `DatasetStats`."""
+        from .summary import DatasetStats
+        DatasetStats.from_annotations(self).print_stats()
+        return self
+
+    def square_boxes(self, ratio: float, labels: Sequence[str] = None) -> "ColumnarAnnotations":
+        """
+        Transform bounding boxes to be of square shape if their label
+        is included in a given list.
+
+        Parameters:
+        - ratio: the percent of the minimum image side size to use
+        as the bounding box side length.
+        - labels: the labels of boxes to be be transformed. By default
+        all bounding boxes are transformed.
+
+        Returns:
+        - The transformed annotations.
+        """
+        assert 0.0 <= ratio <=1.0, "ratio should be in 0...1"
+
+        mask = slice(None) if labels is None else self.label_mask(labels)
+        sides = (self.image_sizes.min(axis=1) * ratio / 2)[self.image_ids][mask]
+        coords = self.coords[mask]
+
+        xmid = (coords[:, 2] + coords[:, 0]) / 2
+        ymid = (coords[:, 3] + coords[:, 1]) / 2
+        self.coords[mask] = np.stack((xmid - sides, ymid - sides, xmid + sides, ymid + sides), axis=1)
+
+        return self
+
+    def yolo_coords(self) -> np.ndarray:
+        """
+        Convert all the box coordinates to YOLO coordinate format
+        which is relative (xmid, ymid, width, height).
+
+        Returns:
+        - A (N, 4) array of relative coordinates (xmid, ymid, width, height).
+        """
+        sizes = self.image_sizes[self.image_ids]
+        img_w, img_h = sizes[:, 0], sizes[:, 1]
+        xmin, ymin, xmax, ymax = self.coords.T
+
+        return np.stack((
+            (xmax + xmin) / 2 / img_w,
+            (ymax + ymin) / 2 / img_h,
+            np.abs(xmax - xmin) / img_w,
+            np.abs(ymax - ymin) / img_h), axis=1)
@@ -0,0 +1,157 @@
+from .annotation import Annotation, Annotations
+from .cache import FileCache, cached_map
+from .profiling import profiler
+from .utils import dict_grouping
+
+from os import PathLike
+from pathlib import Path
+from typing import NamedTuple, Sequence
+import hashlib
+import os
+
+
+DEDUP_POLICIES = ("keep_first", "merge")
+
+HASH_CACHE_FILE = Path("~/.cache/darknet_utils/image_hashes")
+
+# Bytes read at the start and at the end of a file for the partial hash
+_PARTIAL_SIZE = 64 * 1024
+
+
+class DedupResult(NamedTuple):
+    """
+    Outcome of `deduplicate()`: the removed images, each with the image 
+    kept in its place, the number of boxes moved to the kept images and 
+    the number of images compared by the hash of their start and end or
+    of their whole content.
+    """
+    removed: "list[tuple[Path, Path]]"
+    merged_boxes: int
+    partial_hashes: int
+    full_hashes: int
+
+    def __str__(self) -> str:
+        return f"{len(self.removed)} duplicates removed, {self.merged_boxes} boxes merged " \
+            f"({self.partial_hashes} compared by partial hash, {self.full_hashes} by full hash)"
+
+
+def deduplicate(
+    annotations: Annotations,
+    policy: str = "keep_first",
+    workers: int = 1,
+    cache: FileCache = None,
+) -> DedupResult:
+    """
+    Remove the annotations of images whose content is identical to the
+    image of a previous annotation, e.g. the same capture stored in two
+    datasets under different names.
+
+    Only the images with the same size are compared, first with a hash
+    of their start and end, then with a hash of the whole content if
+    those match. Hashes are computed in parallel and can be cached.
+
+    Parameters:
+    - annotations: the annotations to deduplicate in place.
+    - policy: "keep_first" keeps the first annotation of each image and
+    drops the others, "merge" also moves their boxes to the first one,
+    except the boxes it already contains.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: an optional cache of image hashes, see `hash_cache()`.
+
+    Returns:
+    - The removed images and the number of compared images.
+    """
+    assert policy in DEDUP_POLICIES, f"policy should be one of {DEDUP_POLICIES}"
+
+    with profiler.stage("dedup") as stage:
+        paths = list(dict.fromkeys(str(a.image_path) for a in annotations))
+        sizes = {p: os.path.getsize(p) for p in paths}
+
+        # Each round only keeps the images that still collide with another one
+        candidates = _colliding(paths, sizes.get)
+        partial = _hashes(candidates, "partial", workers, cache)
+        candidates = _colliding(candidates, lambda p: (sizes[p], partial[p]))
+        full = _hashes(candidates, "full", workers, cache)
+
+        originals = {}
+        for group in dict_grouping(candidates, full.get).values():
+            for path in group[1:]:
+                originals[path] = group[0]
+
+        kept = {}
+        removed = []
+        merged_boxes = 0
+        for annotation in annotations:
+            path = str(annotation.image_path)
+            key = originals.get(path, path)
+            first = kept.get(key)
+            if first is None:
+                kept[key] = annotation
+                continue
+
+            removed.append((annotation.image_path, first.image_path))
+            if policy == "merge":
+                merged_boxes += _merge_boxes(first, annotation)
+
+        annotations.annotations = list(kept.values())
+        stage.count(images=len(paths), removed=len(removed),
+            partial_hashes=len(partial), full_hashes=len(full))
+
+    return DedupResult(removed, merged_boxes, len(partial), len(full))
+
+
+def hash_cache(cache_file: PathLike = HASH_CACHE_FILE, max_entries: int = None) -> FileCache:
+    """
+    The cache of image hashes used by `deduplicate()`, shared by all
+    datasets and stored in the user cache folder by default. Entries
+    stay valid as long as the image modification time and size do not
+    change.
+
+    Parameters:
+    - cache_file: the cache file.
+    - max_entries: the maximum number of images in the cache.
+
+    Returns:
+    - The cache object.
+    """
+    return FileCache(cache_file, max_entries)
+
+
+def _colliding(paths: "Sequence[str]", key) -> "list[str]":
+    """The paths sharing their key with another path, in order."""
+    groups = dict_grouping(paths, key)
+    return [p for p in paths if len(groups[key(p)]) > 1]
+
+
+def _hashes(paths: "Sequence[str]", kind: str, workers: int, cache: FileCache = None) -> "dict[str, bytes]":
+    """The partial or full hash of each file, looked up in the cache first."""
+    func = _partial_hash if kind == "partial" else _full_hash
+    return dict(zip(paths, cached_map(func, paths, kind, workers, cache, unit="imgs")))
+
+
+def _partial_hash(file: str) -> bytes:
+    with open(file, "rb") as f:
+        digest = hashlib.blake2b(f.read(_PARTIAL_SIZE))
+        f.seek(max(os.fstat(f.fileno()).st_size - _PARTIAL_SIZE, f.tell()))
+        digest.update(f.read())
+    return digest.digest()
+
+
+def _full_hash(file: str) -> bytes:
+    digest = hashlib.blake2b()
+    with open(file, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _merge_boxes(annotation: Annotation, other: Annotation) -> int:
+    """Add the boxes of `other` not already in `annotation`, returns their number."""
+    existing = {_box_key(b) for b in annotation.boxes}
+    added = [b for b in other.boxes if _box_key(b) not in existing]
+    annotation.boxes.extend(added)
+    return len(added)
+
+
+def _box_key(box) -> tuple:
+    return box.label, box._xmin, box._ymin, box._xmax, box._ymax
@@ -0,0 +1,269 @@
+from .annotation import Annotations
+from .columnar import ColumnarAnnotations
+from .iou import _corners, _iou
+from .profiling import profiler
+from .utils import parallel_map
+
+from os import PathLike
+from pathlib import Path
+from typing import Sequence, Union
+import json
+
+import numpy as np
+
+
+# IoU thresholds of the COCO mAP@[.5:.95]
+COCO_IOU_THRESHOLDS = tuple(np.round(np.arange(0.5, 0.96, 0.05), 2).tolist())
+
+
+class Evaluation:
+    """
+    Precision-recall curves and average precision (AP) of detections for
+    each label and IoU threshold, see `evaluate_detections()`.
+
+    Curves are indexed by IoU threshold and by detection, detections
+    being sorted by decreasing confidence: `precisions[label][t][k]` is
+    the precision of the `k + 1` most confident detections of `label` at
+    the IoU threshold `iou_thresholds[t]`.
+    """
+
+    def __init__(self, iou_thresholds: Sequence[float]):
+        self.iou_thresholds = tuple(iou_thresholds)
+        self.ground_truths = {}
+        self.detections = {}
+        self.confidences = {}
+        self.precisions = {}
+        self.recalls = {}
+        self.average_precisions = {}
+
+    def labels(self) -> "set[str]":
+        return set(self.ground_truths)
+
+    def mean_average_precision(self, iou_threshold: float = None) -> float:
+        """
+        The mean over the labels of the AP at an IoU threshold, or of the
+        AP averaged over all the thresholds by default (COCO mAP when
+        evaluated at `COCO_IOU_THRESHOLDS`). Labels without ground truth
+        boxes are not counted. Returns NaN if there is no such label.
+        """
+        aps = [ap for l, ap in self.average_precisions.items() if self.ground_truths[l]]
+        if not aps:
+            return float("nan")
+        aps = np.array(aps)
+        if iou_threshold is not None:
+            aps = aps[:, self.iou_thresholds.index(iou_threshold)]
+        return float(aps.mean())
+
+    def to_dict(self) -> dict:
+        """A JSON serializable summary, without the curves."""
+        return {
+            "iou_thresholds": self.iou_thresholds,
+            "map": _json_float(self.mean_average_precision()),
+            "map_per_iou": [_json_float(self.mean_average_precision(t)) for t in self.iou_thresholds],
+            "labels": {label: {
+                    "ground_truths": self.ground_truths[label],
+                    "detections": self.detections[label],
+                    "ap_per_iou": [_json_float(ap) for ap in self.average_precisions[label].tolist()],
+                } for label in sorted(self.ground_truths)},
+        }
+
+    def save(self, file: PathLike):
+        """Write the summary to a JSON file."""
+        Path(file).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def print_results(self) -> "Evaluation":
+        """
+        Prints the AP of each label and the mAP at each IoU threshold.
+        With more than 3 thresholds, only the first one and 0.75 are
+        printed besides the mean, as for the COCO mAP.
+        """
+        from rich.table import Table
+        from rich import print as rprint
+
+        thresholds = self.iou_thresholds
+        if len(thresholds) > 3:
+            thresholds = [t for t in thresholds if t in (thresholds[0], 0.75)]
+        mean_column = len(self.iou_thresholds) > 1
+
+        table = Table()
+        table.add_column("Label")
+        table.add_column("Boxes", justify="right")
+        table.add_column("Detections", justify="right")
+        for t in thresholds:
+            table.add_column(f"AP@{t:g}", justify="right")
+        if mean_column:
+            table.add_column(f"AP@[{min(self.iou_thresholds):g}:{max(self.iou_thresholds):g}]", justify="right")
+
+        for label in sorted(self.ground_truths):
+            aps = self.average_precisions[label]
+            row = [label, f"{self.ground_truths[label]}", f"{self.detections[label]}"]
+            row += [_percent(aps[self.iou_thresholds.index(t)]) for t in thresholds]
+            if mean_column:
+                row.append(_percent(aps.mean()))
+            table.add_row(*row)
+
+        table.add_section()
+        row = ["mAP", f"{sum(self.ground_truths.values())}", f"{sum(self.detections.values())}"]
+        row += [_percent(self.mean_average_precision(t)) for t in thresholds]
+        if mean_column:
+            row.append(_percent(self.mean_average_precision()))
+        table.add_row(*row)
+
+        rprint(table)
+        return self
+
+
+def evaluate_detections(
+    ground_truth: Union[Annotations, ColumnarAnnotations],
+    detections: Union[Annotations, ColumnarAnnotations],
+    iou_thresholds: Sequence[float] = (0.5,),
+    workers: int = 1,
+) -> Evaluation:
+    """
+    Evaluate detections against ground truth annotations of the same
+    images, e.g. detections read with `parse_yolo_detections()`.
+
+    At each IoU threshold, the detections of each label are matched by
+    decreasing confidence to the ground truth box of the same image with
+    the highest IoU which is not matched yet, if this IoU is at least the
+    threshold. AP is the area under the interpolated precision-recall
+    curve (all points, as Pascal VOC 2010 and later).
+
+    IoU are computed for all the detections of a label at once and labels
+    are evaluated in parallel. Detections without confidence rank last
+    and detections of images without annotation are ignored.
+
+    Parameters:
+    - ground_truth: the annotations.
+    - detections: the boxes predicted on the annotated images.
+    - iou_thresholds: the minimum IoU of a true positive, e.g.
+    `COCO_IOU_THRESHOLDS`.
+    - workers: the number of worker processes, 0 for one per CPU core.
+
+    Returns:
+    - The precision-recall curves and AP of each label.
+    """
+    assert all(0.0 <= t <= 1.0 for t in iou_thresholds), "IoU thresholds should be in 0...1"
+
+    with profiler.stage("evaluate") as stage:
+        if not isinstance(ground_truth, ColumnarAnnotations):
+            ground_truth = ColumnarAnnotations.from_annotations(ground_truth)
+        if not isinstance(detections, ColumnarAnnotations):
+            detections = ColumnarAnnotations.from_annotations(detections)
+
+        # Detections are attached to the annotated image of the same path
+        images = {str(p): i for i, p in enumerate(ground_truth.paths)}
+        detection_images = np.array([images.get(str(p), -1) for p in detections.paths],
+            dtype=np.int64)[detections.image_ids]
+        is_annotated = detection_images >= 0
+
+        labels = sorted(ground_truth.labels() | detections.labels())
+        jobs = []
+        for label in labels:
+            truths = ground_truth.label_mask([label])
+            predictions = detections.label_mask([label]) & is_annotated
+            jobs.append((
+                detection_images[predictions],
+                detections.coords[predictions],
+                np.nan_to_num(detections.confidences[predictions], nan=-np.inf),
+                ground_truth.image_ids[truths],
+                ground_truth.coords[truths],
+                tuple(iou_thresholds)))
+
+        results = parallel_map(_evaluate_label, jobs, workers=workers, chunksize=1, unit="labels")
+
+        evaluation = Evaluation(iou_thresholds)
+        for label, job, (confidences, precisions, recalls, aps) in zip(labels, jobs, results):
+            evaluation.ground_truths[label] = len(job[3])
+            evaluation.detections[label] = len(job[0])
+            evaluation.confidences[label] = confidences
+            evaluation.precisions[label] = precisions
+            evaluation.recalls[label] = recalls
+            evaluation.average_precisions[label] = aps
+
+        stage.count(images=len(ground_truth), ground_truths=len(ground_truth.label_ids),
+            detections=int(is_annotated.sum()), ignored=int((~is_annotated).sum()))
+
+    return evaluation
+
+
+def _evaluate_label(job: tuple) -> "tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]":
+    """
+    The sorted confidences, the (T, D) precision and recall curves and the
+    (T,) AP of the detections of a label, NaN if there is no ground truth.
+    """
+    detection_images, detection_coords, scores, truth_images, truth_coords, thresholds = job
+    nb_detections, nb_truths = len(scores), len(truth_images)
+
+    order = np.lexsort((np.arange(nb_detections), -scores))
+    detection_images, detection_coords, scores = detection_images[order], detection_coords[order], scores[order]
+    order = np.argsort(truth_images, kind="stable")
+    truth_images, truth_coords = truth_images[order], truth_coords[order]
+
+    # Each detection is paired with all the ground truth boxes of its image
+    starts = np.searchsorted(truth_images, detection_images, "left")
+    counts = np.searchsorted(truth_images, detection_images, "right") - starts
+    detections = np.repeat(np.arange(nb_detections), counts)
+    truths = np.repeat(starts, counts) + np.arange(len(detections)) \
+        - np.repeat(np.cumsum(counts) - counts, counts)
+    ious = _iou(_corners(detection_coords)[detections], _corners(truth_coords)[truths])
+
+    # Pairs by detection rank, then by decreasing IoU
+    kept = ious >= min(thresholds, default=0.0)
+    detections, truths, ious = detections[kept], truths[kept], ious[kept]
+    order = np.lexsort((-ious, detections))
+    detections, truths, ious = detections[order], truths[order], ious[order]
+
+    ranks = np.arange(1, nb_detections + 1)
+    precisions = np.zeros((len(thresholds), nb_detections))
+    recalls = np.zeros((len(thresholds), nb_detections))
+    aps = np.full(len(thresholds), np.nan)
+
+    for t, threshold in enumerate(thresholds):
+        is_matched = ious >= threshold
+        true_positives = np.cumsum(_match(detections[is_matched], truths[is_matched], nb_detections, nb_truths))
+        precisions[t] = true_positives / ranks
+        if nb_truths:
+            recalls[t] = true_positives / nb_truths
+            aps[t] = _average_precision(precisions[t], recalls[t])
+
+    return np.where(np.isinf(scores), np.nan, scores), precisions, recalls, aps
+
+
+def _match(detections: np.ndarray, truths: np.ndarray, nb_detections: int, nb_truths: int) -> np.ndarray:
+    """
+    Greedy matching of candidate pairs ordered by detection rank and by
+    decreasing IoU. Returns whether each detection is a true positive.
+    """
+    is_true_positive = np.zeros(nb_detections, dtype=bool)
+    if len(detections) == 0:
+        return is_true_positive
+
+    # Pairs without conflict are matched directly
+    if np.bincount(detections).max() == 1 and np.bincount(truths).max() == 1:
+        is_true_positive[detections] = True
+        return is_true_positive
+
+    matched_detections = bytearray(nb_detections)
+    matched_truths = bytearray(nb_truths)
+    for d, g in zip(detections.tolist(), truths.tolist()):
+        if not matched_detections[d] and not matched_truths[g]:
+            matched_detections[d] = matched_truths[g] = 1
+
+    return np.frombuffer(bytes(matched_detections), dtype=bool).copy()
+
+
+def _average_precision(precisions: np.ndarray, recalls: np.ndarray) -> float:
+    """Area under the precision-recall curve with the precision envelope."""
+    recalls = np.concatenate(([0.0], recalls, [1.0]))
+    precisions = np.concatenate(([0.0], precisions, [0.0]))
+    precisions = np.maximum.accumulate(precisions[::-1])[::-1]
+    return float(np.sum(np.diff(recalls) * precisions[1:]))
+
+
+def _percent(value: float) -> str:
+    return "-" if np.isnan(value) else f"{100 * value:.1f}"
+
+
+def _json_float(value: float) -> float:
+    return None if np.isnan(value) else value
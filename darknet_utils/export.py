@@ -0,0 +1,347 @@
+from .utils import atomic_write
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack
+from functools import partial
+from itertools import islice
+from os import PathLike
+from pathlib import Path
+from time import perf_counter
+from typing import Iterable, NamedTuple, Sequence
+import errno
+import hashlib
+import json
+import os
+import shutil
+
+
+LINK_MODES = ("copy", "hardlink", "symlink", "reflink")
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+# Linux `FICLONE` ioctl request, shares the file extents on
+# copy-on-write filesystems (Btrfs, XFS, ...).
+_FICLONE = 0x40049409
+
+
+class ExportStats:
+    """
+    Number of files and bytes exported per effective link mode.
+    """
+
+    def __init__(self):
+        self.files = {mode: 0 for mode in LINK_MODES}
+        self.bytes = {mode: 0 for mode in LINK_MODES}
+        self.label_files = 0
+        self.label_bytes = 0
+        self.unchanged = 0
+        self.removed = 0
+        self.elapsed = 0.0
+
+    def add(self, mode: str, nbytes: int):
+        self.files[mode] += 1
+        self.bytes[mode] += nbytes
+
+    def add_label(self, nbytes: int):
+        self.label_files += 1
+        self.label_bytes += nbytes
+
+    @property
+    def files_per_second(self) -> float:
+        """Image and label files exported per second."""
+        total = sum(self.files.values()) + self.label_files
+        return total / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        """Megabytes of images and labels exported per second."""
+        total = sum(self.bytes.values()) + self.label_bytes
+        return total / 1e6 / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def copied_bytes(self) -> int:
+        """Bytes actually written to disk."""
+        return self.bytes["copy"]
+
+    @property
+    def linked_bytes(self) -> int:
+        """Bytes shared with the source files."""
+        return sum(n for mode, n in self.bytes.items() if mode != "copy")
+
+    def __str__(self) -> str:
+        details = ", ".join(f"{self.files[m]} {m} ({self.bytes[m] / 1e6:.1f} MB)"
+            for m in LINK_MODES if self.files[m] != 0)
+        summary = f"{self.copied_bytes / 1e6:.1f} MB copied, " \
+            f"{self.linked_bytes / 1e6:.1f} MB linked [{details or 'no files'}]"
+        if self.unchanged or self.removed:
+            summary += f", {self.unchanged} unchanged, {self.removed} removed"
+        if self.elapsed:
+            summary += f", {self.files_per_second:.0f} files/s, {self.megabytes_per_second:.1f} MB/s"
+        return summary
+
+
+class ExportJob(NamedTuple):
+    """An image to export with its YOLO label file."""
+    source: Path
+    image_file: Path
+    label_file: Path
+    label_content: str
+
+
+class AsyncExporter:
+    """
+    Export engine copying images and writing label files concurrently.
+
+    Blocking file operations run in a thread pool driven by asyncio,
+    with separate limits for image exports, which are large and bound by
+    the disk bandwidth, and label writes, which are tiny and bound by the
+    latency. Image exports are also limited per source device so that
+    spinning disks are not thrashed by concurrent reads, and jobs are 
+    queued in a bounded queue to apply backpressure.
+
+    Operations in progress are completed when the export is interrupted,
+    thus files are not left partially written.
+    """
+
+    def __init__(self,
+        link_mode: str = "copy",
+        image_jobs: int = 8,
+        label_jobs: int = 16,
+        device_jobs: int = None,
+        max_pending: int = None,
+    ):
+        """
+        Parameters:
+        - link_mode: how images are exported, see `export_file()`.
+        - image_jobs: the maximum number of concurrent image exports.
+        - label_jobs: the maximum number of concurrent label writes.
+        - device_jobs: the maximum number of concurrent image exports 
+        reading from the same device. Not limited by default.
+        - max_pending: the maximum number of jobs waiting for an image 
+        export slot. Defaults to twice `image_jobs`.
+        """
+        assert link_mode in LINK_MODES, f"link_mode should be one of {LINK_MODES}"
+        assert image_jobs > 0 and label_jobs > 0, "job limits should be positive"
+        assert device_jobs is None or device_jobs > 0, "device_jobs should be positive"
+
+        self.link_mode = link_mode
+        self.image_jobs = image_jobs
+        self.label_jobs = label_jobs
+        self.device_jobs = device_jobs
+        self.max_pending = max_pending or 2 * image_jobs
+
+    def export(self, jobs: Iterable[ExportJob], stats: ExportStats = None) -> ExportStats:
+        """
+        Run export jobs and wait for their completion.
+
+        Parameters:
+        - jobs: the images and labels to export. If it is not a sequence,
+        e.g. a generator, jobs are pulled from a separate thread as slots 
+        become available so that producing them can be slow or blocking.
+        - stats: optional statistics to update.
+
+        Returns:
+        - The statistics of the export, including throughput.
+        """
+        import asyncio
+
+        stats = stats or ExportStats()
+        start = perf_counter()
+        asyncio.run(self._export(jobs, stats))
+        stats.elapsed += perf_counter() - start
+        return stats
+
+    async def _export(self, jobs: Iterable[ExportJob], stats: ExportStats):
+        import asyncio
+        from tqdm import tqdm
+
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(maxsize=self.max_pending)
+        label_slots = asyncio.Semaphore(self.label_jobs)
+        device_slots = defaultdict(lambda: asyncio.Semaphore(self.device_jobs))
+        label_tasks = set()
+
+        async def write_label(job: ExportJob):
+            try:
+                data = job.label_content.encode()
+                nbytes = await loop.run_in_executor(executor, job.label_file.write_bytes, data)
+                stats.add_label(nbytes)
+            finally:
+                label_slots.release()
+
+        async def export_images():
+            while (job := await queue.get()) is not None:
+                async with AsyncExitStack() as stack:
+                    if self.device_jobs is not None:
+                        device = (await loop.run_in_executor(executor, os.stat, job.source)).st_dev
+                        await stack.enter_async_context(device_slots[device])
+                    mode, nbytes = await loop.run_in_executor(executor, _export_image, job, self.link_mode)
+                stats.add(mode, nbytes)
+
+                # Waiting for a free slot bounds the number of pending label writes
+                await label_slots.acquire()
+                task = asyncio.create_task(write_label(job))
+                label_tasks.add(task)
+                task.add_done_callback(label_done)
+
+        def label_done(task: asyncio.Task):
+            # Failed tasks are kept so that their error is raised by the final gather
+            if task.cancelled() or task.exception() is not None:
+                return
+            label_tasks.discard(task)
+            progress.update()
+
+        async def produce():
+            if isinstance(jobs, Sequence):
+                for job in jobs:
+                    await queue.put(job)
+            else:
+                # Jobs are pulled by batches to amortize the thread switches
+                pull = partial(lambda it: list(islice(it, self.max_pending)), iter(jobs))
+                while batch := await loop.run_in_executor(producer, pull):
+                    for job in batch:
+                        await queue.put(job)
+            for _ in range(self.image_jobs):
+                await queue.put(None)
+
+        total = len(jobs) if isinstance(jobs, Sequence) else None
+        with ThreadPoolExecutor(max_workers=self.image_jobs + self.label_jobs) as executor, \
+            ThreadPoolExecutor(max_workers=1) as producer, \
+            tqdm(total=total, unit="imgs") as progress:
+            workers = [asyncio.create_task(export_images()) for _ in range(self.image_jobs)]
+            try:
+                await asyncio.gather(produce(), *workers)
+                await asyncio.gather(*label_tasks)
+            except BaseException:
+                for task in (*workers, *label_tasks):
+                    task.cancel()
+                raise
+
+
+def _export_image(job: ExportJob, link_mode: str) -> "tuple[str, int]":
+    mode = export_file(job.source, job.image_file, link_mode)
+    return mode, os.stat(job.source).st_size
+
+
+def export_file(src: PathLike, dst: PathLike, link_mode: str = "copy") -> str:
+    """
+    Copy or link a file, falling back to a regular copy if the link
+    mode is not supported for these files, for instance a hard link
+    across devices or a reflink on a filesystem without copy-on-write.
+
+    An existing destination file is replaced.
+
+    Parameters:
+    - src: the source file.
+    - dst: the destination file.
+    - link_mode: one of "copy", "hardlink", "symlink" and "reflink".
+
+    Returns:
+    - The link mode actually used.
+    """
+    assert link_mode in LINK_MODES, f"link_mode should be one of {LINK_MODES}"
+
+    src, dst = Path(src), Path(dst)
+
+    # Writing through a previously exported link would modify the source
+    dst.unlink(missing_ok=True)
+
+    if link_mode == "hardlink":
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    elif link_mode == "symlink":
+        try:
+            os.symlink(src.resolve(), dst)
+            return "symlink"
+        except OSError:
+            pass
+    elif link_mode == "reflink":
+        if _reflink(src, dst):
+            return "reflink"
+
+    shutil.copyfile(src, dst)
+    return "copy"
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    """
+    Clone `src` to `dst` with `FICLONE`, or copy it in kernel space with
+    `copy_file_range()` which is accelerated by some filesystems. Returns
+    True only if the file data is shared, the destination is a complete
+    copy if False is returned without exception.
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        try:
+            import fcntl
+            fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+            return True
+        except (ImportError, OSError):
+            pass
+
+        size = os.fstat(fsrc.fileno()).st_size
+        offset = 0
+        try:
+            while offset < size:
+                copied = os.copy_file_range(fsrc.fileno(), fdst.fileno(), size - offset)
+                if copied == 0:
+                    break
+                offset += copied
+        except AttributeError:
+            pass  # Not available on this platform
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                raise
+
+        if offset != size:
+            fdst.seek(0)
+            fdst.truncate()
+            fsrc.seek(0)
+            shutil.copyfileobj(fsrc, fdst)
+
+    return False
+
+
+def manifest_entry(source: PathLike, label_content: str, link_mode: str) -> dict:
+    """
+    The manifest entry describing an exported image and its label file.
+    Two exports with equal entries produce the same output files.
+
+    Parameters:
+    - source: the source image path.
+    - label_content: the content of the YOLO label file.
+    - link_mode: the requested image link mode.
+    """
+    stat = os.stat(source)
+    return {
+        "source": str(source),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "label_hash": hashlib.sha1(label_content.encode()).hexdigest(),
+        "link_mode": link_mode,
+    }
+
+
+def load_manifest(save_dir: PathLike) -> "dict[str, dict]":
+    """
+    Read the export manifest of a YOLO database, which maps output
+    image names relative to `save_dir` to their `manifest_entry()`.
+    Returns an empty manifest if there is none or it is not readable.
+    """
+    try:
+        content = json.loads((Path(save_dir) / MANIFEST_NAME).read_text())
+    except (OSError, ValueError):
+        return {}
+    if content.get("version") != MANIFEST_VERSION:
+        return {}
+    return content["files"]
+
+
+def save_manifest(save_dir: PathLike, files: "dict[str, dict]"):
+    """Write the export manifest of a YOLO database atomically."""
+    content = json.dumps({"version": MANIFEST_VERSION, "files": files})
+    atomic_write(Path(save_dir) / MANIFEST_NAME, content)
@@ -0,0 +1,104 @@
+from .annotation import Annotations
+from .cache import FileCache, cached_map
+from .profiling import profiler
+
+from os import PathLike
+from pathlib import Path
+from typing import NamedTuple
+import os
+import shutil
+
+
+INTEGRITY_POLICIES = ("drop", "quarantine")
+
+
+class IntegrityResult(NamedTuple):
+    """
+    Outcome of `check_integrity()`: the images which could not be decoded
+    with the decoding error, the number of checked images and the number
+    of images actually decoded, the others being cached.
+    """
+    corrupt: "list[tuple[Path, str]]"
+    checked: int
+    decoded: int
+
+    def __str__(self) -> str:
+        return f"{len(self.corrupt)} corrupt images removed " \
+            f"({self.checked} checked, {self.decoded} decoded)"
+
+
+def check_integrity(
+    annotations: Annotations,
+    policy: str = "drop",
+    quarantine_dir: PathLike = None,
+    workers: int = 1,
+    cache: FileCache = None,
+) -> IntegrityResult:
+    """
+    Fully decode the images in worker processes and remove the
+    annotations of images which cannot be decoded or do not exist, e.g.
+    truncated JPEG files whose header is valid, before they are exported
+    and stop a training.
+
+    Results are cached by image modification time and size, thus only
+    new or modified images are decoded when a cache is used.
+
+    Parameters:
+    - annotations: the annotations to check in place.
+    - policy: "drop" only removes the annotations, "quarantine" also
+    moves the corrupt images to `quarantine_dir`, keeping their absolute
+    path as relative path in this folder.
+    - quarantine_dir: the folder of corrupt images.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: an optional cache of results, see `image_cache()`.
+
+    Returns:
+    - The corrupt images with their error and the number of checked
+    images.
+    """
+    assert policy in INTEGRITY_POLICIES, f"policy should be one of {INTEGRITY_POLICIES}"
+    assert policy != "quarantine" or quarantine_dir is not None, "quarantine_dir is required"
+
+    with profiler.stage("integrity") as stage:
+        misses = 0 if cache is None else cache.misses
+        paths = list(dict.fromkeys(map(str, annotations.image_paths())))
+        existing = [p for p in paths if os.path.isfile(p)]
+        errors = dict(zip(existing, cached_map(_decode, existing, "decode", workers, cache, unit="imgs")))
+        errors.update((p, "the image does not exist") for p in paths if p not in errors)
+
+        corrupt = [(Path(p), errors[p]) for p in paths if errors[p] is not None]
+        if policy == "quarantine":
+            for path, _ in corrupt:
+                if path.exists():
+                    _quarantine(path, quarantine_dir)
+                    if cache is not None:
+                        cache.invalidate([path])
+
+        removed = {str(p) for p, _ in corrupt}
+        annotations.annotations = [a for a in annotations if str(a.image_path) not in removed]
+
+        decoded = len(existing) if cache is None else cache.misses - misses
+        stage.count(images=len(paths), decoded=decoded, corrupt=len(corrupt),
+            bytes=sum(os.path.getsize(p) for p in existing) if profiler.enabled else 0)
+
+    return IntegrityResult(corrupt, len(paths), decoded)
+
+
+def _decode(image: str) -> str:
+    """The decoding error of an image, None if it is valid."""
+    from PIL import Image
+
+    try:
+        with Image.open(image) as img:
+            img.load()
+    except Exception as e:  # Decoders raise many exception types
+        return f"{type(e).__name__}: {e}"
+    return None
+
+
+def _quarantine(image: Path, quarantine_dir: PathLike):
+    """Move an image to the quarantine folder, under its absolute path."""
+    image = image.resolve()
+    destination = Path(quarantine_dir).expanduser() / image.relative_to(image.anchor)
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    shutil.move(image, destination)
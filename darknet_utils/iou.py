@@ -0,0 +1,272 @@
+from .annotation import Annotation, Annotations
+from .bounding_box import BoundingBox
+from .columnar import ColumnarAnnotations
+from .profiling import profiler
+
+from typing import NamedTuple, Sequence, Union
+
+import numpy as np
+
+
+MERGE_MODES = ("suppress", "average")
+
+# Maximum number of box pairs compared at once, bounds the memory used
+# by images with many boxes.
+_MAX_PAIRS = 1 << 22
+
+
+class BoxOverlaps(NamedTuple):
+    """
+    Pairs of overlapping boxes, each pair being in the same image: the
+    image index, the index of both boxes in the image and their IoU.
+    """
+    image_ids: np.ndarray
+    first_boxes: np.ndarray
+    second_boxes: np.ndarray
+    ious: np.ndarray
+
+    def __str__(self) -> str:
+        return f"{len(self.ious)} overlapping box pairs in {len(np.unique(self.image_ids))} images"
+
+
+def iou_matrix(
+    boxes: "Union[Annotation, Sequence[BoundingBox], np.ndarray]",
+    others: "Union[Annotation, Sequence[BoundingBox], np.ndarray]" = None,
+) -> np.ndarray:
+    """
+    The intersection over union of each pair of boxes of two sets.
+
+    Parameters:
+    - boxes: the boxes of an annotation, a sequence of boxes or an (N, 4)
+    array of absolute (xmin, ymin, xmax, ymax) coordinates.
+    - others: the other set of boxes. By default `boxes`.
+
+    Returns:
+    - The (N, M) matrix of IoU.
+    """
+    coords = _corners(_coords(boxes))
+    other_coords = coords if others is None else _corners(_coords(others))
+    return _iou(coords[:, None], other_coords[None, :])
+
+
+def find_overlaps(
+    annotations: Union[Annotation, Annotations, ColumnarAnnotations],
+    threshold: float = 0.5,
+    same_label: bool = True,
+) -> BoxOverlaps:
+    """
+    Find the pairs of boxes of the same image whose IoU is greater than
+    a threshold, e.g. the same object annotated twice.
+
+    Boxes are compared with the other boxes of their image and label
+    only, all the pairs of the collection being computed at once.
+
+    Parameters:
+    - annotations: the annotations to check.
+    - threshold: the minimum IoU of overlapping boxes, in 0...1.
+    - same_label: if False, boxes of different labels are also compared.
+
+    Returns:
+    - The overlapping box pairs, ordered by image.
+    """
+    assert 0.0 <= threshold <= 1.0, "threshold should be in 0...1"
+
+    with profiler.stage("overlaps") as stage:
+        columns = _columnar(annotations)
+        first, second, ious = _overlapping_pairs(columns, threshold, same_label)
+        starts = columns.offsets[columns.image_ids[first]]
+        stage.count(boxes=len(columns.label_ids), overlaps=len(ious))
+
+    return BoxOverlaps(columns.image_ids[first], first - starts, second - starts, ious)
+
+
+def merge_overlaps(
+    annotations: Union[Annotation, Annotations, ColumnarAnnotations],
+    threshold: float = 0.7,
+    same_label: bool = True,
+    mode: str = "suppress",
+) -> BoxOverlaps:
+    """
+    Merge the boxes of the same image whose IoU is greater than a
+    threshold, as a non-maximum suppression (NMS).
+
+    Boxes are ranked by confidence, then by order in their image if they
+    do not have a confidence, and each box overlapping a box of higher
+    rank which is kept is removed.
+
+    Parameters:
+    - annotations: the annotations to fix in place.
+    - threshold: the minimum IoU of merged boxes, in 0...1.
+    - same_label: if False, boxes of different labels are also merged.
+    - mode: "suppress" only removes boxes, "average" also replaces kept
+    boxes by the mean of the boxes they suppressed and themselves, with
+    the highest confidence.
+
+    Returns:
+    - The pairs of the kept box and of each removed box, the indices
+    being those before the merge.
+    """
+    assert 0.0 <= threshold <= 1.0, "threshold should be in 0...1"
+    assert mode in MERGE_MODES, f"mode should be one of {MERGE_MODES}"
+
+    with profiler.stage("overlaps") as stage:
+        columns = _columnar(annotations)
+        first, second, ious = _overlapping_pairs(columns, threshold, same_label)
+
+        # Rank of each box, the lowest rank being the highest confidence
+        nb_boxes = len(columns.label_ids)
+        scores = np.nan_to_num(columns.confidences, nan=-np.inf)
+        ranks = np.empty(nb_boxes, dtype=np.int64)
+        ranks[np.lexsort((np.arange(nb_boxes), -scores))] = np.arange(nb_boxes)
+
+        # Only boxes overlapping another one need a sequential suppression
+        swap = ranks[first] > ranks[second]
+        higher = np.where(swap, second, first).tolist()
+        lower = np.where(swap, first, second).tolist()
+        neighbors = {}
+        for h, l, iou in zip(higher, lower, ious.tolist()):
+            neighbors.setdefault(l, []).append((ranks[h], h, iou))
+
+        owners = {}
+        for box in sorted(neighbors, key=ranks.__getitem__):
+            kept = [n for n in sorted(neighbors[box]) if n[1] not in owners]
+            if kept:
+                owners[box] = kept[0][1:]
+
+        removed = np.array(sorted(owners), dtype=np.int64)
+        kept = np.array([owners[b][0] for b in removed.tolist()], dtype=np.int64)
+        merged_ious = np.array([owners[b][1] for b in removed.tolist()], dtype=np.float64)
+
+        coords = columns.coords.copy()
+        confidences = columns.confidences.copy()
+        if mode == "average" and len(removed):
+            counts = np.bincount(kept, minlength=nb_boxes)[:, None] + 1
+            sums = columns.coords.copy()
+            np.add.at(sums, kept, columns.coords[removed])
+            coords = sums / counts
+            np.fmax.at(confidences, kept, columns.confidences[removed])
+
+        image_ids = columns.image_ids[removed]
+        starts = columns.offsets[image_ids]
+        merged = BoxOverlaps(image_ids, kept - starts, removed - starts, merged_ious)
+
+        _apply(annotations, columns, removed, coords, confidences)
+        stage.count(boxes=nb_boxes, overlaps=len(ious), removed=len(removed))
+
+    return merged
+
+
+def _coords(boxes: "Union[Annotation, Sequence[BoundingBox], np.ndarray]") -> np.ndarray:
+    if isinstance(boxes, Annotation):
+        boxes = boxes.boxes
+    if isinstance(boxes, np.ndarray):
+        return boxes.reshape(-1, 4).astype(np.float64)
+    return np.array([(b._xmin, b._ymin, b._xmax, b._ymax) for b in boxes], dtype=np.float64).reshape(-1, 4)
+
+
+def _columnar(annotations: Union[Annotation, Annotations, ColumnarAnnotations]) -> ColumnarAnnotations:
+    if isinstance(annotations, Annotation):
+        annotations = [annotations]
+    if not isinstance(annotations, ColumnarAnnotations):
+        annotations = ColumnarAnnotations.from_annotations(annotations)
+    return annotations
+
+
+def _corners(coords: np.ndarray) -> np.ndarray:
+    """Coordinates with the top-left corner first, see `BoundingBox`."""
+    return np.concatenate((np.minimum(coords[:, :2], coords[:, 2:]),
+        np.maximum(coords[:, :2], coords[:, 2:])), axis=1)
+
+
+def _iou(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Element-wise IoU of broadcastable arrays of (xmin, ymin, xmax, ymax)."""
+    widths = np.clip(np.minimum(boxes[..., 2], others[..., 2]) - np.maximum(boxes[..., 0], others[..., 0]), 0, None)
+    heights = np.clip(np.minimum(boxes[..., 3], others[..., 3]) - np.maximum(boxes[..., 1], others[..., 1]), 0, None)
+    intersections = widths * heights
+
+    areas = (boxes[..., 2] - boxes[..., 0]) * (boxes[..., 3] - boxes[..., 1])
+    other_areas = (others[..., 2] - others[..., 0]) * (others[..., 3] - others[..., 1])
+    unions = areas + other_areas - intersections
+
+    # Degenerate boxes do not overlap
+    return np.where(unions > 0, intersections / np.where(unions > 0, unions, 1), 0.0)
+
+
+def _overlapping_pairs(
+    columns: ColumnarAnnotations,
+    threshold: float,
+    same_label: bool,
+) -> "tuple[np.ndarray, np.ndarray, np.ndarray]":
+    """
+    The indices of the boxes of each overlapping pair, the first box
+    being before the second one, and their IoU.
+    """
+    coords = _corners(columns.coords)
+    groups = columns.image_ids
+    if same_label:
+        groups = groups * max(len(columns.vocabulary), 1) + columns.label_ids
+
+    # Boxes of the same group are made contiguous, each one is paired
+    # with the boxes of its group after it.
+    order = np.argsort(groups, kind="stable")
+    _, group_starts, group_sizes = np.unique(groups[order], return_index=True, return_counts=True)
+    positions = np.arange(len(order)) - np.repeat(group_starts, group_sizes)
+    nb_pairs = np.repeat(group_sizes, group_sizes) - positions - 1
+    pair_ends = np.cumsum(nb_pairs)
+
+    results = []
+    start = 0
+    while start < len(order):
+        # Positions whose pairs fit in a batch, at least one position
+        stop = max(int(np.searchsorted(pair_ends, pair_ends[start] - nb_pairs[start] + _MAX_PAIRS, "right")), start + 1)
+        counts = nb_pairs[start:stop]
+        first = np.repeat(np.arange(start, stop), counts)
+        second = first + 1 + np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        first, second = order[first], order[second]
+        ious = _iou(coords[first], coords[second])
+        overlapping = ious > threshold
+        results.append((first[overlapping], second[overlapping], ious[overlapping]))
+        start = stop
+
+    if not results:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0)
+    first, second, ious = (np.concatenate(r) for r in zip(*results))
+
+    order = np.lexsort((second, first))
+    return first[order], second[order], ious[order]
+
+
+def _apply(
+    annotations: Union[Annotation, Annotations, ColumnarAnnotations],
+    columns: ColumnarAnnotations,
+    removed: np.ndarray,
+    coords: np.ndarray,
+    confidences: np.ndarray,
+):
+    """Write new box coordinates and confidences and remove boxes in place."""
+    is_kept = np.ones(len(columns.label_ids), dtype=bool)
+    is_kept[removed] = False
+
+    if isinstance(annotations, ColumnarAnnotations):
+        annotations.coords = coords
+        annotations.confidences = confidences
+        annotations.filter_mask(is_kept)
+        return
+
+    changed = np.flatnonzero(np.any(coords != columns.coords, axis=1)
+        | ~np.isclose(confidences, columns.confidences, equal_nan=True))
+    if isinstance(annotations, Annotation):
+        annotations = [annotations]
+
+    image_ids = columns.image_ids
+    for box in changed.tolist():
+        annotation = annotations[image_ids[box]]
+        bounding_box = annotation.boxes[box - columns.offsets[image_ids[box]]]
+        bounding_box._xmin, bounding_box._ymin, bounding_box._xmax, bounding_box._ymax = coords[box].tolist()
+        bounding_box.confidence = None if np.isnan(confidences[box]) else float(confidences[box])
+
+    for image in np.unique(image_ids[removed]).tolist():
+        annotation = annotations[image]
+        start = columns.offsets[image]
+        annotation.boxes = [b for i, b in enumerate(annotation.boxes) if is_kept[start + i]]
@@ -1,14 +1,19 @@
 from .annotation import Annotation, Annotations
 from .utils import *
+from .export import MANIFEST_NAME, AsyncExporter, ExportJob, ExportStats, load_manifest, manifest_entry, save_manifest
+from .profiling import profiler
 
-from concurrent.futures import ThreadPoolExecutor
-from tqdm.contrib.concurrent import thread_map
 from sys import exit
+from typing import Callable, Iterable, NamedTuple, Sequence, TextIO, Union
 from os import PathLike
 from pathlib import Path
+from array import array
+import hashlib
+import os
 from random import Random
-import shutil
-import lxml.etree as ET
+
+
+SPLIT_MODES = ("shuffle", "hash", "stratified")
 
 
 def create_yolo_trainval(
@@ -20,7 +25,14 @@ def create_yolo_trainval(
     shuffle: bool = True,
     random_seed: int = 149_843_046_101,
     exist_ok: bool = False,
-):
+    precision: int = None,
+    link_mode: str = "copy",
+    incremental: bool = False,
+    image_jobs: int = 8,
+    label_jobs: int = 16,
+    device_jobs: int = None,
+    split: str = "shuffle",
+) -> ExportStats:
     """
     Create a YOLO database suitable for training with Darknet
     from a set of BoundingBoxes representing image annotations.
@@ -29,7 +41,15 @@ def create_yolo_trainval(
     images and annotations are stored.
 
     Randomness is reproductible if the annotation image paths
-    comparison order and number stay the same across runs.
+    comparison order and number stay the same across runs. With the
+    "hash" split, images are assigned to the training or validation 
+    set independently of the other images, see `hash_split()`, so that 
+    adding images does not change the split of the existing ones. The
+    "stratified" split balances the labels between both sets, see 
+    `stratified_split()`.
+
+    Exported images are named after a hash of their source path, thus
+    an image keeps its name when other images are added or removed.
 
     Parameters:
     - annotations: the annotations for the database creation.
@@ -39,8 +59,32 @@ def create_yolo_trainval(
     paths stored in train.txt and val.txt.
     - train_ratio: the percent of images to use in the training set.
     - shuffle: set to True to shuffle the dataset.
+    - precision: the number of decimals of the box coordinates. By
+    default the shortest exact float representation is used.
+    - link_mode: how images are exported, one of "copy", "hardlink", 
+    "symlink" or "reflink" (copy-on-write clone). Images fall back to 
+    a copy when the mode is not supported by the filesystem.
+    - incremental: if True, only the images and labels that differ from
+    the previous export recorded in `manifest.json` are written and the
+    files of the previous export that are no longer used are removed.
+    The result is the same as a full export in an empty folder.
+    - image_jobs: the maximum number of concurrent image exports.
+    - label_jobs: the maximum number of concurrent label file writes.
+    - device_jobs: the maximum number of concurrent image exports 
+    reading from the same device, e.g. 1 or 2 for spinning disks.
+    Not limited by default. See `AsyncExporter`.
+    - split: how images are assigned to the training and validation
+    sets. "shuffle" takes the first `train_ratio` percent of the shuffled
+    images, "hash" uses a hash of each image path and `random_seed` and
+    "stratified" splits each label with `train_ratio`.
+
+    Returns:
+    - The number of bytes copied and linked and the throughput.
     """
+    from .yolo import yolo_reprs
+
     assert 0.0 <= train_ratio <= 1.0, "train_ratio must be in 0...1"
+    assert split in SPLIT_MODES, f"split should be one of {SPLIT_MODES}"
 
     save_dir = Path(save_dir).expanduser().resolve()
     prefix = Path(prefix)
@@ -52,9 +96,6 @@ def create_yolo_trainval(
     valid_dir.mkdir(exist_ok=exist_ok)
 
     labels = labels or sorted(annotations.labels())
-    labels_to_numbers = {l: str(n) for n, l in enumerate(labels)}
-
-    annotations.map_labels(labels_to_numbers)
 
     if shuffle:
         # FIXME: Ugly `.annotations`, should change this.
@@ -63,39 +104,374 @@ def create_yolo_trainval(
         random_gen = Random(random_seed)
         random_gen.shuffle(annotations)
 
-    len_train = int(train_ratio * len(annotations))
+    if split == "shuffle":
+        len_train = int(train_ratio * len(annotations))
+    else:
+        if split == "hash":
+            is_train = [hash_split(a.image_path, train_ratio, random_seed) for a in annotations]
+        else:
+            is_train = stratified_split(annotations, train_ratio, random_seed).tolist()
+        annotations.annotations = [a for a, t in zip(annotations, is_train) if t] \
+            + [a for a, t in zip(annotations, is_train) if not t]
+        len_train = sum(is_train)
+
+    with profiler.stage("export.serialize") as stage:
+        ann_contents = yolo_reprs(annotations, labels, precision)
+        stage.count(images=len(ann_contents))
+
+    names = _ImageNames()
+    image_names = [names(a.image_path) for a in annotations]
+    image_files = [f"train/{n}" if i < len_train else f"val/{n}" for i, n in enumerate(image_names)]
+
+    with profiler.stage("export.plan") as stage:
+        manifest = {f: manifest_entry(a.image_path, c, link_mode) 
+            for f, a, c in zip(image_files, annotations, ann_contents)}
+
+        stats = ExportStats()
+        previous = load_manifest(save_dir) if incremental else {}
+        to_export = [i for i, f in enumerate(image_files) 
+            if not _is_exported(save_dir / f, manifest[f], previous.get(f))]
+        stats.unchanged = len(annotations) - len(to_export)
+
+        if incremental:
+            # Remove files of the previous export that are no longer used
+            outputs = {f for image_file in image_files 
+                for f in (image_file, Path(image_file).with_suffix(".txt").as_posix())}
+            for file in (*train_dir.iterdir(), *valid_dir.iterdir()):
+                if file.relative_to(save_dir).as_posix() not in outputs:
+                    file.unlink()
+                    stats.removed += 1
+
+        # Files about to be written are not valid until the export is done
+        kept = set(image_files).difference(image_files[i] for i in to_export)
+        save_manifest(save_dir, {f: e for f, e in previous.items() if f in kept})
+        stage.count(images=len(annotations), unchanged=stats.unchanged, removed=stats.removed)
+
+    jobs = [ExportJob(
+            source=annotations[i].image_path, 
+            image_file=save_dir / image_files[i],
+            label_file=(save_dir / image_files[i]).with_suffix(".txt"),
+            label_content=ann_contents[i]) 
+        for i in to_export]
+
+    with profiler.stage("export.files") as stage:
+        exporter = AsyncExporter(link_mode, image_jobs, label_jobs, device_jobs)
+        exporter.export(jobs, stats)
+        stage.count(
+            files=sum(stats.files.values()) + stats.label_files,
+            bytes=sum(stats.bytes.values()) + stats.label_bytes)
+
+    with profiler.stage("export.lists"):
+        train_file = save_dir / "train.txt"
+        valid_file = save_dir / "val.txt"
+        names_file = save_dir / "obj.names"
+
+        train_file.write_text(
+            "\n".join(str(prefix / f"train/{n}") for n in image_names[:len_train]))
+        valid_file.write_text(
+            "\n".join(str(prefix / f"val/{n}") for n in image_names[len_train:]))
+
+        names_file.write_text("\n".join(labels))
+        save_manifest(save_dir, manifest)
+
+    return stats
+
+
+def stream_yolo_trainval(
+    annotations: Iterable[Annotation],
+    labels: "list[str]" = None,
+    save_dir: PathLike = "yolo_trainval/", 
+    prefix: PathLike = "data/", 
+    train_ratio: float = 80/100,
+    random_seed: int = 149_843_046_101,
+    split: str = "shuffle",
+    exist_ok: bool = False,
+    transforms: "Sequence[Callable[[Annotation], Annotation]]" = (),
+    precision: int = None,
+    link_mode: str = "copy",
+    image_jobs: int = 8,
+    label_jobs: int = 16,
+    device_jobs: int = None,
+    batch_size: int = 1024,
+) -> ExportStats:
+    """
+    Streaming variant of `create_yolo_trainval()` which consumes the
+    annotations lazily, for instance from `iter_xml_folders()`, and 
+    writes the database as it goes so that memory only grows by a few
+    bytes per image, to name the exported images, see `_ImageNames`.
+
+    Each annotation goes through the `transforms` in order, then is 
+    assigned to the training or validation set and exported. Transforms
+    are functions of an annotation returning the transformed annotation,
+    or None to drop it:
+
+    ```
+    stream_yolo_trainval(iter_xml_folders(folders), transforms=[
+        methodcaller("square_boxes", 7.5/100, stem_labels),
+        methodcaller("map_labels", fr_to_en),
+        lambda a: None if a.is_empty else a,
+    ])
+    ```
+
+    With the "shuffle" split, each image goes to the training set with
+    probability `train_ratio`, which is reproductible if annotations 
+    come in the same order. The "hash" split does not depend on the 
+    order, see `hash_split()`. The "stratified" split needs all the
+    annotations and is not supported.
+    
+    Export manifests are not supported thus the manifest of a previous
+    export in `save_dir` is removed.
+
+    Parameters:
+    - annotations: the annotations for the database creation.
+    - labels: list of labels specifying the label order in `obj.names`.
+    By default labels are numbered in the order they are found.
+    - split: "shuffle" or "hash", see above.
+    - transforms: functions applied to each annotation.
+    - batch_size: the number of annotations serialized at once.
+    
+    See `create_yolo_trainval()` for the other parameters.
 
-    def create_annotation(indexed_annotation: "tuple[int, Annotation]") -> str:
-        i, annotation = indexed_annotation
+    Returns:
+    - The number of bytes copied and linked and the throughput.
+    """
+    from .yolo import yolo_reprs
 
-        dir = train_dir if i < len_train else valid_dir
-        img_filename = dir / f"im_{i:06}{annotation.image_path.suffix}"
-        ann_filename = img_filename.with_suffix(".txt")
-        ann_content = annotation.yolo_repr()
+    assert 0.0 <= train_ratio <= 1.0, "train_ratio must be in 0...1"
+    assert split in ("shuffle", "hash"), "split should be 'shuffle' or 'hash' when streaming"
+    assert batch_size > 0, "batch_size should be positive"
 
-        try:
-            shutil.copyfile(annotation.image_path, img_filename)
-            ann_filename.write_text(ann_content)
-        except KeyboardInterrupt:
-            shutil.copyfile(annotation.image_path, img_filename)
-            ann_filename.write_text(ann_content)
-            exit()
+    save_dir = Path(save_dir).expanduser().resolve()
+    prefix = Path(prefix)
+    save_dir.mkdir(exist_ok=exist_ok)
+    (save_dir / "train/").mkdir(exist_ok=exist_ok)
+    (save_dir / "val/").mkdir(exist_ok=exist_ok)
+    (save_dir / MANIFEST_NAME).unlink(missing_ok=True)
+
+    found_labels = list(labels) if labels is not None else []
+    random_gen = Random(random_seed)
+    names = _ImageNames()
+
+    def batches() -> Iterable[Annotations]:
+        batch = []
+        for annotation in annotations:
+            for transform in transforms:
+                annotation = transform(annotation)
+                if annotation is None:
+                    break
+            else:
+                batch.append(annotation)
+            if len(batch) == batch_size:
+                yield Annotations(batch)
+                batch = []
+        if batch:
+            yield Annotations(batch)
+
+    def jobs(list_files: "dict[str, TextIO]") -> Iterable[ExportJob]:
+        counts = {subset: 0 for subset in list_files}
+        for batch in batches():
+            if labels is None:
+                found_labels.extend(sorted(batch.labels().difference(found_labels)))
+            contents = yolo_reprs(batch, found_labels, precision)
+
+            for annotation, content in zip(batch, contents):
+                if split == "hash":
+                    is_train = hash_split(annotation.image_path, train_ratio, random_seed)
+                else:
+                    is_train = random_gen.random() < train_ratio
+
+                subset = "train" if is_train else "val"
+                image_name = names(annotation.image_path)
+                image_file = save_dir / subset / image_name
+                separator = "\n" if counts[subset] else ""
+                list_files[subset].write(f"{separator}{prefix / subset / image_name}")
+                counts[subset] += 1
+
+                yield ExportJob(
+                    source=annotation.image_path,
+                    image_file=image_file,
+                    label_file=image_file.with_suffix(".txt"),
+                    label_content=content)
+
+    with profiler.stage("export.stream") as stage, \
+        open(save_dir / "train.txt", "w") as train_file, \
+        open(save_dir / "val.txt", "w") as valid_file:
+        exporter = AsyncExporter(link_mode, image_jobs, label_jobs, device_jobs)
+        stats = exporter.export(jobs({"train": train_file, "val": valid_file}))
+        stage.count(
+            images=sum(stats.files.values()),
+            files=sum(stats.files.values()) + stats.label_files,
+            bytes=sum(stats.bytes.values()) + stats.label_bytes)
+
+    (save_dir / "obj.names").write_text("\n".join(found_labels))
+
+    return stats
+
+
+def hash_split(image_path: PathLike, train_ratio: float, random_seed: int) -> bool:
+    """
+    Whether an image belongs to the training set according to a hash
+    of its path and of the seed, which is uniformly distributed. The 
+    assignment of an image does not depend on the other images and is 
+    stable across runs, platforms and Python versions, as long as the 
+    image path and the seed do not change.
+    """
+    key = f"{random_seed}:{Path(image_path).as_posix()}".encode()
+    digest = hashlib.blake2b(key, digest_size=8).digest()
+    return int.from_bytes(digest, "big") < train_ratio * 2**64
+
+
+def stratified_split(
+    annotations: "Union[Annotations, ColumnarAnnotations]",
+    train_ratio: float,
+    random_seed: int,
+) -> "np.ndarray":
+    """
+    Assign images to the training set so that labels are split with
+    `train_ratio`, in number of images and in number of boxes.
+
+    Images are grouped by their rarest label, which thus drives the 
+    assignment of multi-label images, and empty images form their own 
+    group. Each group is ordered by the number of boxes of its label in
+    each image, then by the total number of boxes, ties being randomly
+    ordered, and every image where the running count
+    `rank * train_ratio` crosses an integer goes to the training set. 
+    Groups are thus split with an error below one image, and their boxes
+    with an error of about the boxes of one image since consecutive 
+    images have close box counts. The other labels of multi-label images
+    are only split approximately, as a random sample of their images.
+    Computed with vectorized operations in O(n log n).
 
-        return img_filename.name
+    Parameters:
+    - annotations: the annotations to split.
+    - train_ratio: the percent of images of each label in the training set.
+    - random_seed: the seed of the random ordering.
+
+    Returns:
+    - A boolean array in the order of `annotations`, True for the 
+    images of the training set.
+    """
+    from .columnar import ColumnarAnnotations
+    import numpy as np
+
+    if not isinstance(annotations, ColumnarAnnotations):
+        annotations = ColumnarAnnotations.from_annotations(annotations)
+
+    nb_images = len(annotations)
+    nb_labels = len(annotations.vocabulary)
+    random_gen = np.random.default_rng(random_seed)
+
+    # Sparse image x label box count matrix as sorted (image, label) pairs
+    pairs, pair_boxes = np.unique(annotations.image_ids * max(nb_labels, 1) + annotations.label_ids,
+        return_counts=True)
+    pair_images, pair_labels = np.divmod(pairs, max(nb_labels, 1))
+    label_images = np.bincount(pair_labels, minlength=nb_labels)
+
+    # The rarest label of each image is its first pair sorted by label frequency
+    strata = np.full(nb_images, nb_labels)
+    strata_boxes = np.zeros(nb_images, dtype=int)
+    order = np.lexsort((pair_labels, label_images[pair_labels], pair_images))
+    images, first = np.unique(pair_images[order], return_index=True)
+    strata[images] = pair_labels[order][first]
+    strata_boxes[images] = pair_boxes[order][first]
+    image_boxes = np.bincount(annotations.image_ids, minlength=nb_images)
+
+    # Rank of each image in its group ordered by box counts
+    order = np.lexsort((random_gen.random(nb_images), image_boxes, strata_boxes, strata))
+    sorted_strata = strata[order]
+    ranks = np.arange(nb_images) - np.searchsorted(sorted_strata, sorted_strata)
+
+    # A random phase per group avoids favoring the validation set
+    phases = random_gen.random(nb_labels + 1)[sorted_strata]
+    is_train = np.empty(nb_images, dtype=bool)
+    is_train[order] = np.floor((ranks + 1) * train_ratio + phases) \
+        > np.floor(ranks * train_ratio + phases)
+
+    return is_train
+
+
+class _ImageNames:
+    """
+    Names of exported images, a hash of the absolute source path so that
+    they do not change when other images are added or removed. Repeated
+    occurrences of an image are numbered.
+
+    The hashes already seen are stored in an open addressing table of
+    64-bit integers, using at most 16 bytes per image, and occurrences
+    are only counted for repeated images.
+    """
+
+    def __init__(self):
+        self._table = array("Q", bytes(8 * 1024))
+        self._size = 0
+        self._repeats = {}
+
+    def __call__(self, image_path: PathLike) -> str:
+        image_path = Path(image_path)
+        digest = hashlib.blake2b(os.path.abspath(image_path).encode(), digest_size=8).digest()
+        key = int.from_bytes(digest, "big")
+        name = digest.hex()
+        if not self._add(key):
+            count = self._repeats.get(key, 1)
+            self._repeats[key] = count + 1
+            name += f"_{count}"
+        return name + image_path.suffix
+
+    def _add(self, key: int) -> bool:
+        """Add a hash to the table, False if it was already there."""
+        if 2 * (self._size + 1) > len(self._table):
+            keys = [k for k in self._table if k != 0]
+            self._table = array("Q", bytes(16 * len(self._table)))
+            self._size = 0
+            for k in keys:
+                self._add(k)
+
+        key = key or 1  # Zero marks the empty slots
+        table, mask = self._table, len(self._table) - 1
+        slot = key & mask
+        while (current := table[slot]) != 0:
+            if current == key:
+                return False
+            slot = (slot + 1) & mask
+        table[slot] = key
+        self._size += 1
+        return True
+
+
+def _is_exported(image_file: Path, entry: dict, previous_entry: dict) -> bool:
+    """
+    Whether an image and its label file are already exported according to 
+    the previous export manifest entry.
+    """
+    return entry == previous_entry and os.path.lexists(image_file) \
+        and image_file.with_suffix(".txt").exists()
 
-    image_names = thread_map(create_annotation, enumerate(annotations), 
-        total=len(annotations), unit="imgs")
 
-    train_file = save_dir / "train.txt"
-    valid_file = save_dir / "val.txt"
-    names_file = save_dir / "obj.names"
+def create_noobj_annotations(
+    folder: PathLike,
+    img_ext: str = ".jpg",
+    workers: int = 1,
+) -> Annotations:
+    """
+    Create empty annotations for each image in a folder which does 
+    not contain annotation. This is equivalent to `create_noobj_folder()`
+    followed by `parse_xml_folder()` but does not write any .xml file.
 
-    train_file.write_text(
-        "\n".join(str(prefix / f"train/{n}") for n in image_names[:len_train]))
-    valid_file.write_text(
-        "\n".join(str(prefix / f"val/{n}") for n in image_names[len_train:]))
+    Parameters:
+    - folder: the path where images are stored
+    - img_ext: the image extension to consider
+    - workers: the number of worker processes reading the image sizes, 
+    0 for one per CPU core.
 
-    names_file.write_text("\n".join(labels))
+    Returns:
+    - The empty annotations.
+    """
+    with profiler.stage("noobj") as stage:
+        folder = Path(folder).expanduser().resolve()
+        images = [image.resolve() for image in glob(folder, img_ext)]
+        sizes = get_image_sizes(images, workers)
+        stage.count(files=len(images))
+        return Annotations([Annotation(i, tuple(s)) for i, s in zip(images, sizes)])
 
 
 def create_noobj_folder(
@@ -110,6 +486,8 @@ def create_noobj_folder(
     - folder: the path where images are stored
     - img_ext: the image extension to consider
     """
+    import lxml.etree as ET
+
     folder = Path(folder).expanduser().resolve()
     images = glob(folder, img_ext)
     
@@ -143,32 +521,74 @@ def create_noobj_folder(
             exit()
 
 
-def resolve_xml_file_paths(folders: "list[PathLike]", recursive: bool = False):
+class ResolveResult(NamedTuple):
+    """Number of .xml files processed by `resolve_xml_file_paths()`."""
+    changed: int
+    unchanged: int
+    failed: int
+
+
+def resolve_xml_file_paths(
+    folders: "list[PathLike]", 
+    recursive: bool = False,
+    workers: int = 1,
+) -> ResolveResult:
     """
     Change the 'path' field of xml file to be the current path
     of the xml file. this function should be used if the original 
     database has been moved and the `path` field no longer matches
     the file path.
 
+    Only the files whose `path` field differs are rewritten, atomically
+    so that an interruption does not corrupt them. Files that can not 
+    be processed are logged in `parser.log`.
+
     Parameters:
     - folders: paths to folders with .xml files to process
+    - recursive: process the folders recursively.
+    - workers: the number of worker processes, 0 for one per CPU core.
+
+    Returns:
+    - The number of changed, unchanged and failed files.
     """
-    files = (f for folder in folders for f in folder.glob("**/*.xml" if recursive else "*.xml"))
-    executor = ThreadPoolExecutor()
-    executor.map(_resolve, files)
+    with profiler.stage("resolve") as stage:
+        files = [str(f) for folder in folders 
+            for f in glob(Path(folder).expanduser().resolve(), ".xml", recursive)]
+        statuses = parallel_map(_resolve, files, workers, unit="files", progress=True)
+
+        for file, status in zip(files, statuses):
+            if status == "failed":
+                logger.warning(f"Error while resolving the path of '{file}'.")
+
+        result = ResolveResult(
+            changed=statuses.count("changed"),
+            unchanged=statuses.count("unchanged"),
+            failed=statuses.count("failed"))
+        stage.count(files=len(files), changed=result.changed, failures=result.failed)
+
+    return result
+
 
+def _resolve(file: str) -> str:
+    import lxml.etree as ET
 
-def _resolve(file: Path):
-    filename = str(file)
     try:
-        tree = ET.parse(filename)
-        tree.find("path").text = filename
-    except ET.ParseError: 
-        return
-    else:
-        content = ET.tostring(tree, encoding="unicode", pretty_print=True)
-        try:  # Avoid data corruption if KeyboardInterrupt while writing
-            file.write_text(content)
-        except KeyboardInterrupt:
-            file.write_text(content)
-            exit()
\ No newline at end of file
+        tree = ET.parse(file)
+    except (ET.ParseError, OSError):
+        return "failed"
+
+    path_node = tree.find("path")
+    if path_node is None:
+        return "failed"
+    if path_node.text == file:
+        return "unchanged"
+
+    path_node.text = file
+    content = ET.tostring(tree, encoding="unicode", pretty_print=True)
+
+    try:
+        atomic_write(file, content)
+    except OSError:
+        return "failed"
+
+    return "changed"
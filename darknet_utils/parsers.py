@@ -1,20 +1,76 @@
-from darknet_utils.utils import glob
-import logging
 from .bounding_box import BoundingBox
 from .annotation import Annotation, Annotations
-from .utils import glob
+from .cache import FileCache
+from .profiling import profiler
+from .utils import glob, logger, parallel_imap, parallel_map
 
+from functools import partial
 from os import PathLike
 from pathlib import Path
-from typing import Sequence
-import logging
+from typing import Iterator, Sequence
+import hashlib
+import os
+import re
 
-import lxml.etree as ET
 
+PARSE_CACHE_DIR = Path("~/.cache/darknet_utils/parse")
 
-logging.basicConfig(filename="parser.log")
+# Fast path of the parser for the layout written by labelImg. Files which
+# deviate from it, e.g. with other elements, entities, comments or carriage
+# returns in the text, are parsed by lxml. Only well-formed files can match.
+_SPACE = r"[ \t\r\n]*"
+_TEXT = r"[^<>&\r\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]"
 
-def parse_xml_file(file: PathLike, labels: Sequence[str] = None) -> Annotation:
+
+def _leaf(tag: str, content: str = f"{_TEXT}*") -> str:
+    return f"<{tag}>{content}</{tag}>{_SPACE}"
+
+
+def _field(tag: str, capture: bool = True) -> str:
+    """A leaf with a non-empty text, captured in a group of the same name."""
+    return _leaf(tag, f"(?P<{tag}>{_TEXT}+)" if capture else f"{_TEXT}+")
+
+
+def _optional(*patterns: str) -> str:
+    return "".join(f"(?:{p})?" for p in patterns)
+
+
+def _labelimg_object(capture: bool) -> str:
+    return f"<object>{_SPACE}" + _field("name", capture) \
+        + _optional(_leaf("pose"), _leaf("truncated"), _leaf("difficult")) \
+        + f"<bndbox>{_SPACE}" + "".join(_field(c, capture) for c in ("xmin", "ymin", "xmax", "ymax")) \
+        + f"</bndbox>{_SPACE}</object>{_SPACE}"
+
+
+_LABELIMG_OBJECT = re.compile(_labelimg_object(capture=True))
+
+_LABELIMG_XML = re.compile(
+    # Optional BOM and XML declaration, UTF-8 only
+    "\ufeff?"
+    rf"""(?:<\?xml[ \t\r\n]+version{_SPACE}={_SPACE}(?:"1\.0"|'1\.0')"""
+    rf"""(?:[ \t\r\n]+encoding{_SPACE}={_SPACE}(?:"(?i:utf-8)"|'(?i:utf-8)'))?"""
+    rf"""(?:[ \t\r\n]+standalone{_SPACE}={_SPACE}(?:"(?:yes|no)"|'(?:yes|no)'))?{_SPACE}\?>)?{_SPACE}"""
+    rf"""<annotation(?:[ \t\r\n]+verified{_SPACE}={_SPACE}(?:"[^"<&]*"|'[^'<&]*'))?{_SPACE}>{_SPACE}"""
+    + _optional(_leaf("folder"))
+    + _field("filename")
+    + _field("path")
+    + _optional(f"<source>{_SPACE}" + _optional(_leaf("database")) + f"</source>{_SPACE}")
+    + f"<size>{_SPACE}" + _field("width") + _field("height")
+    + _optional(_leaf("depth")) + f"</size>{_SPACE}"
+    + _optional(_leaf("segmented"))
+    + f"(?P<objects>(?:{_labelimg_object(capture=False)})*)"
+    + rf"</annotation>{_SPACE}\Z")
+
+# Returned by the fast path for files it cannot parse
+_NOT_LABELIMG = object()
+
+
+def parse_xml_file(
+    file: PathLike, 
+    labels: Sequence[str] = None,
+    cache: FileCache = None,
+    fast: bool = True,
+) -> Annotation:
     """
     Parse an .xml file annotated with labelImg of other
     software that used the same anntotation format.
@@ -36,42 +92,61 @@ def parse_xml_file(file: PathLike, labels: Sequence[str] = None) -> Annotation:
     Parameters:
     - file: the xml file to process.
     - labels: a set of box labels to parse.
+    - cache: an optional cache of parsed files, see `parse_cache()`.
+    - fast: parse the files written by labelImg with regular expressions
+    instead of lxml, giving the same annotations faster.
     
     Returns:
     - An object representing the image annotations or None if 
     the .xml file was not readable.
     """
+    caches = None if cache is None else [cache]
+    result, = _parse_xml_results([file], labels, caches=caches, fast=fast)
 
-    try:
-        tree = ET.parse(str(file)).getroot()
-        
-        path = tree.find("path").text
-        name = tree.find("filename").text
+    if result is False:
+        logger.warning(f"Error while reading '{file}'.")
+        profiler.count("parse.build", failures=1)
+        return None
 
-        img_size_node = tree.find("size")
-        img_w = int(img_size_node.find("width").text)
-        img_h = int(img_size_node.find("height").text)
+    return _annotation_from_compact(result)
 
-        object_nodes = tree.findall("object")
-        boxes = (_read_bndbox(o, labels) for o in object_nodes)
-        boxes = [box for box in boxes if box]
 
-        # Remove empty annotations resulting from the box label filtering
-        if len(object_nodes) != 0 and len(boxes) == 0:
-            return None
-    except ET.ParseError:
-        logging.warning(f"Error while reading '{file}'.")
-        return None
+def parse_xml_files(
+    files: "Sequence[PathLike]",
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    cache: FileCache = None,
+    fast: bool = True,
+) -> Annotations:
+    """
+    Parse a list of .xml files. See `parse_xml_file` for more details.
 
-    image_path = Path(path).with_name(name).expanduser().resolve()
+    Files can be parsed in parallel by several worker processes, in
+    which case the output order is still the order of `files`.
+
+    Parameters:
+    - files: the xml files to process.
+    - labels: a set of box labels to parse.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: an optional cache of parsed files, see `parse_cache()`.
+    - fast: parse the files written by labelImg with regular expressions
+    instead of lxml, giving the same annotations faster.
 
-    return Annotation(image_path, (img_w, img_h), boxes)
+    Returns:
+    - A list of annotations.
+    """
+    caches = None if cache is None else [cache] * len(files)
+    return _annotations_from_results(files, _parse_xml_results(files, labels, workers, caches, fast))
 
 
 def parse_xml_folder(
     folder: PathLike, 
     recursive: bool = False, 
-    labels: Sequence[str] = None
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    cache: bool = False,
+    cache_size: int = None,
+    fast: bool = True,
 ) -> Annotations:
     """
     Parse .xml annotations present in a folder. See `parse_xml`
@@ -80,35 +155,305 @@ def parse_xml_folder(
     Parameters:
     - folder: a path to a folder containing .xml annotations.
     - labels: a set of box labels to parse.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: set to True to reuse the parsing results of the previous
+    runs for files that did not change. See `parse_cache()`.
+    - cache_size: the maximum number of files in the cache.
+    - fast: parse the files written by labelImg with regular expressions
+    instead of lxml, giving the same annotations faster.
 
     Returns:
     - A list of annotations.
     """
-    folder = Path(folder).expanduser().resolve()
-    files = glob(folder, extension=".xml", recursive=recursive)
-    return Annotations([ann for f in files if (ann := parse_xml_file(f, labels))])
+    return parse_xml_folders([folder], recursive, labels, workers, cache, cache_size, fast)
 
 
 def parse_xml_folders(
     folders: "list[PathLike]", 
     recursive=False,
-    labels: Sequence[str] = None) -> Annotations:
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    cache: bool = False,
+    cache_size: int = None,
+    fast: bool = True) -> Annotations:
     """
     Parse .xml annotations present in several folders. See `parse_xml`
     for more details.
 
+    Files of all the folders share the same process pool when
+    `workers` is not 1.
+
     Parameters:
     - folders: list of paths to folders containing .xml annotations.
     - labels: a set of box labels to parse.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: set to True to reuse the parsing results of the previous
+    runs for files that did not change. Each folder has its own cache
+    file, see `parse_cache()`.
+    - cache_size: the maximum number of files in each folder cache.
+    - fast: parse the files written by labelImg with regular expressions
+    instead of lxml, giving the same annotations faster.
 
     Returns:
     - An list of annotations.
     """
-    return Annotations([a for f in folders 
-            for a in parse_xml_folder(f, recursive, labels)])
+    with profiler.stage("parse.glob") as stage:
+        folders = [Path(f).expanduser().resolve() for f in folders]
+        files = [list(glob(folder, ".xml", recursive)) for folder in folders]
+        all_files = [file for folder_files in files for file in folder_files]
+        stage.count(folders=len(folders), files=len(all_files))
+
+    if not cache:
+        return _annotations_from_results(all_files, 
+            _parse_xml_results(all_files, labels, workers, fast=fast))
+
+    caches = [parse_cache(folder, cache_size) for folder in folders]
+    file_caches = [c for c, folder_files in zip(caches, files) for _ in folder_files]
+    results = _parse_xml_results(all_files, labels, workers, file_caches, fast)
+
+    for c in caches:
+        c.save()
+
+    return _annotations_from_results(all_files, results)
+
+
+def iter_xml_folders(
+    folders: "list[PathLike]",
+    recursive: bool = False,
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    chunksize: int = 256,
+    fast: bool = True,
+) -> Iterator[Annotation]:
+    """
+    Lazily parse .xml annotations present in several folders, in bounded
+    memory. See `parse_xml_folders()` for the eager variant.
+
+    Files are listed and parsed as the annotations are consumed, at most
+    a few chunks of files ahead when `workers` is not 1. Unreadable files
+    are logged in `parser.log` and skipped.
+
+    Parameters:
+    - folders: list of paths to folders containing .xml annotations.
+    - recursive: parse the folders recursively.
+    - labels: a set of box labels to parse.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - chunksize: the number of files sent at once to a worker process.
+    - fast: parse the files written by labelImg with regular expressions
+    instead of lxml, giving the same annotations faster.
+
+    Returns:
+    - An iterator of annotations.
+    """
+    labels = None if labels is None else set(labels)
+    files = (str(f) for folder in folders
+        for f in glob(Path(folder).expanduser().resolve(), ".xml", recursive))
+    results = parallel_imap(partial(_parse_xml_item, labels=labels, fast=fast), files, workers, chunksize)
+
+    for file, result in results:
+        profiler.count("parse.read", files=1)
+        if result is False:
+            logger.warning(f"Error while reading '{file}'.")
+            profiler.count("parse.read", failures=1)
+        elif result is not None:
+            yield _annotation_from_compact(result)
+
+
+def parse_cache(folder: PathLike, max_entries: int = None) -> FileCache:
+    """
+    The cache of parsed .xml files of a dataset folder, stored in the
+    user cache folder in a file named after the dataset folder path.
+    The cache is not stored in the dataset folder since loading it can
+    run code and datasets are often shared.
+
+    Entries are keyed by file path, modification time and size so
+    only the files that changed are parsed again. Use `.clear()` or 
+    `.invalidate()` to drop entries.
+
+    Parameters:
+    - folder: the dataset root folder.
+    - max_entries: the maximum number of files in the cache.
+
+    Returns:
+    - The cache object.
+    """
+    folder = Path(folder).expanduser().resolve()
+    key = hashlib.blake2b(str(folder).encode(), digest_size=8).hexdigest()
+    return FileCache(PARSE_CACHE_DIR / f"{folder.name}-{key}", max_entries)
+
+
+def _parse_xml_results(
+    files: "Sequence[PathLike]", 
+    labels: Sequence[str] = None, 
+    workers: int = 1, 
+    caches: "list[FileCache]" = None,
+    fast: bool = True,
+) -> list:
+    """
+    Parse files to their compact representation (see `_parse_xml_compact`),
+    looking up caches first if provided, one per file.
+    """
+    files = [str(f) for f in files]
+    labels = None if labels is None else set(labels)
+
+    with profiler.stage("parse.read") as stage:
+        stage.count(files=len(files))
+        if profiler.enabled:
+            stage.count(bytes=sum(os.path.getsize(f) for f in files))
+
+        if caches is None:
+            return parallel_map(partial(_parse_xml_compact, labels=labels, fast=fast), files,
+                workers=workers, unit="files")
+
+        # Cache entries are stored unfiltered so that they can be reused
+        # with other label sets.
+        results = []
+        stale = []
+        for i, (file, cache) in enumerate(zip(files, caches)):
+            signature = FileCache.signature(file)
+            results.append(cache.get(file, signature))
+            if results[-1] is None:
+                stale.append((i, signature))
+
+        parsed = parallel_map(partial(_parse_xml_compact, fast=fast), [files[i] for i, _ in stale],
+            workers=workers, unit="files")
+
+        for (i, signature), result in zip(stale, parsed):
+            results[i] = result
+            if result is not False:
+                caches[i].put(files[i], result, signature)
+
+        stage.count(cache_hits=len(files) - len(stale), cache_misses=len(stale))
+        return [_filter_compact(r, labels) for r in results]
+
+
+def _annotations_from_results(files: "Sequence[PathLike]", results: list) -> Annotations:
+    with profiler.stage("parse.build") as stage:
+        annotations = Annotations()
+        failures = 0
+        for file, result in zip(files, results):
+            if result is False:
+                logger.warning(f"Error while reading '{file}'.")
+                failures += 1
+            elif result is not None:
+                annotations.append(_annotation_from_compact(result))
+        stage.count(images=len(annotations), failures=failures)
+    return annotations
+
+
+def _parse_xml_compact(file: PathLike, labels: Sequence[str] = None, fast: bool = True):
+    """
+    Parse an .xml file to a compact representation made of builtin types
+    only, which is cheap to send between processes:
+
+    `(image_path, (img_w, img_h), [(label, xmin, ymin, xmax, ymax), ...])`
+
+    Files with the labelImg layout are parsed with regular expressions
+    when `fast` is True, and with lxml otherwise, both giving the same
+    result.
+
+    Returns None if the annotation is empty because of the label filtering
+    and False if the file is not readable.
+    """
+    with open(file, "rb") as f:
+        data = f.read()
+
+    if fast:
+        result = _parse_labelimg(data, labels)
+        if result is not _NOT_LABELIMG:
+            return result
+
+    import lxml.etree as ET
+
+    try:
+        tree = ET.fromstring(data, base_url=str(file))
+        
+        path = tree.find("path").text
+        name = tree.find("filename").text
+
+        img_size_node = tree.find("size")
+        img_w = int(img_size_node.find("width").text)
+        img_h = int(img_size_node.find("height").text)
+
+        object_nodes = tree.findall("object")
+        boxes = (_read_bndbox(o, labels) for o in object_nodes)
+        boxes = [box for box in boxes if box]
+
+        # Remove empty annotations resulting from the box label filtering
+        if len(object_nodes) != 0 and len(boxes) == 0:
+            return None
+    except ET.ParseError:
+        return False
+
+    image_path = Path(path).with_name(name).expanduser().resolve()
+
+    return str(image_path), (img_w, img_h), boxes
+
+
+def _parse_labelimg(data: bytes, labels: Sequence[str] = None):
+    """
+    Fast path of `_parse_xml_compact` reading the fields of a labelImg
+    file with regular expressions, without building a tree. Returns
+    `_NOT_LABELIMG` if the file does not have the expected layout.
+    """
+    try:
+        text = data.decode("utf-8")
+    except UnicodeDecodeError:
+        return _NOT_LABELIMG
+
+    match = _LABELIMG_XML.match(text)
+    if match is None:
+        return _NOT_LABELIMG
+
+    try:
+        img_w, img_h = int(match["width"]), int(match["height"])
+        boxes = []
+        nb_objects = 0
+        for obj in _LABELIMG_OBJECT.finditer(text, match.start("objects"), match.end("objects")):
+            nb_objects += 1
+            label = obj["name"]
+            if labels and label not in labels:
+                continue
+            boxes.append((label, float(obj["xmin"]), float(obj["ymin"]), float(obj["xmax"]), float(obj["ymax"])))
+    except ValueError:
+        return _NOT_LABELIMG  # lxml raises the same error
+
+    # Remove empty annotations resulting from the box label filtering
+    if nb_objects != 0 and len(boxes) == 0:
+        return None
+
+    image_path = Path(match["path"]).with_name(match["filename"]).expanduser().resolve()
+
+    return str(image_path), (img_w, img_h), boxes
+
+
+def _parse_xml_item(file: str, labels: Sequence[str] = None, fast: bool = True):
+    return file, _parse_xml_compact(file, labels, fast)
+
+
+def _filter_compact(result, labels: Sequence[str] = None):
+    """Apply the label filtering of `_parse_xml_compact` to a compact result."""
+    if not labels or not result:
+        return result
+
+    image_path, image_size, boxes = result
+    kept = [box for box in boxes if box[0] in labels]
+
+    # Remove empty annotations resulting from the box label filtering
+    if len(boxes) != 0 and len(kept) == 0:
+        return None
+
+    return image_path, image_size, kept
+
+
+def _annotation_from_compact(result) -> Annotation:
+    if result is None:
+        return None
+    image_path, image_size, boxes = result
+    return Annotation(image_path, image_size, [BoundingBox(*b) for b in boxes])
 
 
-def _read_bndbox(obj, labels: Sequence[str] = None) -> BoundingBox:
+def _read_bndbox(obj, labels: Sequence[str] = None) -> "tuple[str, float, float, float, float]":
     label = obj.find("name").text
 
     if labels and label not in labels:
@@ -120,4 +465,4 @@ def _read_bndbox(obj, labels: Sequence[str] = None) -> BoundingBox:
     xmax = float(box.find("xmax").text)
     ymax = float(box.find("ymax").text)
 
-    return BoundingBox(label, xmin, ymin, xmax, ymax)
\ No newline at end of file
+    return label, xmin, ymin, xmax, ymax
\ No newline at end of file
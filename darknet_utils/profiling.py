@@ -0,0 +1,187 @@
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+from time import perf_counter
+import csv
+import json
+import os
+import sys
+
+
+PROFILE_ENV = "DARKNET_UTILS_PROFILE"
+
+
+class StageRecord:
+    """
+    Accumulated measures of a pipeline stage: number of calls, elapsed
+    time, peak memory and arbitrary counters such as processed files.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = 0
+        self.seconds = 0.0
+        self.peak_memory = 0
+        self.peak_worker_memory = 0
+        self.counters = {}
+
+    def count(self, **counters: int):
+        """Add values to counters, e.g. `count(files=10, bytes=2048)`."""
+        for name, value in counters.items():
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "calls": self.calls,
+            "seconds": self.seconds,
+            "peak_memory_mb": self.peak_memory / 1e6,
+            "peak_worker_memory_mb": self.peak_worker_memory / 1e6,
+            **self.counters,
+        }
+
+
+class _NullRecord:
+    """Stand-in for `StageRecord` when profiling is disabled."""
+
+    def __enter__(self) -> "_NullRecord":
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def count(self, **counters: int):
+        pass
+
+
+_NULL_RECORD = _NullRecord()
+
+
+class Profiler:
+    """
+    Collects the time spent in each stage of a dataset build as well as
+    counters such as the number of files and bytes processed, parse
+    failures and the process peak memory.
+
+    When disabled, stages cost a method call and counters are ignored so
+    instrumentation can stay in place. The library uses the global
+    `profiler`, enabled with `profiler.enable()` or by setting the
+    `DARKNET_UTILS_PROFILE` environment variable to 1.
+
+    ```
+    with profiler.stage("parse.read") as stage:
+        results = parse(files)
+        stage.count(files=len(files))
+    ```
+
+    Measures are made in the calling process only, the peak memory of
+    worker processes is reported separately.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.records = {}
+
+    def enable(self):
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def reset(self):
+        """Remove all the measures."""
+        self.records = {}
+
+    def stage(self, name: str):
+        """
+        Context manager measuring a stage. The stage record is returned
+        when entering, use its `count()` method to update counters. A
+        stage can be entered several times, measures are accumulated.
+        """
+        if not self.enabled:
+            return _NULL_RECORD
+        return self._measure(name)
+
+    def count(self, stage: str, **counters: int):
+        """Add values to the counters of a stage."""
+        if self.enabled:
+            self._record(stage).count(**counters)
+
+    @contextmanager
+    def _measure(self, name: str):
+        record = self._record(name)
+        start = perf_counter()
+        try:
+            yield record
+        finally:
+            record.calls += 1
+            record.seconds += perf_counter() - start
+            memory, worker_memory = _peak_memory()
+            record.peak_memory = max(record.peak_memory, memory)
+            record.peak_worker_memory = max(record.peak_worker_memory, worker_memory)
+
+    def _record(self, name: str) -> StageRecord:
+        record = self.records.get(name)
+        if record is None:
+            record = self.records[name] = StageRecord(name)
+        return record
+
+    def report(self) -> "list[dict]":
+        """The measures of each stage in the order they were first run."""
+        return [r.as_dict() for r in self.records.values()]
+
+    def save(self, file: PathLike):
+        """
+        Write the report to a .json file or a .csv file depending on
+        the file extension.
+        """
+        file = Path(file)
+        report = self.report()
+
+        if file.suffix.lower() == ".csv":
+            columns = {c: None for row in report for c in row}
+            with file.open("w", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(columns), restval=0)
+                writer.writeheader()
+                writer.writerows(report)
+        else:
+            file.write_text(json.dumps(report, indent=2))
+
+    def print_report(self):
+        """Prints the measures of each stage."""
+        from rich.table import Table
+        from rich import print as rprint
+
+        table = Table()
+
+        table.add_column("Stage")
+        table.add_column("Calls", justify="right")
+        table.add_column("Time (s)", justify="right")
+        table.add_column("Peak memory (MB)", justify="right")
+        table.add_column("Counters")
+
+        for r in self.records.values():
+            counters = ", ".join(f"{name}={value}" for name, value in r.counters.items())
+            table.add_row(r.name, f"{r.calls}", f"{r.seconds:.3f}", 
+                f"{r.peak_memory / 1e6:.0f}", counters)
+
+        rprint(table)
+
+
+def _peak_memory() -> "tuple[int, int]":
+    """
+    The peak resident memory in bytes of the current process and of the
+    largest terminated child process, or 0 if not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return 0, 0
+
+    # Kilobytes on Linux, bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit, \
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+
+
+profiler = Profiler(enabled=os.environ.get(PROFILE_ENV, "0").lower() not in ("", "0", "false", "no"))
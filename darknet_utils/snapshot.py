@@ -0,0 +1,199 @@
+from .annotation import Annotation, Annotations
+from .bounding_box import BoundingBox
+from .columnar import ColumnarAnnotations
+from .profiling import profiler
+
+from os import PathLike
+from pathlib import Path
+from typing import Union
+import json
+import os
+import struct
+
+import numpy as np
+
+
+SNAPSHOT_MAGIC = b"DKNSNAP\0"
+SNAPSHOT_VERSION = 1
+
+# Arrays are aligned in the file so that their memory maps are aligned
+_ALIGNMENT = 64
+
+# Name, dtype and number of columns of the arrays stored in a snapshot
+_ARRAYS = (
+    ("path_table", "u1", None),
+    ("path_offsets", "<i8", None),
+    ("image_sizes", "<i8", 2),
+    ("offsets", "<i8", None),
+    ("coords", "<f8", 4),
+    ("label_ids", "<i4", None),
+    ("confidences", "<f8", None),
+)
+
+
+class Snapshot:
+    """
+    Read-only view of a dataset saved with `save_snapshot()`. The file is
+    memory-mapped thus opening it is immediate whatever the dataset size
+    and the annotation of any image can be read without loading the rest.
+
+    ```
+    save_snapshot(annotations, "dataset.snap")
+    snapshot = load_snapshot("dataset.snap")
+    annotation = snapshot[1000]
+    annotations = snapshot.to_annotations()
+    ```
+
+    The columns are those of `ColumnarAnnotations` plus a path table:
+    image paths are stored as UTF-8 strings separated by a NUL byte,
+    the path of image `i` being `path_table[path_offsets[i]:path_offsets[i + 1] - 1]`.
+    """
+
+    def __init__(self, file: PathLike):
+        self.file = Path(file)
+
+        with open(self.file, "rb") as f:
+            magic, header_size = struct.unpack("<8sQ", f.read(16))
+            assert magic == SNAPSHOT_MAGIC, f"'{file}' is not a snapshot"
+            header = json.loads(f.read(header_size))
+        assert header["version"] == SNAPSHOT_VERSION, "unsupported snapshot version"
+
+        self.vocabulary = header["vocabulary"]
+        self._buffer = np.memmap(self.file, dtype=np.uint8, mode="r")
+        for name, (offset, dtype, shape) in header["arrays"].items():
+            size = int(np.prod(shape)) * np.dtype(dtype).itemsize
+            setattr(self, name, self._buffer[offset:offset + size].view(dtype).reshape(shape))
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> Annotation:
+        """Read the annotation of one image."""
+        index = range(len(self))[index]
+        start, stop = self.offsets[index], self.offsets[index + 1]
+
+        labels = [self.vocabulary[i] for i in self.label_ids[start:stop].tolist()]
+        coords = self.coords[start:stop].tolist()
+        confidences = [None if np.isnan(c) else c for c in self.confidences[start:stop].tolist()]
+
+        boxes = [BoundingBox(l, *c, confidence=s) for l, c, s in zip(labels, coords, confidences)]
+        image_size = tuple(self.image_sizes[index].tolist())
+
+        return Annotation(self.image_path(index), image_size, boxes)
+
+    def image_path(self, index: int) -> Path:
+        """The image path of one image."""
+        index = range(len(self))[index]
+        start, stop = self.path_offsets[index], self.path_offsets[index + 1] - 1
+        return Path(_decode(self.path_table[start:stop]))
+
+    def image_paths(self) -> "list[Path]":
+        """Returns the image paths of all the annotations."""
+        if len(self) == 0:
+            return []
+        return [Path(p) for p in _decode(self.path_table[:-1]).split("\0")]
+
+    def labels(self) -> "set[str]":
+        """Returns the unique labels of all the annotations."""
+        return {self.vocabulary[i] for i in np.unique(self.label_ids).tolist()}
+
+    @property
+    def box_counts(self) -> np.ndarray:
+        """The number of boxes of each image."""
+        return np.diff(self.offsets)
+
+    def to_columnar(self) -> ColumnarAnnotations:
+        """Load the whole dataset in memory as columns."""
+        return ColumnarAnnotations(self.image_paths(), np.array(self.image_sizes),
+            np.array(self.offsets), np.array(self.coords), np.array(self.label_ids),
+            self.vocabulary, np.array(self.confidences))
+
+    def to_annotations(self) -> Annotations:
+        """Load the whole dataset in memory as `Annotation` objects."""
+        return self.to_columnar().to_annotations()
+
+
+def save_snapshot(
+    annotations: Union[Annotations, ColumnarAnnotations, Snapshot],
+    file: PathLike,
+):
+    """
+    Write annotations to a binary snapshot file, see `Snapshot`. The
+    conversion is lossless. The file is written through a temporary file
+    so that an existing snapshot is never left partially written.
+
+    Parameters:
+    - annotations: the annotations to save.
+    - file: the snapshot file.
+    """
+    with profiler.stage("snapshot.save") as stage:
+        if isinstance(annotations, Snapshot):
+            annotations = annotations.to_columnar()
+        elif not isinstance(annotations, ColumnarAnnotations):
+            annotations = ColumnarAnnotations.from_annotations(annotations)
+
+        paths = [_encode(str(p)) + b"\0" for p in annotations.paths]
+        path_offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+        np.cumsum([len(p) for p in paths], out=path_offsets[1:])
+
+        columns = {
+            "path_table": np.frombuffer(b"".join(paths), dtype=np.uint8),
+            "path_offsets": path_offsets,
+            "image_sizes": annotations.image_sizes,
+            "offsets": annotations.offsets,
+            "coords": annotations.coords,
+            "label_ids": annotations.label_ids,
+            "confidences": annotations.confidences,
+        }
+        arrays = {name: np.ascontiguousarray(columns[name], dtype=dtype).reshape((-1, width) if width else -1)
+            for name, dtype, width in _ARRAYS}
+
+        # Arrays start after the header, whose size depends on the array
+        # offsets, thus room is left for the largest possible offsets.
+        header = {"version": SNAPSHOT_VERSION, "vocabulary": annotations.vocabulary}
+        start = _align(16 + len(json.dumps({**header, "arrays": {name: (2**63, a.dtype.str, a.shape)
+            for name, a in arrays.items()}}).encode()))
+
+        layout = {}
+        for name, array in arrays.items():
+            layout[name] = (start, array.dtype.str, array.shape)
+            start = _align(start + array.nbytes)
+        header = json.dumps({**header, "arrays": layout}).encode()
+
+        file = Path(file)
+        tmp_file = file.with_name(f".{file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_file, "wb") as f:
+                f.write(struct.pack("<8sQ", SNAPSHOT_MAGIC, len(header)))
+                f.write(header)
+                for name, array in arrays.items():
+                    f.seek(layout[name][0])
+                    f.write(array.tobytes())
+                f.truncate(start)
+            os.replace(tmp_file, file)
+        except BaseException:
+            tmp_file.unlink(missing_ok=True)
+            raise
+
+        stage.count(images=len(annotations), boxes=len(annotations.label_ids), bytes=start)
+
+
+def load_snapshot(file: PathLike) -> Snapshot:
+    """
+    Open a snapshot written by `save_snapshot()`. Nothing is read but its
+    header until annotations are accessed.
+    """
+    return Snapshot(file)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+def _encode(path: str) -> bytes:
+    # Undecodable bytes of file names are kept as is
+    return path.encode("utf-8", "surrogateescape")
+
+
+def _decode(table: np.ndarray) -> str:
+    return table.tobytes().decode("utf-8", "surrogateescape")
@@ -0,0 +1,255 @@
+from .annotation import Annotation, Annotations
+from .columnar import ColumnarAnnotations
+
+from os import PathLike
+from pathlib import Path
+from typing import Union
+import json
+
+import numpy as np
+from rich.table import Table
+from rich import print as rprint
+
+
+# Histogram bin edges of box sides relative to the image sides, the
+# last bin also counts boxes larger than the image.
+SIZE_EDGES = (0, 1/64, 1/32, 1/16, 1/8, 1/4, 1/2, 1)
+AREA_EDGES = tuple(e**2 for e in SIZE_EDGES)
+
+# Histogram bin edges of the number of boxes per image, the last bin
+# is open.
+DENSITY_EDGES = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+class DatasetStats:
+    """
+    Statistics of a dataset computed in a single pass: number of images
+    and boxes per label, histograms of the box width, height and area
+    relative to the image and histogram of the number of boxes per image.
+
+    The statistics take a constant memory per label while an update
+    takes memory proportional to its annotations, thus large datasets
+    can be processed by batches. Statistics of parts of a dataset, e.g.
+    computed by worker processes or for each folder, can be merged:
+
+    ```
+    stats = sum(parallel_map(DatasetStats.from_annotations, parts, workers=0), DatasetStats())
+    ```
+
+    The number of images of each label, and of empty images, counts the
+    unique image paths of each update, thus an image annotated twice is
+    counted once. The total number of images counts the annotations.
+    Merged parts sharing image paths count them once per part.
+    """
+
+    VERSION = 1
+
+    def __init__(self):
+        self.images = 0
+        self.empty_images = 0
+        self.label_images = {}
+        self.label_boxes = {}
+        self.widths = {}
+        self.heights = {}
+        self.areas = {}
+        self.density = np.zeros(len(DENSITY_EDGES), dtype=np.int64)
+
+    @staticmethod
+    def from_annotations(
+        annotations: Union[Annotation, Annotations, ColumnarAnnotations],
+    ) -> "DatasetStats":
+        """The statistics of annotations, see `update()`."""
+        return DatasetStats().update(annotations)
+
+    @property
+    def boxes(self) -> int:
+        """The total number of boxes."""
+        return sum(self.label_boxes.values())
+
+    def labels(self) -> "set[str]":
+        return set(self.label_boxes)
+
+    def update(
+        self,
+        annotations: Union[Annotation, Annotations, ColumnarAnnotations],
+    ) -> "DatasetStats":
+        """
+        Add annotations to the statistics. The computation is vectorized
+        thus updating with many annotations at once is faster.
+        """
+        if isinstance(annotations, Annotation):
+            annotations = [annotations]
+        if not isinstance(annotations, ColumnarAnnotations):
+            annotations = ColumnarAnnotations.from_annotations(annotations)
+
+        # Images annotated several times share the same path id
+        path_indices = {}
+        path_ids = np.array([path_indices.setdefault(p, len(path_indices))
+            for p in annotations.paths], dtype=np.int64)
+
+        box_counts = annotations.box_counts
+        self.images += len(annotations)
+        self.empty_images += len(np.unique(path_ids[box_counts == 0]))
+        self.density += _histogram(box_counts, DENSITY_EDGES, open_ended=True)
+
+        image_ids = annotations.image_ids
+        label_ids = annotations.label_ids
+        nb_labels = len(annotations.vocabulary)
+
+        sizes = annotations.image_sizes[image_ids]
+        xmin, ymin, xmax, ymax = annotations.coords.T
+        widths = np.abs(xmax - xmin) / sizes[:, 0]
+        heights = np.abs(ymax - ymin) / sizes[:, 1]
+
+        pairs = np.unique(path_ids[image_ids] * max(nb_labels, 1) + label_ids)
+        label_images = np.bincount(pairs % max(nb_labels, 1), minlength=nb_labels)
+        label_boxes = np.bincount(label_ids, minlength=nb_labels)
+
+        for label_id, label in enumerate(annotations.vocabulary):
+            if label_boxes[label_id] == 0:
+                continue
+            mask = label_ids == label_id
+            _add(self.label_images, label, int(label_images[label_id]))
+            _add(self.label_boxes, label, int(label_boxes[label_id]))
+            _add(self.widths, label, _histogram(widths[mask], SIZE_EDGES))
+            _add(self.heights, label, _histogram(heights[mask], SIZE_EDGES))
+            _add(self.areas, label, _histogram(widths[mask] * heights[mask], AREA_EDGES))
+
+        return self
+
+    def merge(self, other: "DatasetStats") -> "DatasetStats":
+        """Add the statistics of another part of the dataset."""
+        self.images += other.images
+        self.empty_images += other.empty_images
+        self.density += other.density
+        for mine, theirs in (
+            (self.label_images, other.label_images),
+            (self.label_boxes, other.label_boxes),
+            (self.widths, other.widths),
+            (self.heights, other.heights),
+            (self.areas, other.areas),
+        ):
+            for label, value in theirs.items():
+                _add(mine, label, value)
+        return self
+
+    def __iadd__(self, other: "DatasetStats") -> "DatasetStats":
+        return self.merge(other)
+
+    def __add__(self, other: "DatasetStats") -> "DatasetStats":
+        return DatasetStats().merge(self).merge(other)
+
+    def to_dict(self) -> dict:
+        """A JSON serializable representation, see `from_dict()`."""
+        return {
+            "version": self.VERSION,
+            "images": self.images,
+            "empty_images": self.empty_images,
+            "boxes": self.boxes,
+            "boxes_per_image": self.boxes / self.images if self.images else 0.0,
+            "density": {"edges": DENSITY_EDGES, "counts": self.density.tolist()},
+            "labels": {label: {
+                    "images": self.label_images[label],
+                    "boxes": self.label_boxes[label],
+                    "width": {"edges": SIZE_EDGES, "counts": self.widths[label].tolist()},
+                    "height": {"edges": SIZE_EDGES, "counts": self.heights[label].tolist()},
+                    "area": {"edges": AREA_EDGES, "counts": self.areas[label].tolist()},
+                } for label in sorted(self.label_boxes)},
+        }
+
+    @staticmethod
+    def from_dict(content: dict) -> "DatasetStats":
+        """Read statistics from the output of `to_dict()`."""
+        assert content.get("version") == DatasetStats.VERSION, "unsupported statistics version"
+
+        stats = DatasetStats()
+        stats.images = content["images"]
+        stats.empty_images = content["empty_images"]
+        stats.density = np.array(content["density"]["counts"], dtype=np.int64)
+        for label, values in content["labels"].items():
+            stats.label_images[label] = values["images"]
+            stats.label_boxes[label] = values["boxes"]
+            stats.widths[label] = np.array(values["width"]["counts"], dtype=np.int64)
+            stats.heights[label] = np.array(values["height"]["counts"], dtype=np.int64)
+            stats.areas[label] = np.array(values["area"]["counts"], dtype=np.int64)
+        return stats
+
+    def save(self, file: PathLike):
+        """Write the statistics to a JSON file."""
+        Path(file).write_text(json.dumps(self.to_dict(), indent=2))
+
+    def print_stats(self, histograms: bool = False) -> "DatasetStats":
+        """
+        Prints the number of images and boxes per label and optionally
+        the box size and density histograms.
+        """
+        image_count = dict(self.label_images)
+        if self.empty_images:
+            image_count["<empty>"] = self.empty_images
+        _print_stats_table(image_count, self.label_boxes, self.images)
+
+        if histograms:
+            sizes = _bin_names(SIZE_EDGES, 100)
+            _print_histograms("Box width (% of image width)", self.widths, sizes)
+            _print_histograms("Box height (% of image height)", self.heights, sizes)
+            _print_histograms("Box area (% of image area)", self.areas, _bin_names(AREA_EDGES, 100))
+
+            counts = [f"{l}" if u == l + 1 else f"{l}-{u - 1}" 
+                for l, u in zip(DENSITY_EDGES[:-1], DENSITY_EDGES[1:])]
+            _print_histograms("Boxes per image", {"Images": self.density}, 
+                counts + [f"{DENSITY_EDGES[-1]}+"])
+
+        return self
+
+
+def _add(counters: dict, key: str, value):
+    counters[key] = counters[key] + value if key in counters else value
+
+
+def _histogram(values: np.ndarray, edges: tuple, open_ended: bool = False) -> np.ndarray:
+    """
+    Count values in the bins [edges[i], edges[i + 1]). Values above the
+    last edge are counted in the last bin, which is [edges[-1], inf) if
+    `open_ended` is True.
+    """
+    nb_bins = len(edges) if open_ended else len(edges) - 1
+    bins = np.clip(np.searchsorted(edges, values, side="right") - 1, 0, nb_bins - 1)
+    return np.bincount(bins, minlength=nb_bins).astype(np.int64)
+
+
+def _bin_names(edges: tuple, scale: float) -> "list[str]":
+    return [f"{l * scale:.3g}-{u * scale:.3g}" for l, u in zip(edges[:-1], edges[1:])]
+
+
+def _print_stats_table(
+    image_count: "dict[str, int]", 
+    box_count: "dict[str, int]", 
+    tot_imgs: int
+):
+    """Prints the number of images and boxes per label."""
+    table = Table(show_footer=True)
+
+    tot_boxes = sum(box_count.values())
+
+    table.add_column("Label", "Total")
+    table.add_column("Images", f"{tot_imgs}", justify="right")
+    table.add_column("Boxes", f"{tot_boxes}", justify="right")
+
+    for label in sorted(image_count.keys()):
+        nb_boxes = box_count.get(label, 0)
+        nb_images = image_count[label]
+        table.add_row(label, f"{nb_images}", f"{nb_boxes}")
+
+    rprint(table)
+
+
+def _print_histograms(title: str, histograms: "dict[str, np.ndarray]", bin_names: "list[str]"):
+    table = Table(title=title)
+    table.add_column("")
+    for name in bin_names:
+        table.add_column(name, justify="right")
+
+    for label in sorted(histograms):
+        table.add_row(label, *(f"{n}" for n in histograms[label].tolist()))
+
+    rprint(table)
@@ -1,12 +1,126 @@
-from collections import defaultdict
-from typing import Hashable, TypeVar, Sequence, Callable, Iterator
+from collections import defaultdict, deque
+from itertools import islice
+from typing import Hashable, Iterable, TypeVar, Sequence, Callable, Iterator, Union
+from os import PathLike
 from pathlib import Path
+import logging
+import os
+import shutil
+import struct
 
-from PIL import Image
+# Heavy dependencies (PIL, tqdm, process pools) are imported by the 
+# functions using them to keep the package import fast.
 
 
-def get_image_size(image: str) -> "tuple[int, int]":
-    return Image.open(image).size
+def _package_logger() -> logging.Logger:
+    """
+    The package logger, writing to `parser.log` in the working directory.
+    The file is only created when a first message is logged.
+    """
+    logger = logging.getLogger("darknet_utils")
+    if not logger.handlers:
+        handler = logging.FileHandler("parser.log", delay=True)
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+        logger.addHandler(handler)
+    return logger
+
+
+logger = _package_logger()
+
+
+def get_image_size(image: PathLike) -> "tuple[int, int]":
+    """
+    The (width, height) of an image in pixels. Only the header is read 
+    for JPEG, PNG and BMP images, other formats are opened with PIL.
+    """
+    size = probe_image_size(image)
+    if size is not None:
+        return size
+    from PIL import Image
+    with Image.open(image) as img:
+        return img.size
+
+
+def get_image_sizes(images: "Sequence[PathLike]", workers: int = 1) -> "list[tuple[int, int]]":
+    """
+    The (width, height) of a list of images, read in parallel. See 
+    `get_image_size()`.
+
+    Parameters:
+    - images: the image paths.
+    - workers: the number of worker processes, 0 for one per CPU core.
+
+    Returns:
+    - The image sizes in the same order as `images`.
+    """
+    return parallel_map(get_image_size, [str(i) for i in images], workers, unit="imgs")
+
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# JPEG start of frame markers, DHT (C4), JPG (C8) and DAC (CC) excluded
+_JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# JPEG markers without length field
+_JPEG_STANDALONE_MARKERS = {0x01, *range(0xD0, 0xD8)}
+
+
+def probe_image_size(image: PathLike) -> "tuple[int, int]":
+    """
+    The (width, height) of a JPEG, PNG or BMP image read from its 
+    header only. Returns None if the format is not one of those or 
+    the header is not valid.
+    """
+    with open(image, "rb") as f:
+        head = f.read(26)
+
+        if head.startswith(_PNG_SIGNATURE) and head[12:16] == b"IHDR" and len(head) >= 24:
+            return struct.unpack(">II", head[16:24])
+
+        if head.startswith(b"BM") and len(head) == 26:
+            header_size, = struct.unpack("<I", head[14:18])
+            if header_size == 12:  # OS/2 BITMAPCOREHEADER
+                return struct.unpack("<HH", head[18:22])
+            width, height = struct.unpack("<ii", head[18:26])
+            return width, abs(height)  # Negative height for top-down images
+
+        if head.startswith(b"\xff\xd8"):
+            f.seek(2)
+            return _probe_jpeg_size(f)
+
+    return None
+
+
+def _probe_jpeg_size(f) -> "tuple[int, int]":
+    while True:
+        byte = f.read(1)
+        if byte != b"\xff":
+            return None
+        while byte == b"\xff":  # Skip fill bytes
+            byte = f.read(1)
+        if not byte:
+            return None
+
+        marker = byte[0]
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker in (0xD9, 0xDA):  # End of image or start of scan
+            return None
+
+        segment = f.read(2)
+        if len(segment) != 2:
+            return None
+        length, = struct.unpack(">H", segment)
+
+        if marker in _JPEG_SOF_MARKERS:
+            frame = f.read(5)
+            if len(frame) != 5:
+                return None
+            height, width = struct.unpack(">HH", frame[1:5])
+            # A zero height is defined later in the stream
+            return (width, height) if height != 0 else None
+
+        f.seek(length - 2, os.SEEK_CUR)
 
 
 T = TypeVar("T")
@@ -28,4 +142,146 @@ def glob(folder: Path, extension: str, recursive: bool = False) -> Iterator[Path
     files = folder.glob("**/*") if recursive else folder.glob("*")
 
     return (f for f in files if f.suffix.lower() == extension and not f.name.startswith("."))
-    
\ No newline at end of file
+
+
+def atomic_write(file: PathLike, content: "Union[str, bytes]"):
+    """
+    Write a file through a temporary file renamed to the destination so 
+    that the file is never left partially written, even if interrupted.
+    Permissions of an existing file are preserved.
+    """
+    file = Path(file)
+    tmp_file = file.with_name(f".{file.name}.{os.getpid()}.tmp")
+
+    if isinstance(content, bytes):
+        tmp_file.write_bytes(content)
+    else:
+        tmp_file.write_text(content)
+
+    try:
+        if file.exists():
+            shutil.copymode(file, tmp_file)
+        os.replace(tmp_file, file)
+    except BaseException:
+        tmp_file.unlink(missing_ok=True)
+        raise
+
+
+def resolve_workers(workers: int) -> int:
+    """
+    Number of worker processes to use. `workers <= 0` means one
+    worker per CPU core.
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    """Split a sequence in consecutive chunks of at most `size` items."""
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def parallel_map(
+    func: Callable[[T], S],
+    items: Sequence[T],
+    workers: int = 1,
+    chunksize: int = None,
+    unit: str = "it",
+    progress: bool = None,
+) -> "list[S]":
+    """
+    Order-preserving equivalent of `list(map(func, items))` that spreads
+    the items across a process pool.
+
+    Items are sent to the workers in chunks to amortize the inter-process
+    communication cost, thus `func` and its results should be picklable
+    and cheap to transfer. The computation is done sequentially in the
+    current process if `workers` is 1.
+
+    Parameters:
+    - func: the function to apply, must be defined at module level.
+    - items: the items to process.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - chunksize: the number of items per chunk. By default chunks are
+    sized so that each worker receives several of them.
+    - unit: the progress bar unit.
+    - progress: whether to show a progress bar. By default it is only
+    shown when the items are processed in parallel.
+
+    Returns:
+    - The results in the same order as `items`.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from tqdm import tqdm
+
+    items = list(items)
+    workers = min(resolve_workers(workers), max(len(items), 1))
+    progress = workers != 1 if progress is None else progress
+
+    if workers == 1:
+        return [func(item) for item in tqdm(items, unit=unit, disable=not progress)]
+
+    chunksize = chunksize or max(1, min(256, len(items) // (4 * workers)))
+    results = []
+
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+        tqdm(total=len(items), unit=unit, disable=not progress) as progress:
+        futures = []
+        for chunk in chunked(items, chunksize):
+            future = executor.submit(_map_chunk, func, chunk)
+            future.add_done_callback(lambda _, n=len(chunk): progress.update(n))
+            futures.append(future)
+
+        for future in futures:
+            results.extend(future.result())
+
+    return results
+
+
+def parallel_imap(
+    func: Callable[[T], S],
+    items: Iterable[T],
+    workers: int = 1,
+    chunksize: int = 256,
+    max_pending: int = None,
+) -> Iterator[S]:
+    """
+    Lazy variant of `parallel_map()` running in bounded memory: items are
+    consumed from the iterable as the results are consumed, with at most
+    `max_pending` chunks submitted to the process pool at once.
+
+    Parameters:
+    - func: the function to apply, must be defined at module level.
+    - items: the items to process, can be a generator.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - chunksize: the number of items per chunk.
+    - max_pending: the maximum number of chunks in progress. Defaults 
+    to twice the number of workers.
+
+    Returns:
+    - An iterator of the results in the same order as `items`.
+    """
+    workers = resolve_workers(workers)
+    if workers == 1:
+        yield from map(func, items)
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    max_pending = max_pending or 2 * workers
+    items = iter(items)
+    pending = deque()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while chunk := list(islice(items, chunksize)):
+            pending.append(executor.submit(_map_chunk, func, chunk))
+            if len(pending) >= max_pending:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def _map_chunk(func: Callable[[T], S], chunk: Sequence[T]) -> "list[S]":
+    return [func(item) for item in chunk]
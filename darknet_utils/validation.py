@@ -0,0 +1,205 @@
+from .annotation import Annotation, Annotations
+from .cache import FileCache, cached_map
+from .columnar import ColumnarAnnotations
+from .profiling import profiler
+from .utils import get_image_size
+
+from os import PathLike
+from pathlib import Path
+from typing import NamedTuple, Sequence, Union
+import os
+import struct
+
+import numpy as np
+
+
+VALIDATION_CHECKS = (
+    "missing_image",
+    "unreadable_image",
+    "size_mismatch",
+    "out_of_bounds",
+    "degenerate_box",
+    "unknown_label",
+)
+
+# Checks whose images cannot be exported
+FATAL_CHECKS = ("missing_image", "unreadable_image")
+
+IMAGE_CACHE_FILE = Path("~/.cache/darknet_utils/image_checks")
+
+
+class ValidationIssue(NamedTuple):
+    """A problem found in the annotation of an image, see `VALIDATION_CHECKS`."""
+    image_path: Path
+    check: str
+    message: str
+
+    def __str__(self) -> str:
+        return f"{self.check}: '{self.image_path}': {self.message}"
+
+
+class ValidationReport(NamedTuple):
+    """
+    Outcome of `validate()`: the issues found, in the order of the
+    annotations, and the number of checked images and boxes.
+    """
+    issues: "list[ValidationIssue]"
+    images: int
+    boxes: int
+
+    def __str__(self) -> str:
+        counts = self.counts()
+        found = ", ".join(f"{counts[c]} {c}" for c in VALIDATION_CHECKS if counts[c])
+        return f"{self.images} images and {self.boxes} boxes checked: {found or 'no issue'}"
+
+    def counts(self) -> "dict[str, int]":
+        """The number of issues of each check."""
+        counts = dict.fromkeys(VALIDATION_CHECKS, 0)
+        for issue in self.issues:
+            counts[issue.check] += 1
+        return counts
+
+    def invalid_images(self) -> "set[Path]":
+        """The images which are missing or not readable."""
+        return {i.image_path for i in self.issues if i.check in FATAL_CHECKS}
+
+    def print_report(self) -> "ValidationReport":
+        """Prints the number of issues and affected images of each check."""
+        from rich.table import Table
+        from rich import print as rprint
+
+        table = Table()
+        table.add_column("Check")
+        table.add_column("Images", justify="right")
+        table.add_column("Issues", justify="right")
+
+        counts = self.counts()
+        for check in VALIDATION_CHECKS:
+            images = len({i.image_path for i in self.issues if i.check == check})
+            table.add_row(check, f"{images}", f"{counts[check]}")
+
+        rprint(table)
+        return self
+
+
+def validate(
+    annotations: Union[Annotation, Annotations, ColumnarAnnotations],
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    cache: FileCache = None,
+) -> ValidationReport:
+    """
+    Check annotations before using them:
+    - missing_image: the image file does not exist.
+    - unreadable_image: the image size cannot be read from the file.
+    - size_mismatch: the annotated image size differs from the actual one.
+    - out_of_bounds: a box is not inside the annotated image size.
+    - degenerate_box: a box has a zero width or height.
+    - unknown_label: a box label is not in `labels`.
+
+    Image sizes are read from the image headers in parallel and can be
+    cached, then box checks are vectorized over all the boxes.
+
+    Parameters:
+    - annotations: the annotations to check.
+    - labels: the expected labels. By default labels are not checked.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - cache: an optional cache of image sizes, see `image_cache()`.
+
+    Returns:
+    - The issues found.
+    """
+    with profiler.stage("validate") as stage:
+        hits = 0 if cache is None else cache.hits
+        if isinstance(annotations, Annotation):
+            annotations = [annotations]
+        if not isinstance(annotations, ColumnarAnnotations):
+            annotations = ColumnarAnnotations.from_annotations(annotations)
+
+        paths = [str(p) for p in annotations.paths]
+        unique_paths = list(dict.fromkeys(paths))
+        existing = [p for p in unique_paths if os.path.isfile(p)]
+        sizes = dict(zip(existing, cached_map(_image_size, existing, "size", workers, cache, unit="imgs")))
+
+        issues = {}
+        for i, (path, declared) in enumerate(zip(paths, map(tuple, annotations.image_sizes.tolist()))):
+            if path not in sizes:
+                issue = ("missing_image", "the image does not exist")
+            elif sizes[path] is None:
+                issue = ("unreadable_image", "the image size cannot be read")
+            elif sizes[path] != declared:
+                issue = ("size_mismatch", f"annotated size {declared[0]}x{declared[1]} "
+                    f"but the image is {sizes[path][0]}x{sizes[path][1]}")
+            else:
+                continue
+            issues.setdefault(i, []).append(issue)
+
+        for box, issue in _box_issues(annotations, labels):
+            issues.setdefault(int(annotations.image_ids[box]), []).append(issue)
+
+        issues = [ValidationIssue(annotations.paths[i], check, message)
+            for i in sorted(issues) for check, message in issues[i]]
+        report = ValidationReport(issues, len(annotations), len(annotations.label_ids))
+        stage.count(images=report.images, issues=len(issues),
+            cache_hits=0 if cache is None else cache.hits - hits)
+
+    return report
+
+
+def image_cache(cache_file: PathLike = IMAGE_CACHE_FILE, max_entries: int = None) -> FileCache:
+    """
+    The cache of image checks used by `validate()` and `check_integrity()`,
+    shared by all datasets and stored in the user cache folder by default. Entries stay valid as
+    long as the image modification time and size do not change.
+
+    Parameters:
+    - cache_file: the cache file.
+    - max_entries: the maximum number of images in the cache.
+
+    Returns:
+    - The cache object.
+    """
+    return FileCache(cache_file, max_entries)
+
+
+def _image_size(image: str) -> "tuple[int, int]":
+    try:
+        return tuple(get_image_size(image))
+    except (OSError, ValueError, struct.error):
+        return None
+
+
+def _box_issues(
+    annotations: ColumnarAnnotations,
+    labels: Sequence[str] = None,
+) -> "list[tuple[int, tuple[str, str]]]":
+    """The index of each box with an issue and the issue, in box order."""
+    xmin, ymin, xmax, ymax = annotations.coords.T
+    xmin, xmax = np.minimum(xmin, xmax), np.maximum(xmin, xmax)
+    ymin, ymax = np.minimum(ymin, ymax), np.maximum(ymin, ymax)
+    sizes = annotations.image_sizes[annotations.image_ids]
+
+    masks = {
+        "out_of_bounds": (xmin < 0) | (ymin < 0) | (xmax > sizes[:, 0]) | (ymax > sizes[:, 1]),
+        "degenerate_box": (xmax == xmin) | (ymax == ymin),
+    }
+    if labels is not None:
+        masks["unknown_label"] = ~annotations.label_mask(set(labels))
+
+    messages = {
+        "out_of_bounds": "is outside of the {w}x{h} image",
+        "degenerate_box": "has a zero width or height",
+        "unknown_label": "has an unexpected label",
+    }
+
+    starts = annotations.offsets[annotations.image_ids]
+    issues = []
+    for check, mask in masks.items():
+        for box in np.flatnonzero(mask).tolist():
+            label = annotations.vocabulary[annotations.label_ids[box]]
+            coords = ", ".join(f"{c:g}" for c in annotations.coords[box].tolist())
+            w, h = sizes[box].tolist()
+            message = f"box {box - starts[box]} '{label}' ({coords}) " + messages[check].format(w=w, h=h)
+            issues.append((box, (check, message)))
+
+    return sorted(issues, key=lambda issue: issue[0])
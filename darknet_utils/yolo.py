@@ -0,0 +1,336 @@
+from .annotation import Annotations
+from .columnar import ColumnarAnnotations
+from .profiling import profiler
+from .utils import chunked, get_image_size, logger, parallel_map
+
+from itertools import chain
+from os import PathLike
+from pathlib import Path
+from typing import Sequence, Union
+import os
+import struct
+
+import numpy as np
+
+
+def yolo_reprs(
+    annotations: Union[Annotations, ColumnarAnnotations],
+    labels: Sequence[str] = None,
+    precision: int = None,
+    include_confidence: bool = True,
+) -> "list[str]":
+    """
+    The YOLO representation of a batch of annotations, computed for all 
+    the boxes at once. See `Annotation.yolo_repr()` for the format.
+
+    Parameters:
+    - annotations: the annotations to serialize.
+    - labels: if specified, box labels are written as their index in 
+    this list, as expected by Darknet. By default label names are written.
+    - precision: the number of decimals of floats. By default floats are
+    written with the shortest representation, as `Annotation.yolo_repr()`.
+    - include_confidence: if True, bounding box confidence scores
+    are included if present.
+
+    Returns:
+    - The string representation of each annotation.
+    """
+    if not isinstance(annotations, ColumnarAnnotations):
+        annotations = ColumnarAnnotations.from_annotations(annotations)
+
+    if labels is None:
+        names = annotations.vocabulary
+    else:
+        indices = {l: str(n) for n, l in enumerate(labels)}
+        used = set(np.unique(annotations.label_ids).tolist())
+        names = [indices[l] if i in used else None 
+            for i, l in enumerate(annotations.vocabulary)]
+
+    float_format = "%r" if precision is None else f"%.{precision}f"
+    box_format = " ".join(["%s"] + [float_format] * 4)
+    conf_box_format = " ".join(["%s"] + [float_format] * 5)
+
+    nb_boxes = len(annotations.label_ids)
+    has_confidence = ~np.isnan(annotations.confidences) if include_confidence \
+        else np.zeros(nb_boxes, dtype=bool)
+
+    # All the lines are formatted with a single format string, the 
+    # confidence column is skipped for boxes that do not have one.
+    columns = np.empty((nb_boxes, 6), dtype=object)
+    columns[:, 0] = np.array(names, dtype=object)[annotations.label_ids] if nb_boxes else []
+    columns[:, 1] = annotations.confidences
+    columns[:, 2:] = annotations.yolo_coords()
+    is_written = np.ones((nb_boxes, 6), dtype=bool)
+    is_written[:, 1] = has_confidence
+
+    line_formats = np.where(has_confidence, conf_box_format, box_format)
+    text = "\n".join(line_formats.tolist()) % tuple(columns[is_written].tolist())
+    lines = text.split("\n") if nb_boxes else []
+
+    offsets = annotations.offsets.tolist()
+    return ["\n".join(lines[start:stop]) for start, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def parse_yolo_files(
+    images: "Sequence[PathLike]",
+    names: Sequence[str] = None,
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    chunksize: int = 256,
+    columnar: bool = False,
+) -> Union[Annotations, ColumnarAnnotations]:
+    """
+    Parse the YOLO label files of images, i.e. the files with the same
+    name and the .txt extension, see `Annotation.yolo_repr()` for the 
+    format. Lines may include a confidence score.
+
+    Files are parsed in chunks, each chunk is converted with a few NumPy
+    operations and chunks are spread across worker processes. Image 
+    sizes are read from the image headers.
+
+    Images without label file are empty annotations, as for Darknet. 
+    Images or label files that are not readable are skipped and logged
+    in `parser.log`. As `parse_xml_file()`, annotations which are empty 
+    because none of their boxes has a label in `labels` are removed.
+
+    Parameters:
+    - images: the image paths.
+    - names: the label names, e.g. the lines of `obj.names`. Labels 
+    written as an integer are read as their name in this list. By 
+    default labels are kept as written.
+    - labels: a set of box labels to parse.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - chunksize: the number of files per chunk.
+    - columnar: if True, returns `ColumnarAnnotations`.
+
+    Returns:
+    - The annotations in the order of `images`.
+    """
+    images = [os.path.abspath(os.path.expanduser(i)) for i in images]
+    items = [(image, _label_file(image), None) for image in images]
+    annotations = _parse_yolo(items, names, labels, workers, chunksize)
+
+    return annotations if columnar else annotations.to_annotations()
+
+
+def parse_yolo_detections(
+    results_dir: PathLike,
+    annotations: Union[Annotations, ColumnarAnnotations],
+    names: Sequence[str] = None,
+    workers: int = 1,
+    columnar: bool = False,
+) -> Union[Annotations, ColumnarAnnotations]:
+    """
+    Parse the detections of a model on annotated images, stored in YOLO 
+    result files with a confidence column, e.g. to evaluate them with 
+    `evaluate_detections()`. The result file of an image is the .txt file
+    of the same name in `results_dir`, images without result file have 
+    no detection. Image sizes are taken from the annotations.
+
+    Parameters:
+    - results_dir: the folder of the result files.
+    - annotations: the annotations of the images.
+    - names: the label names, e.g. the lines of `obj.names`, see 
+    `parse_yolo_files()`.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - columnar: if True, returns `ColumnarAnnotations`.
+
+    Returns:
+    - The detections in the order of `annotations`.
+    """
+    results_dir = os.path.abspath(os.path.expanduser(results_dir))
+    sizes = annotations.image_sizes.tolist() if isinstance(annotations, ColumnarAnnotations) \
+        else [a.image_size for a in annotations]
+    items = [(str(p), os.path.join(results_dir, f"{p.stem}.txt"), tuple(s)) 
+        for p, s in zip(annotations.image_paths(), sizes)]
+    detections = _parse_yolo(items, names, workers=workers)
+
+    return detections if columnar else detections.to_annotations()
+
+
+def _parse_yolo(
+    items: "Sequence[tuple[str, str, tuple[int, int]]]",
+    names: Sequence[str] = None,
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    chunksize: int = 256,
+) -> ColumnarAnnotations:
+    """
+    Parse label files given as (image path, label file, image size) items,
+    the image size being read from the image if None.
+    """
+    with profiler.stage("parse.read") as stage:
+        chunks = parallel_map(_parse_yolo_chunk, list(chunked(items, chunksize)),
+            workers=workers, chunksize=1, unit="chunks")
+        stage.count(files=len(items))
+
+    with profiler.stage("parse.build") as stage:
+        sizes = [s for c in chunks for s in c[0]]
+        counts = np.array([n for c in chunks for n in c[1]], dtype=np.int64)
+        tokens = np.concatenate([c[2] for c in chunks] or [np.empty(0, dtype=str)])
+        relative = np.concatenate([c[3] for c in chunks] or [np.empty((0, 4))])
+        confidences = np.concatenate([c[4] for c in chunks] or [np.empty(0)])
+
+        # Unreadable files have no boxes
+        readable = [s is not None for s in sizes]
+        for (_, label_file, _), is_readable in zip(items, readable):
+            if not is_readable:
+                logger.warning(f"Error while reading '{label_file}'.")
+
+        image_sizes = np.array([s for s in sizes if s is not None], dtype=np.int64).reshape(-1, 2)
+        counts = counts[readable]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        vocabulary, label_ids = _label_ids(tokens, names)
+
+        # Relative (xmid, ymid, width, height) to absolute (xmin, ymin, xmax, ymax)
+        box_sizes = np.repeat(image_sizes, counts, axis=0)
+        mids = relative[:, :2] * box_sizes
+        halves = relative[:, 2:] * box_sizes / 2
+        coords = np.concatenate((mids - halves, mids + halves), axis=1)
+
+        annotations = ColumnarAnnotations([i[0] for i, r in zip(items, readable) if r],
+            image_sizes, offsets, coords, label_ids, vocabulary, confidences)
+
+        if labels is not None:
+            had_boxes = annotations.box_counts != 0
+            annotations.filter_labels(labels)
+            annotations = annotations.select(~had_boxes | (annotations.box_counts != 0))
+
+        stage.count(images=len(annotations), failures=readable.count(False))
+
+    return annotations
+
+
+def parse_yolo_trainval(
+    save_dir: PathLike,
+    subsets: Sequence[str] = ("train", "val"),
+    labels: Sequence[str] = None,
+    workers: int = 1,
+    columnar: bool = False,
+) -> Union[Annotations, ColumnarAnnotations]:
+    """
+    Read back a database created with `create_yolo_trainval()`, e.g. to
+    split it again, compute its statistics or merge it with new data.
+
+    Images are listed in the `<subset>.txt` files and label names are 
+    read from `obj.names` if present. The image paths of the lists are 
+    relative to the Darknet working directory, thus images which are not
+    found there are looked up in `save_dir/<subset>/`.
+
+    Parameters:
+    - save_dir: the database folder.
+    - subsets: the image lists to read.
+    - labels: a set of box labels to parse.
+    - workers: the number of worker processes, 0 for one per CPU core.
+    - columnar: if True, returns `ColumnarAnnotations`.
+
+    Returns:
+    - The annotations of the images of each subset, in order.
+    """
+    save_dir = Path(save_dir).expanduser().resolve()
+
+    names_file = save_dir / "obj.names"
+    names = names_file.read_text().splitlines() if names_file.exists() else None
+
+    with profiler.stage("parse.glob") as stage:
+        images = []
+        for subset in subsets:
+            for line in (save_dir / f"{subset}.txt").read_text().splitlines():
+                if not line.strip():
+                    continue
+                image = os.path.join(save_dir, line.strip())
+                if not os.path.exists(image):
+                    image = os.path.join(save_dir, subset, os.path.basename(image))
+                images.append(image)
+        stage.count(files=len(images))
+
+    return parse_yolo_files(images, names, labels, workers, columnar=columnar)
+
+
+def _parse_yolo_chunk(items: "Sequence[tuple[str, str, tuple[int, int]]]"):
+    """
+    Parse the label files of a chunk of images to columns: the image sizes,
+    None if an image or its label file is not readable, the number of boxes
+    per image, the label of each box as written, the relative coordinates
+    and the confidences, NaN if absent.
+    """
+    sizes, lines = [], []
+    for image, label_file, size in items:
+        try:
+            size = size or get_image_size(image)
+            file_lines = _read_yolo_lines(label_file)
+        except (OSError, ValueError, struct.error):
+            size, file_lines = None, []
+        sizes.append(size)
+        lines.append(file_lines)
+
+    # Parse all the lines at once, or file by file to find invalid ones
+    try:
+        columns = _yolo_columns(list(chain.from_iterable(lines)))
+    except ValueError:
+        for i, file_lines in enumerate(lines):
+            try:
+                _yolo_columns(file_lines)
+            except ValueError:
+                sizes[i], lines[i] = None, []
+        columns = _yolo_columns(list(chain.from_iterable(lines)))
+
+    return (sizes, [len(l) for l in lines], *columns)
+
+
+def _label_file(image: str) -> str:
+    return os.path.splitext(image)[0] + ".txt"
+
+
+def _read_yolo_lines(label_file: str) -> "list[list[str]]":
+    """The fields of the non-empty lines of a label file, none if it does not exist."""
+    try:
+        with open(label_file) as f:
+            text = f.read()
+    except FileNotFoundError:
+        return []
+
+    lines = [fields for fields in map(str.split, text.splitlines()) if fields]
+    if any(len(fields) not in (5, 6) for fields in lines):
+        raise ValueError(f"lines of '{label_file}' should have 5 or 6 fields")
+    return lines
+
+
+def _yolo_columns(lines: "list[list[str]]") -> "tuple[np.ndarray, np.ndarray, np.ndarray]":
+    """
+    The labels, (N, 4) relative coordinates and confidences of label file
+    lines of 5 fields, or 6 if they include a confidence.
+    """
+    counts = np.fromiter(map(len, lines), dtype=np.int64, count=len(lines))
+    starts = np.cumsum(counts) - counts
+    has_confidence = counts == 6
+
+    tokens = np.array(list(chain.from_iterable(lines)), dtype=str)
+    labels = tokens[starts]
+    coord_indices = (starts + 1 + has_confidence)[:, None] + np.arange(4)
+    coords = tokens[coord_indices].astype(np.float64).reshape(-1, 4)
+
+    confidences = np.full(len(lines), np.nan)
+    confidences[has_confidence] = tokens[starts[has_confidence] + 1].astype(np.float64)
+
+    return labels, coords, confidences
+
+
+def _label_ids(tokens: np.ndarray, names: Sequence[str] = None) -> "tuple[list[str], np.ndarray]":
+    """The vocabulary and label ids of labels written as names or as indices in `names`."""
+    unique, inverse = np.unique(tokens, return_inverse=True)
+
+    mapped = unique.tolist()
+    if names is not None:
+        for i, token in enumerate(mapped):
+            if token.isdigit():
+                assert int(token) < len(names), f"label {token} is not in the label names"
+                mapped[i] = names[int(token)]
+
+    vocabulary = list(dict.fromkeys(mapped))
+    indices = {l: i for i, l in enumerate(vocabulary)}
+    remap = np.array([indices[l] for l in mapped], dtype=np.int64)
+
+    return vocabulary, remap[inverse] if len(remap) else np.zeros(0, dtype=np.int64)
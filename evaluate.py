@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+# Only light modules are imported before parsing the arguments
+from darknet_utils import PROFILE_ENV
+
+from pathlib import Path
+from argparse import ArgumentParser
+
+
+def parse_args():
+    parser = ArgumentParser(description="Compute the AP and mAP of detections on a database created by create_yolo.py.")
+
+    parser.add_argument("save_dir", type=Path,
+        help="The database folder.")
+    parser.add_argument("results_dir", type=Path,
+        help="The folder of the detections, one YOLO file with a confidence column per image, \
+            named as the image with the .txt extension.")
+    parser.add_argument("--subsets", "-s", nargs="+", default=["val"],
+        help="The image lists of the database to evaluate.")
+    parser.add_argument("--iou", "-i", type=float, nargs="+", default=[0.5],
+        help="The IoU thresholds of true positives.")
+    parser.add_argument("--coco", action="store_true",
+        help="Use the IoU thresholds 0.5, 0.55, ..., 0.95 of the COCO mAP.")
+    parser.add_argument("--json", "-j", type=Path, default=None,
+        help="Save the AP of each label to a JSON file.")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+        help="The number of processes used to parse files and evaluate labels, 0 for one per CPU core.")
+    parser.add_argument("--profile", type=Path, default=None,
+        help=f"Save the time, counters and peak memory of each stage to a .json or .csv file. \
+            Profiling can also be enabled with the {PROFILE_ENV}=1 environment variable.")
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    from darknet_utils import (COCO_IOU_THRESHOLDS, evaluate_detections, parse_yolo_detections,
+        parse_yolo_trainval, profiler)
+
+    if args.profile:
+        profiler.enable()
+
+    names_file = args.save_dir / "obj.names"
+    names = names_file.read_text().splitlines() if names_file.exists() else None
+
+    ground_truth = parse_yolo_trainval(args.save_dir, args.subsets, workers=args.workers, columnar=True)
+    detections = parse_yolo_detections(args.results_dir, ground_truth, names,
+        workers=args.workers, columnar=True)
+
+    thresholds = COCO_IOU_THRESHOLDS if args.coco else args.iou
+    evaluation = evaluate_detections(ground_truth, detections, thresholds, workers=args.workers)
+    evaluation.print_results()
+
+    if args.json:
+        evaluation.save(args.json)
+
+    if profiler.enabled:
+        profiler.print_report()
+    if args.profile:
+        profiler.save(args.profile)
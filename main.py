@@ -1,4 +1,5 @@
-from darknet_utils import *
+from darknet_utils import (create_noobj_annotations, create_yolo_trainval, parse_xml_folders,
+    profiler, resolve_xml_file_paths)
 from pathlib import Path
 
 
@@ -88,16 +89,19 @@ if __name__ == "__main__":
     labels = fr_to_en.keys()
     stem_labels = {l for l in labels if "tige" in l}
 
-    resolve_xml_file_paths(folders)
-    create_noobj_folder(no_obj_dir)
+    resolve_xml_file_paths(folders, workers=0)
 
-    annotations = parse_xml_folders(folders, labels=labels) \
+    annotations = parse_xml_folders(folders, labels=labels, workers=0) \
         .square_boxes(ratio=7.5/100, labels=stem_labels) \
         .map_labels(fr_to_en)
 
-    annotations += parse_xml_folder(no_obj_dir)
+    annotations += create_noobj_annotations(no_obj_dir, workers=0)
     annotations.print_stats()
 
-    create_yolo_trainval(annotations, 
+    stats = create_yolo_trainval(annotations, 
         labels=fr_to_en.values(),
-        exist_ok=True)
\ No newline at end of file
+        exist_ok=True)
+    print(f"Images: {stats}")
+
+    if profiler.enabled:
+        profiler.print_report()
@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 
-from darknet_utils import *
+# Only light modules are imported before parsing the arguments
+from darknet_utils import PROFILE_ENV
 
 from pathlib import Path
 from argparse import ArgumentParser
@@ -13,10 +14,35 @@ def parse_args():
         help="The folders to parse.")
     parser.add_argument("--recursive", "-r", action="store_true",
         help="Weither to parse directories recursively or not.")
+    parser.add_argument("--yolo", "-y", action="store_true",
+        help="The folders are databases created by create_yolo.py instead of XML annotations.")
     parser.add_argument("--labels", "-l", nargs="+", type=str, default=None,
         help="The labels to parse.")
     parser.add_argument("--show_empty", "-e", action="store_true",
         help="Include empty annotations.")
+    parser.add_argument("--histograms", "-H", action="store_true",
+        help="Print the histograms of the box sizes relative to the image and of the number of boxes per image.")
+    parser.add_argument("--overlaps", type=float, default=None, metavar="IOU",
+        help="Count the pairs of boxes of the same label overlapping with an IoU greater than \
+            this threshold, e.g. objects annotated twice. Pairs are logged in parser.log.")
+    parser.add_argument("--validate", "-v", action="store_true",
+        help="Check that images exist and have the annotated size, that boxes are inside the images \
+            and not empty and that their labels are in --labels. Issues are logged in parser.log \
+            and image sizes are cached in ~/.cache/darknet_utils/.")
+    parser.add_argument("--json", "-j", type=Path, default=None,
+        help="Save the statistics and histograms to a JSON file.")
+    parser.add_argument("--workers", "-w", type=int, default=1,
+        help="The number of processes used to parse the annotations, 0 for one per CPU core.")
+    parser.add_argument("--cache", "-c", action="store_true",
+        help="Cache parsed annotations of each folder in ~/.cache/darknet_utils/ and only parse files \
+            that changed since the last run.")
+    parser.add_argument("--cache_size", type=int, default=None,
+        help="The maximum number of files stored in each folder cache.")
+    parser.add_argument("--clear_cache", action="store_true",
+        help="Remove the folder caches before parsing.")
+    parser.add_argument("--profile", type=Path, default=None,
+        help=f"Save the time, counters and peak memory of each stage to a .json or .csv file. \
+            Profiling can also be enabled with the {PROFILE_ENV}=1 environment variable.")
 
     return parser.parse_args()
 
@@ -24,12 +50,55 @@ def parse_args():
 if __name__ == "__main__":
     args = parse_args()
 
-    annotations = parse_xml_folders(
-        args.folders, 
-        recursive=args.recursive, 
-        labels=args.labels)
+    from darknet_utils import (DatasetStats, find_overlaps, image_cache, parse_cache, parse_xml_folders, 
+        parse_yolo_trainval, profiler, validate)
+    from darknet_utils.utils import logger
+
+    if args.profile:
+        profiler.enable()
+
+    if args.clear_cache:
+        for folder in args.folders:
+            parse_cache(folder).clear()
+
+    if args.yolo:
+        parts = [parse_yolo_trainval(f, labels=args.labels, workers=args.workers, columnar=True) 
+            for f in args.folders]
+        annotations = sum(parts[1:], parts[0])
+    else:
+        annotations = parse_xml_folders(
+            args.folders, 
+            recursive=args.recursive, 
+            labels=args.labels,
+            workers=args.workers,
+            cache=args.cache,
+            cache_size=args.cache_size)
 
     if args.labels is not None and not args.show_empty:
         annotations.remove_empty()
 
-    annotations.print_stats()
\ No newline at end of file
+    with profiler.stage("stats"):
+        stats = DatasetStats.from_annotations(annotations).print_stats(args.histograms)
+
+    if args.overlaps is not None:
+        overlaps = find_overlaps(annotations, args.overlaps)
+        paths = annotations.image_paths()
+        for image, first, second, iou in zip(*(a.tolist() for a in overlaps)):
+            logger.warning(f"Box {first} and box {second} of '{paths[image]}' overlap with IoU {iou:.2f}.")
+        print(f"Overlaps: {overlaps}")
+
+    if args.validate:
+        with image_cache() as cache:
+            report = validate(annotations, args.labels, args.workers, cache)
+        for issue in report.issues:
+            logger.warning(f"{issue}")
+        report.print_report()
+        print(f"Validation: {report}")
+
+    if args.json:
+        stats.save(args.json)
+
+    if profiler.enabled:
+        profiler.print_report()
+    if args.profile:
+        profiler.save(args.profile)
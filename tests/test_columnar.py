@@ -0,0 +1,48 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, ColumnarAnnotations
+
+import pytest
+
+
+def _compact(annotations) -> list:
+    return [(str(a.image_path), tuple(a.image_size), [(b.label, b._xmin, b._ymin, b._xmax, b._ymax, b.confidence)
+        for b in a.boxes]) for a in annotations]
+
+
+def _annotations() -> Annotations:
+    return Annotations([
+        Annotation(f"/data/im_{i}.jpg", (64, 48), [BoundingBox(l, i, 2, 30, 40) for l in ("car", "bus")[:i % 3]])
+        for i in range(6)])
+
+
+@pytest.mark.parametrize("index", [slice(1, 4), slice(None, None, 2), slice(-2, None), slice(4, 1), slice(None)])
+def test_slice(index):
+    annotations = _annotations()
+    columns = ColumnarAnnotations.from_annotations(annotations)
+
+    selected = columns[index]
+
+    assert isinstance(selected, ColumnarAnnotations)
+    assert _compact(selected.to_annotations()) == _compact(annotations[index])
+
+
+@pytest.mark.parametrize("index", [0, 2, -1])
+def test_setitem(index):
+    annotations = _annotations()
+    columns = ColumnarAnnotations.from_annotations(annotations)
+    replacement = Annotation("/data/new.jpg", (32, 32),
+        [BoundingBox("truck", 1, 1, 5, 5, confidence=0.5), BoundingBox("car", 2, 2, 6, 6)])
+
+    columns[index] = replacement
+    annotations[index] = replacement
+
+    assert _compact(columns.to_annotations()) == _compact(annotations)
+    assert columns.labels() == {"car", "bus", "truck"}
+
+
+def test_setitem_rejects_slices():
+    columns = ColumnarAnnotations.from_annotations(_annotations())
+
+    with pytest.raises(TypeError):
+        columns[1:3] = columns[0:2]
+    with pytest.raises(IndexError):
+        columns[6] = columns[0]
@@ -0,0 +1,25 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.mark.parametrize("option, name", [
+    (["--cache"], "--cache"),
+    (["--clear_cache"], "--clear_cache"),
+    (["--dedup", "merge"], "--dedup"),
+    (["--incremental"], "--incremental"),
+    (["--split", "stratified"], "--split stratified"),
+])
+def test_stream_rejects_unsupported_options(tmp_path, option, name):
+    save_dir = tmp_path / "yolo"
+    result = subprocess.run([sys.executable, str(ROOT / "create_yolo.py"), str(tmp_path), "--stream",
+        "--save_dir", str(save_dir), *option], cwd=tmp_path, capture_output=True, text=True)
+
+    assert result.returncode == 2
+    assert f"{name} not supported with --stream" in result.stderr
+    assert not save_dir.exists()
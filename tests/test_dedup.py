@@ -0,0 +1,75 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, deduplicate, hash_cache
+from darknet_utils import dedup
+
+
+def _images(folder):
+    """Images a and b are identical, c only differs from a in the middle and d in size."""
+    folder.mkdir()
+    content = bytes(range(256)) * 1024
+    middle = len(content) // 2
+    for name, data in {
+        "a": content,
+        "b": content,
+        "c": content[:middle] + b"x" + content[middle + 1:],
+        "d": content + b"x",
+    }.items():
+        (folder / f"{name}.jpg").write_bytes(data)
+    return folder
+
+
+def _annotations(folder):
+    return Annotations([
+        Annotation(folder / "a.jpg", (64, 48), [BoundingBox("car", 1, 2, 30, 40)]),
+        Annotation(folder / "b.jpg", (64, 48), [BoundingBox("car", 1, 2, 30, 40), BoundingBox("bus", 5, 5, 20, 20)]),
+        Annotation(folder / "c.jpg", (64, 48), [BoundingBox("car", 1, 2, 30, 40)]),
+        Annotation(folder / "d.jpg", (64, 48)),
+        # The same image annotated twice
+        Annotation(folder / "c.jpg", (64, 48), [BoundingBox("bus", 5, 5, 20, 20)]),
+    ])
+
+
+def _compact(annotations):
+    return [(a.image_path.name, [b.label for b in a.boxes]) for a in annotations]
+
+
+def test_keep_first(tmp_path):
+    annotations = _annotations(_images(tmp_path / "images"))
+
+    result = deduplicate(annotations, "keep_first")
+
+    assert _compact(annotations) == [("a.jpg", ["car"]), ("c.jpg", ["car"]), ("d.jpg", [])]
+    assert [(d.name, o.name) for d, o in result.removed] == [("b.jpg", "a.jpg"), ("c.jpg", "c.jpg")]
+    assert result.merged_boxes == 0
+    # d has another size, c has the start and end of a but not its middle
+    assert (result.partial_hashes, result.full_hashes) == (3, 3)
+
+
+def test_merge(tmp_path):
+    annotations = _annotations(_images(tmp_path / "images"))
+
+    result = deduplicate(annotations, "merge")
+
+    # Boxes already in the kept annotation are not duplicated
+    assert _compact(annotations) == [("a.jpg", ["car", "bus"]), ("c.jpg", ["car", "bus"]), ("d.jpg", [])]
+    assert result.merged_boxes == 2
+    assert len(result.removed) == 2
+
+
+def test_cached_hashes(tmp_path, monkeypatch):
+    folder = _images(tmp_path / "images")
+    cache_file = tmp_path / "cache" / "hashes"
+    with hash_cache(cache_file) as cache:
+        first = deduplicate(_annotations(folder), cache=cache)
+
+    def hash_again(file):
+        raise AssertionError(f"'{file}' is hashed again")
+    monkeypatch.setattr(dedup, "_partial_hash", hash_again)
+    monkeypatch.setattr(dedup, "_full_hash", hash_again)
+
+    annotations = _annotations(folder)
+    with hash_cache(cache_file) as cache:
+        second = deduplicate(annotations, cache=cache)
+
+    assert second == first
+    assert cache.hits == 6 and cache.misses == 0
+    assert _compact(annotations) == [("a.jpg", ["car"]), ("c.jpg", ["car"]), ("d.jpg", [])]
@@ -0,0 +1,64 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, evaluate_detections
+
+import numpy as np
+import pytest
+
+
+def _dataset():
+    ground_truth = Annotations([
+        Annotation("/data/a.jpg", (100, 100), [BoundingBox("car", 0, 0, 10, 10),
+            BoundingBox("car", 20, 20, 30, 30), BoundingBox("car", 40, 40, 50, 50)]),
+        Annotation("/data/b.jpg", (100, 100), [BoundingBox("car", 0, 0, 10, 10), BoundingBox("bus", 50, 50, 90, 90)]),
+    ])
+    detections = Annotations([
+        Annotation("/data/a.jpg", (100, 100), [
+            BoundingBox("car", 40, 40, 50, 50),                    # TP, ranks last without confidence
+            BoundingBox("car", 0, 0, 10, 10, confidence=0.9),      # TP
+            BoundingBox("car", 60, 60, 70, 70, confidence=0.8),    # FP, no ground truth
+            BoundingBox("car", 20, 20, 30, 30, confidence=0.7),    # TP
+            BoundingBox("car", 0, 0, 10, 10, confidence=0.6),      # FP, already matched
+            BoundingBox("bike", 0, 0, 10, 10, confidence=0.9),     # No ground truth of this label
+        ]),
+        Annotation("/data/b.jpg", (100, 100), [
+            BoundingBox("car", 0, 0, 10, 6, confidence=0.5),       # IoU 0.6
+        ]),
+        Annotation("/data/unknown.jpg", (100, 100), [
+            BoundingBox("car", 0, 0, 10, 10, confidence=1.0),      # Ignored, not annotated
+        ]),
+    ])
+    return ground_truth, detections
+
+
+def test_average_precision_of_known_sequence():
+    evaluation = evaluate_detections(*_dataset(), iou_thresholds=(0.5, 0.75))
+
+    assert evaluation.ground_truths == {"bike": 0, "bus": 1, "car": 4}
+    assert evaluation.detections == {"bike": 1, "bus": 0, "car": 6}
+
+    # At IoU 0.5: TP FP TP FP TP TP, at IoU 0.75 the fifth detection is a FP
+    true_positives = np.array([[1, 1, 2, 2, 3, 4], [1, 1, 2, 2, 2, 3]])
+    np.testing.assert_allclose(evaluation.precisions["car"], true_positives / np.arange(1, 7))
+    np.testing.assert_allclose(evaluation.recalls["car"], true_positives / 4)
+    np.testing.assert_allclose(evaluation.confidences["car"], [0.9, 0.8, 0.7, 0.6, 0.5, np.nan])
+
+    # Areas under the precision envelope, by recall steps of 1/4
+    np.testing.assert_allclose(evaluation.average_precisions["car"],
+        [(1 + 2/3 + 2/3 + 2/3) / 4, (1 + 2/3 + 1/2) / 4])
+    np.testing.assert_allclose(evaluation.average_precisions["bus"], [0.0, 0.0])
+    assert np.isnan(evaluation.average_precisions["bike"]).all()
+
+    # Labels without ground truth are not counted
+    assert evaluation.mean_average_precision(0.5) == pytest.approx(0.75 / 2)
+    assert evaluation.mean_average_precision(0.75) == pytest.approx(13/24 / 2)
+    assert evaluation.mean_average_precision() == pytest.approx((0.75 + 13/24) / 4)
+
+
+def test_perfect_and_empty_detections():
+    ground_truth, _ = _dataset()
+
+    perfect = evaluate_detections(ground_truth, ground_truth, iou_thresholds=(0.5, 0.95))
+    empty = evaluate_detections(ground_truth, Annotations([]))
+
+    assert perfect.mean_average_precision() == 1.0
+    assert empty.mean_average_precision() == 0.0
+    assert np.isnan(evaluate_detections(Annotations([]), Annotations([])).mean_average_precision())
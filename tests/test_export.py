@@ -0,0 +1,43 @@
+from darknet_utils import AsyncExporter, ExportJob, ExportStats
+
+import pytest
+
+
+def _jobs(tmp_path, count):
+    source = tmp_path / "source.jpg"
+    source.write_bytes(b"image")
+    out = tmp_path / "out"
+    out.mkdir()
+    return [ExportJob(source, out / f"im_{i}.jpg", out / f"im_{i}.txt", f"0 0.5 0.5 0.1 0.1\n")
+        for i in range(count)]
+
+
+@pytest.mark.parametrize("as_generator", [False, True])
+def test_export_writes_all_files(tmp_path, as_generator):
+    jobs = _jobs(tmp_path, 50)
+    stats = AsyncExporter(image_jobs=4, label_jobs=4).export(iter(jobs) if as_generator else jobs)
+
+    assert stats.files["copy"] == 50
+    assert stats.label_files == 50
+    assert all(j.image_file.exists() and j.label_file.exists() for j in jobs)
+
+
+def test_failed_label_write_fails_export(tmp_path):
+    jobs = _jobs(tmp_path, 301)
+    # The parent folder does not exist, the label write raises
+    jobs[150] = jobs[150]._replace(label_file=tmp_path / "missing" / "im_150.txt")
+    stats = ExportStats()
+
+    with pytest.raises(FileNotFoundError):
+        AsyncExporter(image_jobs=4, label_jobs=4).export(jobs, stats)
+
+    assert stats.label_files < 301
+    assert not jobs[150].label_file.exists()
+
+
+def test_label_bytes_are_counted(tmp_path):
+    jobs = [job._replace(label_content=f"# vélo\n{job.label_content}") for job in _jobs(tmp_path, 3)]
+
+    stats = AsyncExporter().export(jobs)
+
+    assert stats.label_bytes == sum(j.label_file.stat().st_size for j in jobs) == 3 * 26
@@ -0,0 +1,33 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modules which should only be imported on first use
+HEAVY_MODULES = ("numpy", "PIL", "lxml", "rich", "tqdm")
+
+
+def _imported_modules(args: "list[str]") -> "set[str]":
+    """The top-level modules imported by a Python command, from `-X importtime`."""
+    result = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    lines = [l for l in result.stderr.splitlines() if l.startswith("import time:")]
+    assert lines, "no import time was reported"
+    return {l.rsplit("|", 1)[1].strip().split(".")[0] for l in lines[1:]}
+
+
+@pytest.mark.parametrize("args", [
+    ["-c", "import darknet_utils"],
+    [str(ROOT / "stats.py"), "-h"],
+    [str(ROOT / "create_yolo.py"), "-h"],
+    [str(ROOT / "evaluate.py"), "-h"],
+], ids=["import", "stats", "create_yolo", "evaluate"])
+def test_no_heavy_import(args):
+    modules = _imported_modules(args)
+
+    assert "darknet_utils" in modules
+    assert not modules.intersection(HEAVY_MODULES)
@@ -0,0 +1,123 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, find_overlaps, merge_overlaps
+from darknet_utils import iou
+
+import copy
+import random
+
+import numpy as np
+import pytest
+
+
+def _annotations(seed, count=40):
+    random_gen = random.Random(seed)
+    annotations = []
+    for i in range(count):
+        boxes = []
+        for _ in range(random_gen.randrange(8)):
+            # Small images give many overlaps, corners may be swapped or equal
+            x1, y1, x2, y2 = (random_gen.choice([random_gen.randrange(12), random_gen.uniform(0, 12)])
+                for _ in range(4))
+            if boxes and random_gen.random() < 0.3:
+                # A box annotated twice, slightly shifted
+                copied = random_gen.choice(boxes)
+                x1, y1, x2, y2 = (c + random_gen.uniform(-0.2, 0.2) for c in
+                    (copied._xmin, copied._ymin, copied._xmax, copied._ymax))
+            confidence = random_gen.choice([None, round(random_gen.random(), 1)])
+            boxes.append(BoundingBox(random_gen.choice("ab"), x1, y1, x2, y2, confidence))
+        annotations.append(Annotation(f"/data/img_{i}.jpg", (12, 12), boxes))
+    return Annotations(annotations)
+
+
+def _iou(a, b):
+    ax1, ax2 = sorted((a._xmin, a._xmax))
+    ay1, ay2 = sorted((a._ymin, a._ymax))
+    bx1, bx2 = sorted((b._xmin, b._xmax))
+    by1, by2 = sorted((b._ymin, b._ymax))
+    intersection = max(0, min(ax2, bx2) - max(ax1, bx1)) * max(0, min(ay2, by2) - max(ay1, by1))
+    union = (ax2 - ax1) * (ay2 - ay1) + (bx2 - bx1) * (by2 - by1) - intersection
+    return intersection / union if union > 0 else 0.0
+
+
+def _reference_overlaps(annotations, threshold, same_label):
+    return [(image, i, j, _iou(a, b))
+        for image, annotation in enumerate(annotations)
+        for i, a in enumerate(annotation.boxes)
+        for j, b in enumerate(annotation.boxes)
+        if i < j and (a.label == b.label or not same_label) and _iou(a, b) > threshold]
+
+
+def _reference_merge(annotations, threshold, same_label, mode):
+    """Greedy non-maximum suppression, one box at a time."""
+    merged = []
+    for image, annotation in enumerate(annotations):
+        boxes = annotation.boxes
+        order = sorted(range(len(boxes)), key=lambda i: (-(boxes[i].confidence
+            if boxes[i].confidence is not None else -np.inf), i))
+        kept, owners = [], {}
+        for i in order:
+            owner = next((k for k in kept if (boxes[k].label == boxes[i].label or not same_label)
+                and _iou(boxes[k], boxes[i]) > threshold), None)
+            if owner is None:
+                kept.append(i)
+            else:
+                owners[i] = owner
+        merged += [(image, owners[i], i, _iou(boxes[owners[i]], boxes[i])) for i in sorted(owners)]
+
+        if mode == "average":
+            for k in kept:
+                group = [boxes[k]] + [boxes[i] for i in sorted(owners) if owners[i] == k]
+                coords = np.mean([[b._xmin, b._ymin, b._xmax, b._ymax] for b in group], axis=0)
+                boxes[k]._xmin, boxes[k]._ymin, boxes[k]._xmax, boxes[k]._ymax = coords.tolist()
+                confidences = [b.confidence for b in group if b.confidence is not None]
+                boxes[k].confidence = max(confidences) if confidences else None
+        annotation.boxes = [b for i, b in enumerate(boxes) if i not in owners]
+    return merged
+
+
+def _pairs(overlaps):
+    return list(zip(overlaps.image_ids.tolist(), overlaps.first_boxes.tolist(),
+        overlaps.second_boxes.tolist(), map(pytest.approx, overlaps.ious.tolist())))
+
+
+def _compact(annotations):
+    return [[(b.label, *map(pytest.approx, (b._xmin, b._ymin, b._xmax, b._ymax)), b.confidence)
+        for b in a.boxes] for a in annotations]
+
+
+@pytest.fixture(params=[None, 7], ids=["one_batch", "small_batches"])
+def max_pairs(request, monkeypatch):
+    if request.param is not None:
+        monkeypatch.setattr(iou, "_MAX_PAIRS", request.param)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("threshold", [0.0, 0.3, 0.7])
+@pytest.mark.parametrize("same_label", [True, False])
+def test_find_overlaps(max_pairs, seed, threshold, same_label):
+    annotations = _annotations(seed)
+
+    overlaps = find_overlaps(annotations, threshold, same_label)
+
+    assert len(overlaps.ious) > 0
+    assert _pairs(overlaps) == _reference_overlaps(annotations, threshold, same_label)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("same_label", [True, False])
+@pytest.mark.parametrize("mode", ["suppress", "average"])
+@pytest.mark.parametrize("columnar", [False, True])
+def test_merge_overlaps(max_pairs, seed, same_label, mode, columnar):
+    annotations = _annotations(seed)
+    expected = copy.deepcopy(annotations)
+    expected_pairs = _reference_merge(expected, 0.3, same_label, mode)
+
+    if columnar:
+        columns = annotations.to_columnar()
+        merged = merge_overlaps(columns, 0.3, same_label, mode)
+        annotations = columns.to_annotations()
+    else:
+        merged = merge_overlaps(annotations, 0.3, same_label, mode)
+
+    assert expected_pairs
+    assert _pairs(merged) == expected_pairs
+    assert _compact(annotations) == _compact(expected)
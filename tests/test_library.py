@@ -0,0 +1,99 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, create_yolo_trainval, stream_yolo_trainval
+from darknet_utils.library import _ImageNames, stratified_split
+
+import hashlib
+
+import numpy as np
+import pytest
+
+
+def _folder(root, name, count):
+    folder = root / name
+    folder.mkdir()
+    annotations = []
+    for i in range(count):
+        image = folder / f"img_{i}.jpg"
+        image.write_bytes(f"{name} {i}".encode())
+        annotations.append(Annotation(image, (64, 48), [BoundingBox("car", 1, 2, 30, 40)]))
+    return annotations
+
+
+def test_incremental_export_skips_existing_images(tmp_path):
+    first = _folder(tmp_path, "folder_1", 40)
+    second = _folder(tmp_path, "folder_2", 10)
+    save_dir = tmp_path / "yolo"
+
+    create_yolo_trainval(Annotations(list(first)), save_dir=save_dir, incremental=True, split="hash")
+    stats = create_yolo_trainval(Annotations(first + second), save_dir=save_dir, exist_ok=True,
+        incremental=True, split="hash")
+
+    assert stats.unchanged == 40
+    assert stats.removed == 0
+    assert stats.files["copy"] == 10
+    exported = sorted(save_dir.glob("*/*.jpg"))
+    assert len(exported) == 50
+    assert len((save_dir / "train.txt").read_text().splitlines()) \
+        + len((save_dir / "val.txt").read_text().splitlines()) == 50
+
+    # Removing a folder only removes its files
+    stats = create_yolo_trainval(Annotations(list(second)), save_dir=save_dir, exist_ok=True,
+        incremental=True, split="hash")
+    assert stats.unchanged == 10
+    assert stats.removed == 80
+    assert sum(stats.files.values()) == 0
+
+
+def test_duplicated_image_is_exported_twice(tmp_path):
+    annotations = _folder(tmp_path, "folder", 3)
+    annotations.append(annotations[0])
+
+    create_yolo_trainval(Annotations(annotations), save_dir=tmp_path / "yolo", train_ratio=1.0)
+
+    assert len(list((tmp_path / "yolo" / "train").glob("*.jpg"))) == 4
+
+
+def test_export_prints_nothing(tmp_path, capsys):
+    annotations = _folder(tmp_path, "folder", 3)
+
+    stats = create_yolo_trainval(Annotations(list(annotations)), save_dir=tmp_path / "yolo")
+    streamed = stream_yolo_trainval(iter(annotations), save_dir=tmp_path / "stream")
+
+    assert sum(stats.files.values()) == sum(streamed.files.values()) == 3
+    assert capsys.readouterr().out == ""
+
+
+def test_image_names_are_stable_and_unique():
+    names = _ImageNames()
+    paths = [f"/data/images/{i}.jpg" for i in range(5000)]
+
+    first = [names(p) for p in paths]
+    repeated = [names(paths[0]), names(paths[0]), names(paths[1])]
+
+    assert len(set(first)) == len(first)
+    assert first[0] == hashlib.blake2b(b"/data/images/0.jpg", digest_size=8).hexdigest() + ".jpg"
+    assert repeated == [first[0][:-4] + "_1.jpg", first[0][:-4] + "_2.jpg", first[1][:-4] + "_1.jpg"]
+    assert first == [_ImageNames()(p) for p in paths]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stratified_split_balances_images_and_boxes(seed):
+    random_gen = np.random.default_rng(seed)
+    annotations = []
+    for i in range(2000):
+        boxes = [BoundingBox(label, 1, 2, 30, 40)
+            for label, p, mean in (("car", 0.8, 3), ("person", 0.3, 6), ("bike", 0.05, 2))
+            if random_gen.random() < p
+            for _ in range(1 + random_gen.poisson(mean))]
+        annotations.append(Annotation(f"/data/img_{i}.jpg", (64, 48), boxes))
+
+    is_train = stratified_split(Annotations(annotations), 0.8, seed)
+
+    for label in ("car", "person", "bike"):
+        boxes = np.array([sum(b.label == label for b in a.boxes) for a in annotations])
+        images = boxes > 0
+        assert images[is_train].sum() / images.sum() == pytest.approx(0.8, abs=0.01)
+        assert boxes[is_train].sum() / boxes.sum() == pytest.approx(0.8, abs=0.015)
+
+    # The rarest label is split with an error below one image
+    bike = np.array([any(b.label == "bike" for b in a.boxes) for a in annotations])
+    assert abs(bike[is_train].sum() - 0.8 * bike.sum()) < 1
@@ -0,0 +1,32 @@
+from darknet_utils import parse_cache, parse_xml_folder
+from darknet_utils import parsers
+
+
+XML = """<annotation>
+	<filename>{name}.jpg</filename>
+	<path>{folder}/{name}.jpg</path>
+	<size><width>64</width><height>48</height><depth>3</depth></size>
+	<object><name>car</name><bndbox><xmin>1</xmin><ymin>2</ymin><xmax>30</xmax><ymax>40</ymax></bndbox></object>
+</annotation>
+"""
+
+
+def _dataset(folder, count):
+    folder.mkdir()
+    for i in range(count):
+        (folder / f"im_{i}.xml").write_text(XML.format(folder=folder, name=f"im_{i}"))
+    return folder
+
+
+def test_parse_cache_is_outside_dataset(tmp_path, monkeypatch, capsys):
+    monkeypatch.setattr(parsers, "PARSE_CACHE_DIR", tmp_path / "cache")
+    dataset = _dataset(tmp_path / "dataset", 5)
+
+    first = parse_xml_folder(dataset, cache=True)
+    second = parse_xml_folder(dataset, cache=True)
+
+    assert sorted(p.name for p in dataset.iterdir()) == [f"im_{i}.xml" for i in range(5)]
+    assert parse_cache(dataset).cache_file.parent == tmp_path / "cache"
+    assert len(parse_cache(dataset)) == 5
+    assert [str(a.image_path) for a in first] == [str(a.image_path) for a in second]
+    assert capsys.readouterr().out == ""
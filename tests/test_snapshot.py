@@ -0,0 +1,58 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, ColumnarAnnotations, load_snapshot, save_snapshot
+
+import pytest
+
+
+def _annotations():
+    return Annotations([
+        Annotation("/data/a.jpg", (64, 48), [BoundingBox("car", 1, 2, 30, 40), BoundingBox("bus", 0.5, 1, 9, 9.25)]),
+        Annotation("/data/empty.jpg", (32, 32)),
+        Annotation("/données/été 1.jpg", (640, 480), [BoundingBox("vélo", 10, 20, 30, 40, confidence=0.75)]),
+        Annotation("/data/a.jpg", (64, 48), [BoundingBox("car", 5, 5, 20, 20, confidence=0.0)]),
+    ])
+
+
+def _compact(annotations):
+    return [(str(a.image_path), tuple(a.image_size), [(b.label, b._xmin, b._ymin, b._xmax, b._ymax, b.confidence)
+        for b in a.boxes]) for a in annotations]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_snapshot_round_trip(tmp_path, columnar):
+    annotations = _annotations()
+    save_snapshot(annotations.to_columnar() if columnar else annotations, tmp_path / "dataset.snap")
+
+    snapshot = load_snapshot(tmp_path / "dataset.snap")
+
+    assert len(snapshot) == 4
+    assert _compact(snapshot.to_annotations()) == _compact(annotations)
+    assert _compact(snapshot[i] for i in range(-4, 4)) == _compact(annotations) * 2
+    assert snapshot.image_paths() == [a.image_path for a in annotations]
+    assert snapshot.labels() == {"car", "bus", "vélo"}
+    assert snapshot.box_counts.tolist() == [2, 0, 1, 1]
+    # Missing confidences are kept apart from a zero confidence
+    assert [b.confidence for b in snapshot[0].boxes] == [None, None]
+    assert snapshot[3].boxes[0].confidence == 0.0
+
+
+def test_snapshot_of_snapshot(tmp_path):
+    save_snapshot(_annotations(), tmp_path / "first.snap")
+    save_snapshot(load_snapshot(tmp_path / "first.snap"), tmp_path / "second.snap")
+
+    assert (tmp_path / "first.snap").read_bytes() == (tmp_path / "second.snap").read_bytes()
+
+
+@pytest.mark.parametrize("annotations", [
+    Annotations([]),
+    Annotations([Annotation("/data/empty.jpg", (32, 32))]),
+], ids=["no_image", "no_box"])
+def test_empty_snapshot(tmp_path, annotations):
+    save_snapshot(annotations, tmp_path / "dataset.snap")
+
+    snapshot = load_snapshot(tmp_path / "dataset.snap")
+
+    assert len(snapshot) == len(annotations)
+    assert _compact(snapshot.to_annotations()) == _compact(annotations)
+    assert isinstance(snapshot.to_columnar(), ColumnarAnnotations)
+    assert snapshot.labels() == set()
+    assert snapshot.image_paths() == [a.image_path for a in annotations]
@@ -0,0 +1,48 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, ColumnarAnnotations, DatasetStats
+
+import pytest
+
+
+def _annotations():
+    return Annotations([
+        Annotation("/data/a.jpg", (64, 48), [BoundingBox("car", 1, 2, 30, 40)]),
+        # Same image annotated twice, e.g. in two folders
+        Annotation("/data/a.jpg", (64, 48), [BoundingBox("car", 5, 5, 20, 20), BoundingBox("bus", 1, 1, 9, 9)]),
+        Annotation("/data/b.jpg", (64, 48), [BoundingBox("car", 1, 2, 30, 40)]),
+        Annotation("/data/c.jpg", (64, 48)),
+        Annotation("/data/c.jpg", (64, 48)),
+    ])
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_duplicated_image_path_counted_once(columnar):
+    annotations = _annotations()
+    if columnar:
+        annotations = ColumnarAnnotations.from_annotations(annotations)
+
+    stats = DatasetStats.from_annotations(annotations)
+
+    assert stats.images == 5
+    assert stats.label_images == {"car": 2, "bus": 1}
+    assert stats.label_boxes == {"car": 3, "bus": 1}
+    assert stats.empty_images == 1
+
+
+def test_merge():
+    annotations = _annotations()
+    stats = DatasetStats.from_annotations(Annotations(annotations[:3])) \
+        + DatasetStats.from_annotations(Annotations(annotations[3:]))
+
+    assert stats.images == 5
+    assert stats.label_images == {"car": 2, "bus": 1}
+    assert stats.empty_images == 1
+    assert DatasetStats.from_dict(stats.to_dict()).to_dict() == stats.to_dict()
+
+
+def test_print_stats(capsys):
+    _annotations().print_stats()
+
+    rows = {line.split("│")[1].strip(): line.split("│")[2:4]
+        for line in capsys.readouterr().out.splitlines() if line.count("│") == 4}
+    assert {label: [int(n) for n in counts] for label, counts in rows.items() if label != "Label"} \
+        == {"bus": [1, 1], "car": [2, 3], "<empty>": [1, 0], "Total": [5, 4]}
@@ -0,0 +1,29 @@
+from darknet_utils import get_image_size, probe_image_size
+
+from PIL import Image
+import pytest
+
+
+@pytest.mark.parametrize("extension, options", [
+    (".jpg", dict(format="JPEG")),
+    (".jpg", dict(format="JPEG", progressive=True)),
+    (".png", dict(format="PNG")),
+    (".bmp", dict(format="BMP")),
+])
+def test_probe_image_size(tmp_path, extension, options):
+    image = tmp_path / f"image{extension}"
+    Image.new("RGB", (37, 21)).save(image, **options)
+
+    assert tuple(probe_image_size(image)) == (37, 21)
+
+
+@pytest.mark.parametrize("extension", [".png", ".bmp", ".jpg"])
+@pytest.mark.parametrize("length", [0, 2, 10, 16, 20, 23])
+def test_truncated_header(tmp_path, extension, length):
+    image = tmp_path / f"image{extension}"
+    Image.new("RGB", (37, 21)).save(image)
+    image.write_bytes(image.read_bytes()[:length])
+
+    assert probe_image_size(image) is None
+    with pytest.raises(OSError):
+        get_image_size(image)
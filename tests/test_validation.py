@@ -0,0 +1,23 @@
+from darknet_utils import Annotation, BoundingBox, validate
+
+from PIL import Image
+
+
+def test_truncated_png_is_reported(tmp_path):
+    image = tmp_path / "image.png"
+    Image.new("RGB", (64, 48)).save(image)
+    image.write_bytes(image.read_bytes()[:20])
+
+    report = validate(Annotation(image, (64, 48), [BoundingBox("car", 1, 2, 30, 40)]))
+
+    assert [i.check for i in report.issues] == ["unreadable_image"]
+    assert report.invalid_images() == {image}
+
+
+def test_valid_image(tmp_path):
+    image = tmp_path / "image.png"
+    Image.new("RGB", (64, 48)).save(image)
+
+    report = validate(Annotation(image, (64, 48), [BoundingBox("car", 1, 2, 30, 40)]))
+
+    assert report.issues == []
@@ -0,0 +1,144 @@
+from darknet_utils.parsers import _NOT_LABELIMG, _parse_labelimg, _parse_xml_compact
+
+import pytest
+
+
+# Layout of the files written by labelImg
+XML_TEMPLATE = """<annotation>
+	<folder>{folder}</folder>
+	<filename>{filename}</filename>
+	<path>{path}</path>
+	<source>
+		<database>Unknown</database>
+	</source>
+	<size>
+		<width>{width}</width>
+		<height>{height}</height>
+		<depth>3</depth>
+	</size>
+	<segmented>0</segmented>
+{objects}</annotation>
+"""
+
+OBJECT_TEMPLATE = """	<object>
+		<name>{label}</name>
+		<pose>Unspecified</pose>
+		<truncated>0</truncated>
+		<difficult>0</difficult>
+		<bndbox>
+			<xmin>{xmin}</xmin>
+			<ymin>{ymin}</ymin>
+			<xmax>{xmax}</xmax>
+			<ymax>{ymax}</ymax>
+		</bndbox>
+	</object>
+"""
+
+
+def labelimg(objects: "list[dict]" = (), path: str = "/data/images/im.jpg", filename: str = "im.jpg",
+    width="640", height="480", header: str = "") -> str:
+    """A labelImg file, see `XML_TEMPLATE`."""
+    objects = "".join(OBJECT_TEMPLATE.format(**{"label": "car", "xmin": 1, "ymin": 2,
+        "xmax": 30, "ymax": 40, **o}) for o in objects)
+    return header + XML_TEMPLATE.format(folder="images", filename=filename, path=path,
+        width=width, height=height, objects=objects)
+
+
+BOXES = [{}, {"label": "person", "xmin": "10.5", "ymin": "1e1", "xmax": " 20 ", "ymax": "\n30\n"}]
+
+# Files with the labelImg layout, parsed by the fast path
+LABELIMG_CORPUS = {
+    "no_object": labelimg(),
+    "objects": labelimg(BOXES),
+    "declaration": labelimg(BOXES, header="<?xml version='1.0' encoding='utf-8'?>\n"),
+    "declaration_standalone": labelimg(BOXES, header='<?xml version="1.0" encoding="UTF-8" standalone="no" ?>'),
+    "bom": "﻿" + labelimg(BOXES, header="<?xml version='1.0' encoding='utf-8'?>\n"),
+    "verified": labelimg(BOXES).replace("<annotation>", '<annotation verified="yes">'),
+    "windows_newlines": labelimg(BOXES[:1]).replace("\n", "\r\n"),
+    "spaces": labelimg(BOXES).replace("\t", "    "),
+    "single_line": labelimg(BOXES).replace("\n", "").replace("\t", ""),
+    "unicode": labelimg([{"label": "vélo"}], path="/données/img.jpg", filename="été 1.jpg"),
+    "relative_path": labelimg(BOXES, path="images/im.jpg", filename="im.png"),
+    "home_path": labelimg(BOXES, path="~/images/im.jpg"),
+    "no_folder": labelimg(BOXES).replace("<folder>images</folder>", ""),
+    "no_source": labelimg(BOXES).replace("<source>\n\t\t<database>Unknown</database>\n\t</source>", ""),
+    "no_depth": labelimg(BOXES).replace("<depth>3</depth>", ""),
+    "no_segmented": labelimg(BOXES).replace("<segmented>0</segmented>", ""),
+    "no_pose": labelimg(BOXES).replace("<pose>Unspecified</pose>", ""),
+    "empty_fields": labelimg(BOXES).replace("Unspecified", "").replace("Unknown", ""),
+    "negative_coords": labelimg([{"xmin": -5, "ymin": "-0.5"}]),
+}
+
+# Files deviating from the labelImg layout or with invalid numbers, parsed by lxml
+OTHER_CORPUS = {
+    "invalid_width": labelimg(width="wide"),
+    "invalid_coord": labelimg([{"xmin": "left"}]),
+    "invalid_filtered_coord": labelimg([{"xmin": 1}, {"label": "person", "xmin": "left"}]),
+    "entity": labelimg([{"label": "cat &amp; dog"}]),
+    "char_reference": labelimg(path="/data/&#233;t&#xE9;/im.jpg"),
+    "cdata": labelimg(path="<![CDATA[/data/a<b/im.jpg]]>"),
+    "comment": labelimg(BOXES).replace("<size>", "<!-- size --><size>"),
+    "trailing_comment": labelimg(BOXES) + "<!-- end -->",
+    "doctype": '<!DOCTYPE annotation [<!ENTITY dir "/data">]>' + labelimg(path="&dir;/im.jpg"),
+    "latin1": labelimg([{"label": "v\xe9lo"}], header="<?xml version='1.0' encoding='latin-1'?>").encode("latin-1"),
+    "carriage_return_text": labelimg(path="/data/\r\nimages/im.jpg"),
+    "namespace": labelimg(BOXES).replace("<annotation>", '<annotation xmlns="http://example.com">'),
+    "other_attribute": labelimg(BOXES).replace("<annotation>", '<annotation verbose="yes">'),
+    "other_order": labelimg(BOXES).replace("<filename>im.jpg</filename>", "")
+        .replace("</path>", "</path><filename>im.jpg</filename>"),
+    "comment_in_text": labelimg(BOXES).replace("<name>car</name>", "<name>c<!-- x -->ar</name>"),
+    "cdata_name": labelimg(BOXES).replace("<name>car</name>", "<name><![CDATA[car]]></name>"),
+    "entity_name": labelimg(BOXES).replace("<name>car</name>", "<name>&lt;car&gt;</name>"),
+    "attribute_object": labelimg(BOXES).replace("<object>", '<object id="1">'),
+    "attribute_name": labelimg(BOXES).replace("<name>car</name>", '<name lang="en">car</name>'),
+    "attribute_path": labelimg(BOXES).replace("<path>", '<path type="absolute">'),
+    "attribute_size": labelimg(BOXES).replace("<size>", '<size unit="px">'),
+    "prefixed_root": labelimg(BOXES).replace("<annotation>", '<ns:annotation xmlns:ns="http://example.com">')
+        .replace("</annotation>", "</ns:annotation>"),
+    "prefixed_child": labelimg(BOXES).replace("<annotation>", '<annotation xmlns:ns="http://example.com">')
+        .replace("<pose>Unspecified</pose>", "<ns:pose>Unspecified</ns:pose>"),
+    "prefixed_name": labelimg(BOXES).replace("<annotation>", '<annotation xmlns:ns="http://example.com">')
+        .replace("<name>car</name>", "<ns:name>car</ns:name>"),
+    "extra_element": labelimg(BOXES).replace("<difficult>0</difficult>", "<difficult>0</difficult><occluded>0</occluded>"),
+    "self_closing": labelimg(BOXES).replace("<segmented>0</segmented>", "<segmented/>"),
+    "no_path": labelimg(BOXES).replace("<path>/data/images/im.jpg</path>", ""),
+    "nested_path": labelimg(BOXES).replace("<path>/data/images/im.jpg</path>", "")
+        .replace("<database>", "<path>/data/images/im.jpg</path><database>"),
+    "empty_path": labelimg(BOXES, path=""),
+    "empty_name": labelimg([{"label": ""}]),
+    "no_size": labelimg(BOXES).replace("<size>\n\t\t<width>640</width>\n\t\t<height>480</height>\n\t\t<depth>3</depth>\n\t</size>", ""),
+    "no_width": labelimg(BOXES).replace("<width>640</width>", ""),
+    "no_bndbox": labelimg(BOXES).replace("<bndbox>", "<box>").replace("</bndbox>", "</box>"),
+    "control_char": labelimg([{"label": "car\x01"}]),
+    "invalid_utf8": labelimg(BOXES).encode("utf-8").replace(b"car", b"c\xffr"),
+    "mismatched_tag": labelimg(BOXES).replace("</width>", "</widht>"),
+    "truncated": labelimg(BOXES)[:200],
+    "empty": "",
+}
+
+
+def outcome(func, *args):
+    """The result of a call, or the type of the exception it raised."""
+    try:
+        return func(*args)
+    except Exception as e:
+        return type(e).__name__
+
+
+CORPUS = [(name, content, True) for name, content in LABELIMG_CORPUS.items()] \
+    + [(name, content, False) for name, content in OTHER_CORPUS.items()]
+
+
+@pytest.mark.parametrize("content, is_labelimg", [c[1:] for c in CORPUS], ids=[c[0] for c in CORPUS])
+@pytest.mark.parametrize("labels", [None, {"car"}, {"vélo", "cat & dog"}, {"bike"}], ids=str)
+def test_fast_parser_matches_lxml(tmp_path, content, is_labelimg, labels):
+    file = tmp_path / "annotation.xml"
+    if isinstance(content, str):
+        file.write_text(content, encoding="utf-8", newline="")
+    else:
+        file.write_bytes(content)
+
+    # Files deviating from the labelImg layout fall back to lxml
+    assert (outcome(_parse_labelimg, file.read_bytes()) is not _NOT_LABELIMG) == is_labelimg
+
+    assert outcome(_parse_xml_compact, file, labels, True) == outcome(_parse_xml_compact, file, labels, False)
@@ -0,0 +1,65 @@
+from darknet_utils import Annotation, Annotations, BoundingBox, create_yolo_trainval, parse_yolo_trainval
+
+import struct
+import zlib
+
+import pytest
+
+
+def _png(width, height):
+    """A PNG signature and header chunk, enough to read the image size."""
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + struct.pack(">I", len(header)) + b"IHDR" + header \
+        + struct.pack(">I", zlib.crc32(b"IHDR" + header))
+
+
+def _annotations(folder, count):
+    folder.mkdir()
+    annotations = []
+    for i in range(count):
+        image = folder / f"img_{i}.png"
+        image.write_bytes(_png(64 + i, 48))
+        boxes = [BoundingBox("car", 1, 2, 30, 40), BoundingBox("person", 10.5, 0, 20, 47.25)][:i % 3]
+        annotations.append(Annotation(image, (64 + i, 48), boxes))
+    return annotations
+
+
+def _boxes(annotation):
+    return [(b.label, b._xmin, b._ymin, b._xmax, b._ymax) for b in annotation.boxes]
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_yolo_round_trip(tmp_path, columnar):
+    annotations = _annotations(tmp_path / "images", 20)
+    save_dir = tmp_path / "yolo"
+    create_yolo_trainval(Annotations(list(annotations)), save_dir=save_dir, split="hash", random_seed=1)
+
+    parsed = parse_yolo_trainval(save_dir, columnar=columnar)
+    if columnar:
+        parsed = parsed.to_annotations()
+
+    names = (save_dir / "train.txt").read_text().splitlines() + (save_dir / "val.txt").read_text().splitlines()
+    assert [str(a.image_path) for a in parsed] == [str(save_dir / n.removeprefix("data/")) for n in names]
+
+    # Exported images are read back in the order of the image lists
+    sources = {(save_dir / n.removeprefix("data/")).read_bytes(): a for n, a in zip(names, parsed)}
+    assert len(sources) == len(annotations)
+    for annotation in annotations:
+        read = sources[annotation.image_path.read_bytes()]
+        assert read.image_size == annotation.image_size
+        assert _boxes(read) == [(b[0], *map(pytest.approx, b[1:])) for b in _boxes(annotation)]
+        assert all(b.confidence is None for b in read.boxes)
+
+
+def test_yolo_subsets_and_labels(tmp_path):
+    annotations = _annotations(tmp_path / "images", 20)
+    save_dir = tmp_path / "yolo"
+    create_yolo_trainval(Annotations(annotations), save_dir=save_dir, train_ratio=0.5)
+
+    train = parse_yolo_trainval(save_dir, subsets=["train"])
+    cars = parse_yolo_trainval(save_dir, labels={"car"})
+
+    assert len(train) == 10
+    assert all(str(a.image_path).startswith(str(save_dir / "train")) for a in train)
+    assert len(cars) == 20
+    assert {b.label for a in cars for b in a.boxes} == {"car"}